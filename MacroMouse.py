@@ -6,15 +6,26 @@ import subprocess
 import os
 import sys
 import json
-from datetime import datetime
+import copy
+import pickle
+import hashlib
+from datetime import datetime, timedelta
 import uuid
 import xml.etree.ElementTree as ET
+import xml.parsers.expat
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
 import re
 import tkinter.simpledialog as sd
 import pystray
 from PIL import Image, ImageDraw
 import threading
 import functools
+import heapq
+import math
+import array
+import bisect
+import itertools
 import tempfile
 import requests
 import time
@@ -24,12 +35,11 @@ import socket
 log_file_path = None
 config_file_path = None
 selected_macro_name = None
-macro_list_items = []
 selected_category = "All"
 macro_data_file_path = None
 reference_file_path = None  # Path to user's reference file
-macros_dict = {}  # In-memory macro storage
 macro_usage_counts = {}  # Dictionary to track macro usage counts
+usage_version = 0  # Bumped by usage_changed() whenever macro_usage_counts changes
 macro_usage_notes = {}  # Dictionary to store usage notes for each macro
 window = None  # Global reference to the main window
 update_list_func = None  # Global reference to the update_list function
@@ -181,266 +191,2234 @@ def generate_unique_id(prefix="MACRO"):
     """Generate a unique ID for macros or categories."""
     return f"{prefix}_{uuid.uuid4().hex[:8].upper()}"
 
-def load_macro_data():
-    """Load the structured macro data from XML file."""
-    global macro_data_file_path
+def intern_string(value):
+    """Intern a string that repeats across records (IDs, timestamps) so they share one copy."""
+    return sys.intern(value) if type(value) is str else value
+
+class Macro(Mapping):
+    """
+    Compact record for one macro. Reads like the dict it replaces
+    (macro["name"], macro.get("content")); records are never changed in
+    place, so use replace() to get an edited copy.
+    """
+    __slots__ = ("name", "category_id", "_content", "created", "modified", "version")
+    FIELDS = ("name", "category_id", "content", "created", "modified", "version")
+
+    def __init__(self, name, category_id, content, created, modified, version=1):
+        self.name = name
+        self.category_id = intern_string(category_id)
+        self._content = content
+        self.created = intern_string(created)
+        self.modified = intern_string(modified)
+        self.version = version
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Build a record from a dict (journal records, data passed to save)."""
+        return cls(mapping.get("name"), mapping.get("category_id"), mapping.get("content"),
+                   mapping.get("created"), mapping.get("modified"), mapping.get("version", 1))
+
+    @property
+    def content(self):
+        return self._content
+
+    def replace(self, **changes):
+        """Return a copy of the record with some fields changed."""
+        return Macro(**dict(self, **changes))
+
+    def __getitem__(self, key):
+        if key in Macro.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(Macro.FIELDS)
+
+    def __len__(self):
+        return len(Macro.FIELDS)
+
+    def __reduce__(self):
+        return (Macro, (self.name, self.category_id, self._content, self.created, self.modified, self.version))
+
+    def __repr__(self):
+        return f"Macro({self.name!r}, category_id={self.category_id!r}, version={self.version!r})"
+
+class Category(Mapping):
+    """Compact record for one category, read like the dict it replaces."""
+    __slots__ = ("name", "created", "modified", "description", "hidden")
+    FIELDS = __slots__
+
+    def __init__(self, name, created, modified, description="", hidden=False):
+        self.name = name
+        self.created = intern_string(created)
+        self.modified = intern_string(modified)
+        self.description = description
+        self.hidden = hidden
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Build a record from a dict (journal records, data passed to save)."""
+        return cls(mapping.get("name"), mapping.get("created"), mapping.get("modified"),
+                   mapping.get("description", ""), mapping.get("hidden", False))
+
+    def replace(self, **changes):
+        """Return a copy of the record with some fields changed."""
+        return Category(**dict(self, **changes))
+
+    def __getitem__(self, key):
+        if key in Category.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(Category.FIELDS)
+
+    def __len__(self):
+        return len(Category.FIELDS)
+
+    def __reduce__(self):
+        return (Category, (self.name, self.created, self.modified, self.description, self.hidden))
+
+    def __repr__(self):
+        return f"Category({self.name!r}, hidden={self.hidden!r})"
+
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+")
+
+def search_tokens(text):
+    """Split text into lowercase search tokens."""
+    return SEARCH_TOKEN_PATTERN.findall(text.lower()) if text else []
+
+def macro_search_tokens(macro):
+    """Return the set of search tokens in a macro's name and content."""
+    return set(search_tokens(macro["name"])) | set(search_tokens(macro["content"]))
+
+def text_trigrams(text):
+    """Return the set of three-character substrings of text, lowercased."""
+    text = text.lower()
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+def macro_trigrams(macro):
+    """
+    Return (trigrams, short) for a macro's name and content, where short is
+    True if either is non-empty but shorter than a trigram.
+    """
+    name = macro["name"] or ""
+    content = macro["content"] or ""
+    short = 0 < len(name) < 3 or 0 < len(content) < 3
+    return text_trigrams(name) | text_trigrams(content), short
+
+# Fuzzy search scores; results are ranked by score, then name
+FUZZY_SUBSTRING_SCORE = 100  # Name contains the search term
+FUZZY_SUBSEQUENCE_SCORE = 60  # Name contains the term's characters in order
+FUZZY_TYPO_SCORE = 40  # Name words are a typo or two away from the term's words
+FUZZY_CONTENT_SCORE = 20  # Only the content or usage notes match
+FUZZY_USAGE_WEIGHT = 4  # Added per doubling of a macro's usage count
+
+def char_mask(text):
+    """Return a bitmask of the characters in text, for cheap fuzzy-match rejection."""
+    mask = 0
+    for char in set(text):
+        mask |= 1 << (ord(char) % 63)
+    return mask
+
+def typo_limit(word):
+    """Return how many typos a query word may contain."""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+def bounded_edit_distance(a, b, limit):
+    """
+    Return the edit distance between a and b, counting a swap of adjacent
+    characters as one edit, or limit + 1 as soon as it must exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+def empty_macro_data():
+    """Return an empty macro data structure."""
+    return {
+        "version": "1.0",
+        "categories": {},
+        "macros": {},
+        "category_order": []
+    }
+
+def read_macro_data_file(file_path):
+    """
+    Parse the macro XML file into the structured macro data dict.
+    Streams the file with iterparse and clears each category/macro element once
+    it has been copied, so the element tree never holds the whole file.
+    """
+    data = empty_macro_data()
+    order_text = None
+    container = None  # <categories> or <macros> element currently being streamed
+    depth = 0
+    
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 2 and elem.tag in ("categories", "macros"):
+                container = elem
+            continue
+        depth -= 1
+        if depth == 2 and container is not None:
+            if elem.tag == "category" and container.tag == "categories":
+                hidden_elem = elem.find("hidden")
+                description_elem = elem.find("description")
+                data["categories"][intern_string(elem.get("id"))] = Category(
+                    elem.find("name").text,
+                    elem.find("created").text,
+                    elem.find("modified").text,
+                    description_elem.text if description_elem is not None else "",
+                    (hidden_elem.text.lower() == "true") if hidden_elem is not None else False
+                )
+            elif elem.tag == "macro" and container.tag == "macros":
+                data["macros"][elem.get("id")] = Macro(
+                    elem.find("name").text,
+                    elem.find("category_id").text,
+                    elem.find("content").text,
+                    elem.find("created").text,
+                    elem.find("modified").text,
+                    int(elem.find("version").text)
+                )
+            # Drop the finished element (and any earlier siblings) from the tree
+            container.clear()
+        elif depth == 1:
+            if elem.tag == "version":
+                data["version"] = elem.text
+            elif elem.tag == "category_order":
+                order_text = elem.text
+            elif elem.tag in ("categories", "macros"):
+                container = None
+    
+    # Load category order
+    if order_text:
+        data["category_order"] = [intern_string(cat_id) for cat_id in order_text.split(",")]
+    else:
+        data["category_order"] = list(data["categories"].keys())
     
-    if not macro_data_file_path or not os.path.exists(macro_data_file_path):
-        return {
-            "version": "1.0",
-            "categories": {},
-            "macros": {},
-            "category_order": []
-        }
-        
-    try:
-        tree = ET.parse(macro_data_file_path)
-        root = tree.getroot()
-        
-        data = {
-            "version": root.find("version").text if root.find("version") is not None else "1.0",
-            "categories": {},
-            "macros": {},
-            "category_order": []
-        }
-        
-        # Load categories
-        categories_elem = root.find("categories")
-        if categories_elem is not None:
-            for cat_elem in categories_elem.findall("category"):
-                cat_id = cat_elem.get("id")
-                data["categories"][cat_id] = {
-                    "name": cat_elem.find("name").text,
-                    "created": cat_elem.find("created").text,
-                    "modified": cat_elem.find("modified").text,
-                    "description": cat_elem.find("description").text if cat_elem.find("description") is not None else "",
-                    "hidden": (cat_elem.find("hidden").text.lower() == "true") if cat_elem.find("hidden") is not None else False
-                }
-        
-        # Load macros
-        macros_elem = root.find("macros")
-        if macros_elem is not None:
-            for macro_elem in macros_elem.findall("macro"):
-                macro_id = macro_elem.get("id")
-                data["macros"][macro_id] = {
-                    "name": macro_elem.find("name").text,
-                    "category_id": macro_elem.find("category_id").text,
-                    "content": macro_elem.find("content").text,
-                    "created": macro_elem.find("created").text,
-                    "modified": macro_elem.find("modified").text,
-                    "version": int(macro_elem.find("version").text)
-                }
-        
-        # Load category order
-        order_elem = root.find("category_order")
-        if order_elem is not None and order_elem.text:
-            data["category_order"] = order_elem.text.split(",")
+    return data
+
+# --- LAZY MACRO CONTENT ---
+# In lazy mode (config key 'lazy_content') the loader records where each macro's
+# <content> sits in the XML file and reads it only when it is first needed.
+lazy_content_loading = False
+macro_content_cache_size = 256  # Number of recently used content bodies kept decoded
+macro_content_cache = OrderedDict()  # (file_path, offset, length, encoding) -> content
+macro_content_lock = threading.RLock()  # Held while the XML file is rewritten
+
+class LazyMacro(Macro):
+    """
+    Macro record whose content is read from the XML file when it is accessed.
+    source is (file_path, offset, length, encoding) of the <content> element.
+    """
+    __slots__ = ("source",)
+
+    def __init__(self, name, category_id, created, modified, version, source):
+        # _content stays unset until the content has to be pinned in memory
+        self.name = name
+        self.category_id = intern_string(category_id)
+        self.created = intern_string(created)
+        self.modified = intern_string(modified)
+        self.version = version
+        self.source = source
+
+    @property
+    def content(self):
+        try:
+            return self._content
+        except AttributeError:
+            return read_lazy_content(self.source)
+
+    def replace(self, **changes):
+        if "content" in changes:
+            return super().replace(**changes)
+        # Unchanged content stays on disk
+        fields = {field: getattr(self, field) for field in ("name", "category_id", "created", "modified", "version")}
+        fields.update(changes)
+        macro = LazyMacro(source=self.source, **fields)
+        if hasattr(self, "_content"):
+            macro._content = self._content
+        return macro
+
+    def __reduce__(self):
+        if hasattr(self, "_content"):
+            return super().__reduce__()
+        return (LazyMacro, (self.name, self.category_id, self.created, self.modified, self.version, self.source))
+
+def read_lazy_content(source):
+    """Return the content at source, using the LRU cache of recently read bodies."""
+    with macro_content_lock:
+        if source in macro_content_cache:
+            macro_content_cache.move_to_end(source)
+            return macro_content_cache[source]
+        file_path, offset, length, encoding = source
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            raw = f.read(length)
+        tag_end = raw.find(b">")
+        if raw[:tag_end + 1].endswith(b"/>") or tag_end + 1 >= len(raw):
+            content = None  # <content /> or <content></content>
         else:
-            data["category_order"] = list(data["categories"].keys())
-        
-        return data
+            # Let the XML parser undo escaping exactly as a full load would
+            fragment = f'<?xml version="1.0" encoding="{encoding}"?><content>'.encode(encoding)
+            content = ET.fromstring(fragment + raw[tag_end + 1:] + b"</content>").text
+        macro_content_cache[source] = content
+        while len(macro_content_cache) > macro_content_cache_size:
+            macro_content_cache.popitem(last=False)
+        return content
+
+def read_macro_data_file_lazy(file_path):
+    """
+    Parse the macro XML file like read_macro_data_file, but return LazyMacro
+    records that hold the byte offset and length of their content instead of
+    the content itself.
+    """
+    data = empty_macro_data()
+    parser = xml.parsers.expat.ParserCreate()
+    parser.buffer_text = True
+    state = {"encoding": "utf-8", "record": None, "record_id": None, "text": None, "content_start": None, "source": None}
+    stack = []
+
+    def on_xml_decl(version, encoding, standalone):
+        if encoding:
+            state["encoding"] = encoding.lower()
+
+    def on_start(tag, attrs):
+        stack.append(tag)
+        depth = len(stack)
+        if depth == 3 and tag in ("category", "macro"):
+            state["record"] = {}
+            state["record_id"] = attrs.get("id")
+            state["source"] = None
+        elif depth == 4 and state["record"] is not None and tag == "content" and stack[1] == "macros":
+            state["content_start"] = parser.CurrentByteIndex
+            state["text"] = None  # Content is skipped, not decoded
+        elif depth in (2, 4):
+            state["text"] = []
+
+    def on_text(text):
+        if state["text"] is not None:
+            state["text"].append(text)
+
+    def on_end(tag):
+        depth = len(stack)
+        record = state["record"]
+        text = "".join(state["text"]) if state["text"] else None
+        if depth == 4 and record is not None:
+            if tag == "content" and stack[1] == "macros":
+                start = state["content_start"]
+                state["source"] = (file_path, start, parser.CurrentByteIndex - start, state["encoding"])
+            else:
+                record[tag] = text
+        elif depth == 3 and record is not None:
+            if tag == "macro" and stack[1] == "macros":
+                args = (record.get("name"), record.get("category_id"))
+                fields = (record.get("created"), record.get("modified"), int(record.get("version")))
+                if state["source"] is None:
+                    data["macros"][state["record_id"]] = Macro(*args, None, *fields)
+                else:
+                    data["macros"][state["record_id"]] = LazyMacro(*args, *fields, state["source"])
+            elif tag == "category" and stack[1] == "categories":
+                data["categories"][intern_string(state["record_id"])] = Category(
+                    record.get("name"),
+                    record.get("created"),
+                    record.get("modified"),
+                    record["description"] if "description" in record else "",
+                    (record["hidden"].lower() == "true") if "hidden" in record else False
+                )
+            state["record"] = None
+        elif depth == 2:
+            if tag == "version":
+                data["version"] = text
+            elif tag == "category_order" and text:
+                data["category_order"] = [intern_string(cat_id) for cat_id in text.split(",")]
+        state["text"] = None
+        stack.pop()
+
+    parser.XmlDeclHandler = on_xml_decl
+    parser.StartElementHandler = on_start
+    parser.CharacterDataHandler = on_text
+    parser.EndElementHandler = on_end
+    with open(file_path, "rb") as f:
+        parser.ParseFile(f)
+
+    if not data["category_order"]:
+        data["category_order"] = list(data["categories"].keys())
+    return data
+
+def replace_file_atomically(file_path, write_func):
+    """
+    Write a file by calling write_func(f) on a temp file in the same folder,
+    fsyncing it and renaming it into place, so readers (and sync clients)
+    never see a half-written file.
+    """
+    directory = os.path.dirname(file_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(5):
+            try:
+                os.replace(temp_path, file_path)
+                break
+            except PermissionError:
+                # Windows refuses while a sync client or scanner has the file open
+                if attempt == 4:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def write_json_file(file_path, data):
+    """Write data as indented JSON, atomically."""
+    replace_file_atomically(file_path, lambda f: f.write(json.dumps(data, indent=4).encode("utf-8")))
+
+def write_macro_data_file(file_path, data, category_order):
+    """Serialize the structured macro data dict to the macro XML file."""
+    root = ET.Element("macro_data")
+    
+    version_elem = ET.SubElement(root, "version")
+    version_elem.text = data.get("version", "1.0")
+    
+    order_elem = ET.SubElement(root, "category_order")
+    order_elem.text = ",".join(category_order)
+    
+    categories_elem = ET.SubElement(root, "categories")
+    for cat_id, cat_data in data["categories"].items():
+        cat_elem = ET.SubElement(categories_elem, "category", id=cat_id)
+        name_elem = ET.SubElement(cat_elem, "name")
+        name_elem.text = cat_data["name"]
+        created_elem = ET.SubElement(cat_elem, "created")
+        created_elem.text = cat_data["created"]
+        modified_elem = ET.SubElement(cat_elem, "modified")
+        modified_elem.text = cat_data["modified"]
+        desc_elem = ET.SubElement(cat_elem, "description")
+        desc_elem.text = cat_data.get("description", "")
+        hidden_elem = ET.SubElement(cat_elem, "hidden")
+        hidden_elem.text = str(cat_data.get("hidden", False))
+    
+    macros_elem = ET.SubElement(root, "macros")
+    for macro_id, macro_data in data["macros"].items():
+        macro_elem = ET.SubElement(macros_elem, "macro", id=macro_id)
+        name_elem = ET.SubElement(macro_elem, "name")
+        name_elem.text = macro_data["name"]
+        cat_id_elem = ET.SubElement(macro_elem, "category_id")
+        cat_id_elem.text = macro_data["category_id"]
+        content_elem = ET.SubElement(macro_elem, "content")
+        content_elem.text = macro_data["content"]
+        created_elem = ET.SubElement(macro_elem, "created")
+        created_elem.text = macro_data["created"]
+        modified_elem = ET.SubElement(macro_elem, "modified")
+        modified_elem.text = macro_data["modified"]
+        version_elem = ET.SubElement(macro_elem, "version")
+        version_elem.text = str(macro_data["version"])
+    
+    tree = ET.ElementTree(root)
+    replace_file_atomically(file_path, lambda f: tree.write(f, encoding="utf-8", xml_declaration=True))
+
+# --- ROTATING BACKUPS ---
+# Before macros.xml is overwritten, a gzip copy of it goes into the "backups"
+# folder next to it, at most once per backup_min_interval_seconds. Old copies
+# are pruned so that the newest copy in each of the last N hours, days and
+# weeks is kept (N per tier from backup_retention).
+backup_min_interval_seconds = 3600  # config key 'backup_interval_minutes'
+backup_retention = {"hourly": 24, "daily": 7, "weekly": 4}  # config key 'backup_retention'
+BACKUP_TIERS = {
+    "hourly": lambda ts: ts.strftime("%Y%m%d%H"),
+    "daily": lambda ts: ts.strftime("%Y%m%d"),
+    "weekly": lambda ts: ts.isocalendar()[:2],
+}
+last_backup_times = {}  # file path -> time of its newest backup
+
+def list_macro_backups(file_path):
+    """Return [(timestamp, backup path)] for file_path, newest first."""
+    backup_dir = os.path.join(os.path.dirname(file_path), "backups")
+    prefix = f"{os.path.basename(file_path)}."
+    backups = []
+    if os.path.isdir(backup_dir):
+        for name in os.listdir(backup_dir):
+            if not (name.startswith(prefix) and name.endswith(".gz")):
+                continue
+            try:
+                timestamp = datetime.strptime(name[len(prefix):-len(".gz")], "%Y%m%d-%H%M%S")
+            except ValueError:
+                continue
+            backups.append((timestamp, os.path.join(backup_dir, name)))
+    backups.sort(reverse=True)
+    return backups
+
+def backup_macro_data_file(file_path):
+    """Back up file_path (compressed) if its newest backup is older than the backup interval."""
+    if not os.path.exists(file_path):
+        return
+    if file_path not in last_backup_times:
+        backups = list_macro_backups(file_path)
+        last_backup_times[file_path] = backups[0][0] if backups else None
+    now = datetime.now()
+    last_backup = last_backup_times[file_path]
+    if last_backup is not None and (now - last_backup).total_seconds() < backup_min_interval_seconds:
+        return
+    import gzip
+    import shutil
+    backup_dir = os.path.join(os.path.dirname(file_path), "backups")
+    backup_path = os.path.join(backup_dir, f"{os.path.basename(file_path)}.{now:%Y%m%d-%H%M%S}.gz")
+    def write_backup(f):
+        with open(file_path, "rb") as source, gzip.GzipFile(fileobj=f, mode="wb") as compressed:
+            shutil.copyfileobj(source, compressed)
+    try:
+        os.makedirs(backup_dir, exist_ok=True)
+        replace_file_atomically(backup_path, write_backup)
+        last_backup_times[file_path] = now
+        prune_macro_backups(file_path)
     except Exception as e:
-        print(f"Error loading macro data: {e}")
-        return {
-            "version": "1.0",
-            "categories": {},
-            "macros": {},
-            "category_order": []
+        log_message(f"Error backing up {file_path}: {e}")
+
+def prune_macro_backups(file_path):
+    """Delete backups that no retention tier keeps."""
+    backups = list_macro_backups(file_path)
+    keep = set()
+    for tier, bucket_of in BACKUP_TIERS.items():
+        buckets = set()
+        for timestamp, backup_path in backups:
+            bucket = bucket_of(timestamp)
+            if bucket in buckets:
+                continue
+            if len(buckets) >= backup_retention.get(tier, 0):
+                break
+            buckets.add(bucket)
+            keep.add(backup_path)
+    for _, backup_path in backups:
+        if backup_path not in keep:
+            try:
+                os.remove(backup_path)
+            except OSError as e:
+                log_message(f"Error removing old backup {backup_path}: {e}")
+
+# --- SNAPSHOT CACHE ---
+# A pickled copy of the parsed XML file kept next to it ({xml}.snapshot), so
+# startup can skip parsing. The header is checked before the data is unpickled.
+SNAPSHOT_FORMAT = 2  # Bump when the snapshot layout or the data structure changes
+
+def hash_macro_data_file(file_path):
+    """Return a content hash of the macro XML file."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_macro_snapshot(file_path, signature):
+    """
+    Return the snapshotted data for file_path if it is still valid, else None.
+    signature is the XML file's (size, mtime). A snapshot whose size matches but
+    whose mtime doesn't (e.g. the file was touched or re-synced) is still used
+    if the content hash matches.
+    """
+    snapshot_path = f"{file_path}.snapshot"
+    if signature is None or not os.path.exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, "rb") as f:
+            header = pickle.load(f)
+            if header.get("format") != SNAPSHOT_FORMAT or header.get("size") != signature[0]:
+                return None
+            if header.get("lazy_content", False) != lazy_content_loading:
+                return None
+            # Lazy records point at their content by absolute path, so the snapshot
+            # is no use once the data folder is moved, synced elsewhere or restored
+            if lazy_content_loading and header.get("file_path") != os.path.abspath(file_path):
+                return None
+            if header.get("mtime_ns") != signature[1] and header.get("hash") != hash_macro_data_file(file_path):
+                return None
+            return pickle.load(f)
+    except Exception as e:
+        log_message(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+        return None
+
+def write_macro_snapshot(file_path, data, signature):
+    """Write data as the snapshot of file_path, whose (size, mtime) is signature."""
+    snapshot_path = f"{file_path}.snapshot"
+    try:
+        file_hash = hash_macro_data_file(file_path)
+        stat = os.stat(file_path)
+        if (stat.st_size, stat.st_mtime_ns) != tuple(signature):
+            return  # The file changed since data was read from it
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "size": signature[0],
+            "mtime_ns": signature[1],
+            "hash": file_hash,
+            "lazy_content": lazy_content_loading,
+            "file_path": os.path.abspath(file_path)
         }
+        def write_snapshot(f):
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace_file_atomically(snapshot_path, write_snapshot)
+    except Exception as e:
+        log_message(f"Error writing snapshot {snapshot_path}: {e}")
+
+def copy_macro_data(data):
+    """Return a copy of data that is safe to serialize while the store keeps changing."""
+    # Store records are replaced rather than edited, so copying the containers is enough
+    return {
+        "version": data.get("version", "1.0"),
+        "categories": dict(data["categories"]),
+        "macros": dict(data["macros"]),
+        "category_order": list(data.get("category_order", []))
+    }
 
-def save_macro_data(data, category_order=None):
-    """Save the structured macro data to XML file."""
-    global macro_data_file_path
-    
-    if not macro_data_file_path:
-        print("Cannot save macro data: File path is not set")
-        return False
-        
-    # Ensure directory exists
-    data_dir = os.path.dirname(macro_data_file_path)
-    if not os.path.exists(data_dir):
+# --- BACKGROUND SAVING ---
+save_delay_seconds = 1.0  # Saves requested within this window are coalesced into one write
+save_max_delay_seconds = 5.0  # A steady stream of changes still gets written this often
+compact_idle_seconds = 30.0  # Fold the journal into the XML file once edits pause this long
+
+class BackgroundSaver:
+    """
+    Runs save jobs on a worker thread so file writes don't block the UI.
+    Jobs are keyed by what they save; scheduling a key that is already
+    pending replaces its job and pushes it back, so a burst of changes
+    costs one write. flush() runs everything pending right away.
+    """
+    def __init__(self):
+        self._jobs = {}  # key -> (func, due time, time first requested)
+        self._running = 0  # Jobs taken by the worker and not finished yet
+        self._condition = threading.Condition()
+        self._run_lock = threading.Lock()  # Jobs never run concurrently
+        self._thread = None
+
+    def schedule(self, key, func, delay=None):
+        """Run func after delay seconds (default save_delay_seconds) unless rescheduled."""
+        if delay is None:
+            delay = save_delay_seconds
+        now = time.monotonic()
+        with self._condition:
+            first_requested = self._jobs[key][2] if key in self._jobs else now
+            due = min(now + delay, first_requested + max(delay, save_max_delay_seconds))
+            self._jobs[key] = (func, due, first_requested)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    due_keys = [key for key, (_, due, _) in self._jobs.items() if due <= now]
+                    if due_keys:
+                        jobs = [self._jobs.pop(key)[0] for key in due_keys]
+                        self._running += len(jobs)
+                        break
+                    timeout = min((due for _, due, _ in self._jobs.values()), default=now + 60) - now
+                    self._condition.wait(timeout)
+            for func in jobs:
+                self._execute(func)
+                with self._condition:
+                    self._running -= 1
+                    self._condition.notify_all()
+
+    def _execute(self, func):
+        with self._run_lock:
+            try:
+                func()
+            except Exception as e:
+                print(f"Error in background save: {e}")
+
+    def flush(self):
+        """Run all pending jobs now and wait for any job already in progress."""
+        with self._condition:
+            # Let a job the worker already took finish first so writes stay in order
+            while self._running:
+                self._condition.wait()
+            jobs = [func for func, _, _ in self._jobs.values()]
+            self._jobs.clear()
+        for func in jobs:
+            self._execute(func)
+
+background_saver = BackgroundSaver()
+
+class MacroJournal:
+    """
+    Append-only log of macro store mutations kept next to the macro XML file.
+    Each line is one JSON record; records are folded into the XML file by
+    MacroStore.compact() and replayed on load if the app exited before that.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.record_count = 0  # Records not yet folded into the XML file
+
+    def append(self, record):
+        """Append one record and flush it to disk."""
+        line = (json.dumps(record, ensure_ascii=False, default=dict) + "\n").encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.record_count += 1
+
+    def size(self):
+        """Return the journal size in bytes."""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read_records(self):
+        """Return all complete records, cutting off a torn last line left by a crash."""
+        records = []
+        if not os.path.exists(self.path):
+            self.record_count = 0
+            return records
+        good_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line.decode("utf-8")))
+                except ValueError:
+                    break
+                good_size += len(line)
+        if good_size < self.size():
+            log_message(f"Discarding incomplete journal tail in {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(good_size)
+        self.record_count = len(records)
+        return records
+
+    def discard(self, upto=None):
+        """Drop records that are now in the XML file: all of them, or the first `upto` bytes."""
+        if upto is None or upto >= self.size():
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.record_count = 0
+            return
+        with open(self.path, "rb") as f:
+            f.seek(upto)
+            remainder = f.read()
+        replace_file_atomically(self.path, lambda f: f.write(remainder))
+        self.record_count = remainder.count(b"\n")
+
+journal_compact_threshold = 200  # Journal records before they are folded into the XML file
+
+class MacroStore:
+    """
+    Authoritative in-memory copy of the macro data file.
+    The XML file is parsed once and every read is served from memory. The
+    store only reloads when the file changes on disk (cloud sync, restore,
+    editing the XML by hand), detected via its size and modification time.
+    Name and category lookups go through indexes that are kept up to date
+    by the mutation methods below.
+    Edits are appended to a MacroJournal instead of rewriting the XML file;
+    compact() folds the journal back into the XML file in the background
+    once edits pause or the journal grows past journal_compact_threshold,
+    and at shutdown.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.data = empty_macro_data()
+        self.dirty = False  # True while the journal holds edits not yet in the XML file
+        self.loaded = False
+        self.load_failed = False  # True while the data file exists but can't be read; nothing is saved then
+        self.journal = MacroJournal(f"{file_path}.journal") if file_path else None
+        self._file_signature = None
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()  # One compaction at a time
+        self._compacting = False
+        self._category_id_by_name = {}  # category name -> category ID
+        self._macro_id_by_key = {}  # (category ID, macro name) -> macro ID
+        self._macro_ids_by_category = {}  # category ID -> set of macro IDs
+        self.generation = 0  # Bumped on every change that can alter search results
+        self.category_generation = 0  # Bumped when a category is added, changed or removed
+        # Search index, built on the first search and then kept up to date
+        self._token_postings = None  # token -> set of macro IDs
+        self._sorted_tokens = []  # All tokens in _token_postings, for prefix lookups
+        self._note_texts = {}  # macro ID -> usage notes text
+        self._note_tokens = {}  # macro ID -> set of tokens from its usage notes
+        # Substring index: trigram of lowercased name/content -> array of document
+        # numbers. Postings are append-only; a changed macro gets a new document
+        # number and its old one is left dead until the index is rebuilt.
+        self._trigram_postings = None
+        self._trigram_docs = []  # document number -> macro ID, or None once dead
+        self._trigram_doc_by_id = {}  # macro ID -> live document number
+        self._short_text_ids = set()  # Macros with a name or content too short to have a trigram
+        # Fuzzy name matching, also built on the first search
+        self._fuzzy_names = None  # macro ID -> lowercased single-line name
+        self._name_words = {}  # word in a macro name -> set of macro IDs
+        self._words_by_initial = {}  # first character -> {word in a macro name: char_mask(word)}
+        self._name_blob = None  # (names joined by newlines, row start offsets, row macro IDs)
+
+    # --- Indexes ---
+    def _rebuild_indexes(self):
+        """Rebuild all lookup indexes from self.data."""
+        self.generation += 1
+        self.category_generation += 1
+        self._category_id_by_name = {}
+        self._macro_id_by_key = {}
+        self._macro_ids_by_category = {}
+        self._token_postings = None
+        self._sorted_tokens = []
+        self._trigram_postings = None
+        self._fuzzy_names = None
+        categories = self.data["categories"]
+        macros = self.data["macros"]
+        for cat_id, cat_data in categories.items():
+            if not isinstance(cat_data, Category):
+                cat_data = categories[cat_id] = Category.from_mapping(cat_data)
+            self._category_id_by_name.setdefault(cat_data.name, cat_id)
+        for macro_id, macro in macros.items():
+            if not isinstance(macro, Macro):
+                macro = macros[macro_id] = Macro.from_mapping(macro)
+            self._index_macro(macro_id, macro)
+
+    def _index_macro(self, macro_id, macro):
+        cat_id = macro["category_id"]
+        self._macro_id_by_key.setdefault((cat_id, macro["name"]), macro_id)
+        self._macro_ids_by_category.setdefault(cat_id, set()).add(macro_id)
+        if self._token_postings is not None:
+            self._add_postings(macro_id, macro_search_tokens(macro))
+        if self._trigram_postings is not None:
+            self._add_trigrams(macro_id, macro)
+        if self._fuzzy_names is not None:
+            self._add_fuzzy_name(macro_id, macro)
+
+    def _unindex_macro(self, macro_id, macro):
+        if self._token_postings is not None:
+            # Tokens that the macro's notes still contribute stay posted
+            tokens = macro_search_tokens(macro) - self._note_tokens.get(macro_id, set())
+            self._remove_postings(macro_id, tokens)
+        if self._trigram_postings is not None:
+            self._remove_trigrams(macro_id)
+        if self._fuzzy_names is not None:
+            self._remove_fuzzy_name(macro_id)
+        cat_id = macro["category_id"]
+        key = (cat_id, macro["name"])
+        ids_in_cat = self._macro_ids_by_category.get(cat_id)
+        if ids_in_cat is not None:
+            ids_in_cat.discard(macro_id)
+            if not ids_in_cat:
+                del self._macro_ids_by_category[cat_id]
+        if self._macro_id_by_key.get(key) == macro_id:
+            del self._macro_id_by_key[key]
+            # Another macro in the same category may share the name
+            for other_id in ids_in_cat or ():
+                if self.data["macros"][other_id]["name"] == macro["name"]:
+                    self._macro_id_by_key[key] = other_id
+                    break
+
+    def _index_category(self, cat_id, cat_data):
+        self._category_id_by_name.setdefault(cat_data["name"], cat_id)
+
+    def _unindex_category(self, cat_id, cat_data):
+        name = cat_data["name"]
+        if self._category_id_by_name.get(name) == cat_id:
+            del self._category_id_by_name[name]
+            # Fall back to another category with the same name, if any
+            for other_id, other in self.data["categories"].items():
+                if other_id != cat_id and other["name"] == name:
+                    self._category_id_by_name[name] = other_id
+                    break
+
+    # Low-level edits that keep data and indexes in sync. They don't save.
+    # Records are replaced rather than modified in place, which lets compact()
+    # work from a shallow copy of the data.
+    def _put_macro(self, macro_id, macro):
+        self.generation += 1
+        macros = self.data["macros"]
+        if macro_id in macros:
+            self._unindex_macro(macro_id, macros[macro_id])
+        macros[macro_id] = macro
+        self._index_macro(macro_id, macro)
+
+    def _remove_macro(self, macro_id):
+        self.generation += 1
+        macro = self.data["macros"].pop(macro_id, None)
+        if macro is not None:
+            self._unindex_macro(macro_id, macro)
+            self._set_note_text(macro_id, "")
+        return macro
+
+    def _put_category(self, cat_id, cat_data):
+        self.generation += 1
+        self.category_generation += 1
+        categories = self.data["categories"]
+        if cat_id in categories:
+            self._unindex_category(cat_id, categories[cat_id])
+        else:
+            self.data["category_order"].append(cat_id)  # New categories go last
+        categories[cat_id] = cat_data
+        self._index_category(cat_id, cat_data)
+
+    def _remove_category(self, cat_id):
+        self.generation += 1
+        self.category_generation += 1
+        cat_data = self.data["categories"].pop(cat_id, None)
+        if cat_data is not None:
+            self._unindex_category(cat_id, cat_data)
+        return cat_data
+
+    def _apply_record(self, record):
+        """Apply one journal record to the in-memory data."""
+        op = record.get("op")
+        if op == "put_macro":
+            self._put_macro(record["id"], Macro.from_mapping(record["record"]))
+        elif op == "remove_macro":
+            self._remove_macro(record["id"])
+        elif op == "put_category":
+            self._put_category(record["id"], Category.from_mapping(record["record"]))
+        elif op == "remove_category":
+            self._remove_category(record["id"])
+        elif op == "set_order":
+            self.data["category_order"] = list(record["order"])
+        elif op == "batch":
+            for sub_record in record["records"]:
+                self._apply_record(sub_record)
+        else:
+            log_message(f"Skipping unknown journal record: {op}")
+
+    # --- Loading and saving ---
+    def _disk_signature(self):
+        """Return (size, mtime) of the data file, or None if it doesn't exist."""
+        if not self.file_path:
+            return None
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def ensure_loaded(self):
+        """Return the in-memory data, (re)loading it if the file changed on disk."""
+        with self._lock:
+            if self.loaded and self._compacting:
+                return self.data  # The file is being rewritten by compact()
+            signature = self._disk_signature()
+            if self.loaded and signature == self._file_signature:
+                return self.data
+            if signature is None:
+                self.data = empty_macro_data()
+            else:
+                self.data = read_macro_snapshot(self.file_path, signature)
+                if self.data is None:
+                    try:
+                        if lazy_content_loading:
+                            self.data = read_macro_data_file_lazy(self.file_path)
+                        else:
+                            self.data = read_macro_data_file(self.file_path)
+                        # Snapshot it in the background so the next start skips parsing
+                        threading.Thread(
+                            target=write_macro_snapshot,
+                            args=(self.file_path, copy_macro_data(self.data), signature),
+                            daemon=True
+                        ).start()
+                    except Exception as e:
+                        # E.g. a sync client or virus scanner has the file locked. Serve
+                        # empty data for now and retry on the next call, without marking
+                        # it loaded, so it can't be saved over the real file.
+                        print(f"Error loading macro data: {e}")
+                        self.data = empty_macro_data()
+                        self._rebuild_indexes()
+                        self._file_signature = None
+                        self.loaded = False
+                        self.load_failed = True
+                        return self.data
+            self._rebuild_indexes()
+            # Replay edits that haven't been folded into the XML file yet. After
+            # an external change (e.g. cloud sync) this re-applies local edits on top.
+            records = self.journal.read_records() if self.journal else []
+            if records:
+                log_message(f"Replaying {len(records)} journal record(s) onto {self.file_path}")
+                for record in records:
+                    self._apply_record(record)
+            self._file_signature = signature
+            self.loaded = True
+            self.load_failed = False
+            self.dirty = bool(records)
+            return self.data
+
+    def _ensure_data_dir(self):
+        """Create the data directory if needed. Returns False if that fails."""
+        if not self.file_path:
+            print("Cannot save macro data: File path is not set")
+            return False
+        data_dir = os.path.dirname(self.file_path)
+        if data_dir and not os.path.exists(data_dir):
+            try:
+                os.makedirs(data_dir, exist_ok=True)
+            except Exception as e:
+                print(f"Error creating data directory: {e}")
+                return False
+        return True
+
+    def _write_file(self, data):
+        """Write a full copy of the data to the XML file. Returns True on success."""
+        if not self._ensure_data_dir():
+            return False
+        categories = data["categories"]
+        order = [cat_id for cat_id in data.get("category_order", []) if cat_id in categories]
+        order += [cat_id for cat_id in categories if cat_id not in order]
+        data["category_order"] = order
+        # Lazy content reads wait until records point into the new file
+        with macro_content_lock:
+            backup_macro_data_file(self.file_path)
+            try:
+                write_macro_data_file(self.file_path, data, order)
+            except Exception as e:
+                print(f"Error saving macro data: {e}")
+                return False
+            self._repoint_lazy_macros(data)
+        write_macro_snapshot(self.file_path, data, self._disk_signature())
+        return True
+
+    def _repoint_lazy_macros(self, data):
+        """After writing data to the XML file, point its lazy records at their content's new offsets."""
+        lazy_macros = [(macro_id, macro) for macro_id, macro in data["macros"].items()
+                       if isinstance(macro, LazyMacro)]
+        macro_content_cache.clear()
+        if not lazy_macros:
+            return
         try:
-            os.makedirs(data_dir, exist_ok=True)
+            written = read_macro_data_file_lazy(self.file_path)["macros"]
         except Exception as e:
-            print(f"Error creating data directory: {e}")
+            print(f"Error indexing macro content, loading it instead: {e}")
+            written = read_macro_data_file(self.file_path)["macros"]
+        for macro_id, macro in lazy_macros:
+            new_record = written.get(macro_id)
+            if new_record is None:
+                continue
+            # Same content at a new place; updating the record in place is safe
+            if isinstance(new_record, LazyMacro):
+                macro.source = new_record.source
+            else:
+                macro._content = new_record["content"]
+
+    def _log(self, record):
+        """Append a mutation record to the journal. Returns True on success."""
+        if self.load_failed:
+            print(f"Not saving change: {self.file_path} could not be read")
             return False
-            
-    try:
-        root = ET.Element("macro_data")
-        
-        version_elem = ET.SubElement(root, "version")
-        version_elem.text = data.get("version", "1.0")
-        
-        if category_order is None:
-            category_order = list(data["categories"].keys())
-        order_elem = ET.SubElement(root, "category_order")
-        order_elem.text = ",".join(category_order)
-        
-        categories_elem = ET.SubElement(root, "categories")
-        for cat_id, cat_data in data["categories"].items():
-            cat_elem = ET.SubElement(categories_elem, "category", id=cat_id)
-            name_elem = ET.SubElement(cat_elem, "name")
-            name_elem.text = cat_data["name"]
-            created_elem = ET.SubElement(cat_elem, "created")
-            created_elem.text = cat_data["created"]
-            modified_elem = ET.SubElement(cat_elem, "modified")
-            modified_elem.text = cat_data["modified"]
-            desc_elem = ET.SubElement(cat_elem, "description")
-            desc_elem.text = cat_data.get("description", "")
-            hidden_elem = ET.SubElement(cat_elem, "hidden")
-            hidden_elem.text = str(cat_data.get("hidden", False))
-        
-        macros_elem = ET.SubElement(root, "macros")
-        for macro_id, macro_data in data["macros"].items():
-            macro_elem = ET.SubElement(macros_elem, "macro", id=macro_id)
-            name_elem = ET.SubElement(macro_elem, "name")
-            name_elem.text = macro_data["name"]
-            cat_id_elem = ET.SubElement(macro_elem, "category_id")
-            cat_id_elem.text = macro_data["category_id"]
-            content_elem = ET.SubElement(macro_elem, "content")
-            content_elem.text = macro_data["content"]
-            created_elem = ET.SubElement(macro_elem, "created")
-            created_elem.text = macro_data["created"]
-            modified_elem = ET.SubElement(macro_elem, "modified")
-            modified_elem.text = macro_data["modified"]
-            version_elem = ET.SubElement(macro_elem, "version")
-            version_elem.text = str(macro_data["version"])
-        
-        tree = ET.ElementTree(root)
-        
-        # Create a backup before saving
-        if os.path.exists(macro_data_file_path):
-            backup_path = f"{macro_data_file_path}.bak"
-            import shutil
-            shutil.copy2(macro_data_file_path, backup_path)
-            
-        tree.write(macro_data_file_path, encoding="utf-8", xml_declaration=True)
+        if not self._ensure_data_dir():
+            return False
+        try:
+            self.journal.append(record)
+        except Exception as e:
+            print(f"Error writing macro journal: {e}")
+            return False
+        self.dirty = True
+        # Bursts of edits end in one XML write, sooner if the journal gets long
+        delay = 0 if self.journal.record_count >= journal_compact_threshold else compact_idle_seconds
+        background_saver.schedule(("compact", self.file_path), self.compact, delay)
         return True
-    except Exception as e:
-        print(f"Error saving macro data: {e}")
-        return False
+
+    def compact(self):
+        """Fold the journal into the XML file. Safe to call from any thread."""
+        with self._compact_lock:
+            with self._lock:
+                if self.load_failed:
+                    return False  # Writing now would replace the file with the empty fallback data
+                if not self.loaded or not self.dirty or not self.journal:
+                    self._compacting = False
+                    return True
+                self._compacting = True
+                snapshot = copy_macro_data(self.data)
+                journal_size = self.journal.size()
+            try:
+                # Edits made while the file is written stay in the journal past journal_size
+                written = self._write_file(snapshot)
+                with self._lock:
+                    if written:
+                        self.journal.discard(journal_size)
+                        self._file_signature = self._disk_signature()
+                        self.dirty = self.journal.record_count > 0
+                    return written
+            except Exception as e:
+                print(f"Error compacting macro journal: {e}")
+                return False
+            finally:
+                self._compacting = False
+
+    # --- Lookups ---
+    def category_id_by_name(self, name):
+        """Return the ID of the category with this name, or None."""
+        self.ensure_loaded()
+        return self._category_id_by_name.get(name)
+
+    def macro_id_by_name(self, name, category_id=None):
+        """Return the ID of the macro with this name (optionally within a category), or None."""
+        self.ensure_loaded()
+        if category_id is not None:
+            return self._macro_id_by_key.get((category_id, name))
+        for cat_id in self._macro_ids_by_category:
+            macro_id = self._macro_id_by_key.get((cat_id, name))
+            if macro_id:
+                return macro_id
+        return None
+
+    def macro_content(self, macro_id):
+        """Return the content of a macro, reading it from disk if it is lazily loaded."""
+        macro = self.ensure_loaded()["macros"].get(macro_id)
+        return macro["content"] if macro is not None else None
+
+    def macro_id_for_key(self, macro_key):
+        """Return the macro ID for a UI (category name, macro name) key, or None."""
+        cat_id = self.category_id_by_name(macro_key[0])
+        if cat_id is None:
+            return None
+        return self._macro_id_by_key.get((cat_id, macro_key[1]))
+
+    def macro_count_in_category(self, category_id):
+        """Return how many macros belong to a category."""
+        self.ensure_loaded()
+        return len(self._macro_ids_by_category.get(category_id, ()))
+
+    def macro_ids_in_category(self, category_id):
+        """Return the IDs of the macros in a category."""
+        self.ensure_loaded()
+        return list(self._macro_ids_by_category.get(category_id, ()))
+
+    def snapshot_items(self, mapping):
+        """
+        Return the items of one of the data's dicts, copied under the store lock
+        so that the search worker thread doesn't race edits made on the Tk thread.
+        """
+        with self._lock:
+            return list(mapping.items())
+
+    # --- Search ---
+    def _add_postings(self, macro_id, tokens):
+        for token in tokens:
+            postings = self._token_postings.get(token)
+            if postings is None:
+                postings = self._token_postings[token] = set()
+                bisect.insort(self._sorted_tokens, token)
+            postings.add(macro_id)
+
+    def _remove_postings(self, macro_id, tokens):
+        for token in tokens:
+            postings = self._token_postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(macro_id)
+            if not postings:
+                del self._token_postings[token]
+                index = bisect.bisect_left(self._sorted_tokens, token)
+                if index < len(self._sorted_tokens) and self._sorted_tokens[index] == token:
+                    del self._sorted_tokens[index]
+
+    def _build_search_index(self):
+        """Index the tokens of every macro's name, content and usage notes."""
+        self._token_postings = {}
+        for macro_id, macro in self.data["macros"].items():
+            for token in macro_search_tokens(macro) | self._note_tokens.get(macro_id, set()):
+                self._token_postings.setdefault(token, set()).add(macro_id)
+        self._sorted_tokens = sorted(self._token_postings)
+
+    def _set_note_text(self, macro_id, text):
+        """Index a macro's usage notes text (empty to remove them)."""
+        if self._note_texts.get(macro_id, "") == text:
+            return
+        self.generation += 1
+        old_tokens = self._note_tokens.pop(macro_id, set())
+        self._note_texts.pop(macro_id, None)
+        new_tokens = set(search_tokens(text))
+        if text:
+            self._note_texts[macro_id] = text
+            self._note_tokens[macro_id] = new_tokens
+        if self._token_postings is None:
+            return
+        macro = self.data["macros"].get(macro_id)
+        record_tokens = macro_search_tokens(macro) if macro is not None else set()
+        self._remove_postings(macro_id, old_tokens - new_tokens - record_tokens)
+        self._add_postings(macro_id, new_tokens - old_tokens)
+
+    def set_usage_notes(self, notes_by_key):
+        """Index usage notes, given as {(category name, macro name): {"notes": text}}."""
+        with self._lock:
+            self.ensure_loaded()
+            texts = {}
+            for macro_key, note_data in notes_by_key.items():
+                macro_id = self.macro_id_for_key(macro_key)
+                text = note_data.get("notes", "") if isinstance(note_data, dict) else str(note_data or "")
+                if macro_id and text:
+                    texts[macro_id] = text
+            for macro_id in list(self._note_texts):
+                if macro_id not in texts:
+                    self._set_note_text(macro_id, "")
+            for macro_id, text in texts.items():
+                self._set_note_text(macro_id, text)
+
+    def _token_matches(self, word):
+        """Return IDs of macros with a token starting with word."""
+        start = bisect.bisect_left(self._sorted_tokens, word)
+        matches = set()
+        for token in itertools.islice(self._sorted_tokens, start, None):
+            if not token.startswith(word):
+                break
+            matches |= self._token_postings[token]
+        return matches
+
+    def _add_trigrams(self, macro_id, macro):
+        trigrams, short = macro_trigrams(macro)
+        doc = len(self._trigram_docs)
+        self._trigram_docs.append(macro_id)
+        self._trigram_doc_by_id[macro_id] = doc
+        for trigram in trigrams:
+            postings = self._trigram_postings.get(trigram)
+            if postings is None:
+                postings = self._trigram_postings[trigram] = array.array("I")
+            postings.append(doc)
+        if short:
+            self._short_text_ids.add(macro_id)
+
+    def _remove_trigrams(self, macro_id):
+        doc = self._trigram_doc_by_id.pop(macro_id, None)
+        if doc is not None:
+            self._trigram_docs[doc] = None
+        self._short_text_ids.discard(macro_id)
+        # Rebuild on the next search once most postings point at dead documents
+        if len(self._trigram_docs) > 1000 and len(self._trigram_doc_by_id) * 2 < len(self._trigram_docs):
+            self._trigram_postings = None
+
+    def _build_trigram_index(self):
+        self._trigram_postings = {}
+        self._trigram_docs = []
+        self._trigram_doc_by_id = {}
+        self._short_text_ids = set()
+        for macro_id, macro in self.data["macros"].items():
+            self._add_trigrams(macro_id, macro)
+
+    def _substring_matches(self, search_term):
+        """Return IDs of macros whose name or content contains search_term (lowercase)."""
+        if self._trigram_postings is None:
+            self._build_trigram_index()
+        if len(search_term) >= 3:
+            # Every trigram of the term must occur; start from the rarest
+            postings = []
+            for i in range(len(search_term) - 2):
+                trigram_docs = self._trigram_postings.get(search_term[i:i + 3])
+                if not trigram_docs:
+                    return set()
+                postings.append(trigram_docs)
+            postings.sort(key=len)
+            candidate_docs = set(postings[0])
+            for trigram_docs in postings[1:]:
+                # Once few candidates remain, verifying them beats scanning long postings
+                if len(candidate_docs) * 16 < len(trigram_docs):
+                    break
+                candidate_docs.intersection_update(trigram_docs)
+                if not candidate_docs:
+                    return set()
+        else:
+            # Shorter terms occur inside some trigram, or in a text shorter than one
+            candidate_docs = set()
+            for trigram, trigram_docs in self._trigram_postings.items():
+                if search_term in trigram:
+                    candidate_docs.update(trigram_docs)
+        candidates = {self._trigram_docs[doc] for doc in candidate_docs}
+        candidates.discard(None)
+        if len(search_term) < 3:
+            candidates |= self._short_text_ids
+        # The trigrams can all occur without the term itself; check each candidate
+        macros = self.data["macros"]
+        matches = set()
+        for macro_id in candidates:
+            macro = macros[macro_id]
+            if search_term in macro["name"].lower() or search_term in (macro["content"] or "").lower():
+                matches.add(macro_id)
+        return matches
+
+    def _word_matches(self, words):
+        """Return IDs of macros where every word starts a word in the name, content or usage notes."""
+        if self._token_postings is None:
+            self._build_search_index()
+        result = None
+        # Longest words first: they usually have the fewest matches
+        for word in sorted(words, key=len, reverse=True):
+            matches = self._token_matches(word)
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result or set()
+
+    def _candidate_matches(self, search_term, words, candidates):
+        """Return the candidates search_macro_ids would match, checking each one directly."""
+        macros = self.data["macros"]
+        matches = self._word_matches(words).intersection(candidates) if words else set()
+        for macro_id in candidates:
+            macro = macros.get(macro_id)
+            if macro is None or macro_id in matches:
+                continue
+            if search_term in macro["name"].lower() or search_term in (macro["content"] or "").lower():
+                matches.add(macro_id)
+        return matches
+
+    def search_macro_ids(self, search_term, candidates=None):
+        """
+        Return IDs of macros whose name or content contains search_term, or
+        where every word of search_term starts a word in the name, content or
+        usage notes. Returns None if callers should scan instead. If
+        candidates is given, only those macros are checked.
+        """
+        search_term = search_term.lower().strip()
+        if not search_term:
+            return None
+        words = set(search_tokens(search_term))
+        with self._lock:
+            self.ensure_loaded()
+            if candidates is not None:
+                return self._candidate_matches(search_term, words, candidates)
+            matches = self._substring_matches(search_term)
+            if matches is None:
+                return None
+            if words:
+                matches |= self._word_matches(words)
+            return matches
+
+    def _add_fuzzy_name(self, macro_id, macro):
+        name = macro["name"].lower().replace("\n", " ")
+        self._fuzzy_names[macro_id] = name
+        self._name_blob = None
+        for word in set(search_tokens(name)):
+            ids = self._name_words.get(word)
+            if ids is None:
+                ids = self._name_words[word] = set()
+                if not word.isdigit():
+                    self._words_by_initial.setdefault(word[0], {})[word] = char_mask(word)
+            ids.add(macro_id)
+
+    def _remove_fuzzy_name(self, macro_id):
+        name = self._fuzzy_names.pop(macro_id, None)
+        if name is None:
+            return
+        self._name_blob = None
+        for word in set(search_tokens(name)):
+            ids = self._name_words.get(word)
+            if ids is not None:
+                ids.discard(macro_id)
+                if not ids:
+                    del self._name_words[word]
+                    self._words_by_initial.get(word[0], {}).pop(word, None)
+
+    def _build_fuzzy_index(self):
+        self._fuzzy_names = {}
+        self._name_words = {}
+        self._words_by_initial = {}
+        self._name_blob = None
+        for macro_id, macro in self.data["macros"].items():
+            self._add_fuzzy_name(macro_id, macro)
+
+    def _name_rows(self):
+        """Return all names joined into one string, so a single regex pass can match them."""
+        if self._name_blob is None:
+            ids = list(self._fuzzy_names)
+            names = [self._fuzzy_names[macro_id] for macro_id in ids]
+            starts = list(itertools.accumulate((len(name) + 1 for name in names), initial=0))
+            self._name_blob = ("\n".join(names), starts[:-1], ids)
+        return self._name_blob
+
+    def _typo_matches(self, word):
+        """Return {macro ID: edits} for names with a word within typo_limit(word) edits of word."""
+        limit = typo_limit(word)
+        if not limit or word.isdigit():
+            return {}
+        query_mask = char_mask(word)
+        # Like most fuzzy finders, assume the first letter is right (or swapped with the second)
+        candidates = itertools.chain(self._words_by_initial.get(word[0], {}).items(),
+                                     self._words_by_initial.get(word[1], {}).items() if word[1] != word[0] else ())
+        matches = {}
+        for name_word, mask in candidates:
+            # Each query character missing from the word costs at least one edit
+            if len(name_word) < len(word) - limit or bin(query_mask & ~mask).count("1") > limit:
+                continue
+            edits = bounded_edit_distance(word, name_word, limit)
+            if edits > limit and len(name_word) > len(word):
+                # Also accept typos in a prefix ("deplyo" for "deployment")
+                edits = bounded_edit_distance(word, name_word[:len(word)], limit)
+            if edits <= limit:
+                for macro_id in self._name_words[name_word]:
+                    if edits < matches.get(macro_id, limit + 1):
+                        matches[macro_id] = edits
+        return matches
+
+    def fuzzy_name_matches(self, search_term, candidates=None):
+        """
+        Score macro names against search_term the way a command palette does:
+        names containing the term first, then names containing its characters
+        in order, then names with words a typo or two away from the query
+        words. If candidates is given, only those macros are checked for the
+        first two tiers (a refinement of an earlier query).
+
+        Returns ({macro ID: score}, IDs of all names containing the term's
+        characters in order); higher scores are better. The second set holds
+        every match of a longer query that starts with this one.
+        """
+        term = " ".join(search_term.lower().split())
+        query = term.replace(" ", "")
+        if not query:
+            return {}, set()
+        with self._lock:
+            self.ensure_loaded()
+            if self._fuzzy_names is None:
+                self._build_fuzzy_index()
+            blob, starts, ids = self._name_rows()
+            # "[^x\n]*x" can't backtrack, so a failed match costs linear time
+            pattern = re.compile(re.escape(query[0]) + "".join(
+                f"[^{re.escape(char)}\n]*{re.escape(char)}" for char in query[1:]
+            ))
+            name_matches = []  # (macro ID, name, match start in name, match length)
+            if candidates is None:
+                last_row = -1
+                for match in pattern.finditer(blob):
+                    row = bisect.bisect_right(starts, match.start()) - 1
+                    if row != last_row:
+                        last_row = row
+                        name_matches.append((ids[row], self._fuzzy_names[ids[row]],
+                                             match.start() - starts[row], match.end() - match.start()))
+            else:
+                for macro_id in candidates:
+                    name = self._fuzzy_names.get(macro_id)
+                    match = pattern.search(name) if name is not None else None
+                    if match:
+                        name_matches.append((macro_id, name, match.start(), match.end() - match.start()))
+
+            scores = {}
+            for macro_id, name, start, length in name_matches:
+                position = start if length == len(query) == len(term) else name.find(term)
+                if position >= 0:
+                    score = FUZZY_SUBSTRING_SCORE
+                else:
+                    # Scattered matches are noise: start at a word and stay fairly close
+                    position = start
+                    gaps = length - len(query)
+                    if (position and name[position - 1].isalnum()) or gaps > 3 * len(query):
+                        continue
+                    score = FUZZY_SUBSEQUENCE_SCORE - min(gaps, 30)
+                if position == 0:
+                    score += 10
+                elif not name[position - 1].isalnum():
+                    score += 5
+                # Prefer names close to the query's length
+                scores[macro_id] = score - min(len(name) - len(term), 40) / 8
+
+            # Typo tolerance: one query word may be a typo or two away from a
+            # word of the name, as long as the other query words are in it
+            words = search_tokens(term)
+            for word in words:
+                typo_matches = self._typo_matches(word)
+                candidates = set(typo_matches).difference(scores)
+                for other in words:
+                    if other != word and candidates:
+                        candidates &= {ids[bisect.bisect_right(starts, match.start()) - 1]
+                                       for match in re.finditer(re.escape(other), blob)}
+                for macro_id in candidates:
+                    if typo_matches[macro_id]:
+                        name = self._fuzzy_names[macro_id]
+                        scores[macro_id] = (FUZZY_TYPO_SCORE - 10 * typo_matches[macro_id]
+                                            - min(len(name) - len(term), 40) / 8)
+            return scores, {macro_id for macro_id, _, _, _ in name_matches}
+
+    # --- Mutations ---
+    def add_category(self, name, description=""):
+        """Add a category and journal it. Returns the new category ID or None."""
+        with self._lock:
+            self.ensure_loaded()
+            cat_id = generate_unique_id("CAT")
+            now = datetime.now().isoformat()
+            cat_data = Category(name, now, now, description)
+            self._put_category(cat_id, cat_data)
+            if self._log({"op": "put_category", "id": cat_id, "record": cat_data}):
+                return cat_id
+            self._remove_category(cat_id)
+            return None
+
+    def update_category(self, cat_id, **changes):
+        """Change a category's name, description or hidden flag and journal it."""
+        with self._lock:
+            data = self.ensure_loaded()
+            if cat_id not in data["categories"]:
+                return False
+            previous = data["categories"][cat_id]
+            cat_data = previous.replace(**changes, modified=datetime.now().isoformat())
+            self._put_category(cat_id, cat_data)
+            if self._log({"op": "put_category", "id": cat_id, "record": cat_data}):
+                return True
+            self._put_category(cat_id, previous)
+            return False
+
+    def delete_category(self, cat_id, move_macros_to=None):
+        """
+        Delete a category and journal it. Its macros are moved to move_macros_to
+        if given, otherwise they are deleted along with it.
+        """
+        with self._lock:
+            data = self.ensure_loaded()
+            if cat_id not in data["categories"]:
+                return False
+            previous_macros = {}
+            records = []
+            for macro_id in list(self._macro_ids_by_category.get(cat_id, ())):
+                macro = data["macros"][macro_id]
+                previous_macros[macro_id] = macro
+                if move_macros_to:
+                    moved = macro.replace(category_id=move_macros_to)
+                    self._put_macro(macro_id, moved)
+                    records.append({"op": "put_macro", "id": macro_id, "record": moved})
+                else:
+                    self._remove_macro(macro_id)
+                    records.append({"op": "remove_macro", "id": macro_id})
+            cat_data = self._remove_category(cat_id)
+            records.append({"op": "remove_category", "id": cat_id})
+            # One journal line for the whole delete: it is either written or not
+            if self._log({"op": "batch", "records": records}):
+                return True
+            self._put_category(cat_id, cat_data)
+            for macro_id, macro in previous_macros.items():
+                self._put_macro(macro_id, macro)
+            return False
+
+    def set_category_order(self, category_order):
+        """Store a new category display order and journal it."""
+        with self._lock:
+            data = self.ensure_loaded()
+            previous = data.get("category_order", [])
+            data["category_order"] = list(category_order)
+            if self._log({"op": "set_order", "order": data["category_order"]}):
+                return True
+            data["category_order"] = previous
+            return False
+
+    def add_macro(self, category_id, name, content):
+        """Add a macro and journal it. Returns the new macro ID or None."""
+        with self._lock:
+            self.ensure_loaded()
+            macro_id = generate_unique_id()
+            now = datetime.now().isoformat()
+            macro = Macro(name, category_id, content, now, now, 1)
+            self._put_macro(macro_id, macro)
+            if self._log({"op": "put_macro", "id": macro_id, "record": macro}):
+                return macro_id
+            self._remove_macro(macro_id)
+            return None
+
+    def update_macro(self, macro_id, category_id, name, content):
+        """Update an existing macro and journal it. Returns True on success."""
+        with self._lock:
+            data = self.ensure_loaded()
+            if macro_id not in data["macros"]:
+                return False
+            previous = data["macros"][macro_id]
+            macro = previous.replace(
+                name=name,
+                category_id=category_id,
+                content=content,
+                modified=datetime.now().isoformat(),
+                version=(previous.version or 1) + 1
+            )
+            self._put_macro(macro_id, macro)
+            if self._log({"op": "put_macro", "id": macro_id, "record": macro}):
+                return True
+            self._put_macro(macro_id, previous)
+            return False
+
+    def delete_macro(self, macro_id):
+        """Delete a macro and journal it. Returns True on success."""
+        with self._lock:
+            self.ensure_loaded()
+            macro = self._remove_macro(macro_id)
+            if macro is None:
+                return False
+            if self._log({"op": "remove_macro", "id": macro_id}):
+                return True
+            self._put_macro(macro_id, macro)
+            return False
+
+class SQLiteMacroStore(MacroStore):
+    """
+    MacroStore backed by a SQLite database (macros.db next to macros.xml).
+    Macros, categories, usage counts, usage notes and 'Leave Raw' preferences
+    live in indexed tables, and an FTS5 trigram index over macro name and
+    content answers searches. Every edit is a single-row write.
+    The database is created from macros.xml and the JSON sidecar files the
+    first time it is opened. macros.xml is re-exported on flush so backup,
+    restore and cloud sync keep working, and re-imported if something else
+    replaces it.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS categories (
+            id TEXT PRIMARY KEY, name TEXT, created TEXT, modified TEXT,
+            description TEXT, hidden INTEGER NOT NULL DEFAULT 0, position INTEGER);
+        CREATE INDEX IF NOT EXISTS idx_categories_name ON categories(name);
+        CREATE TABLE IF NOT EXISTS macros (
+            id TEXT PRIMARY KEY, category_id TEXT, name TEXT, content TEXT,
+            created TEXT, modified TEXT, version INTEGER);
+        CREATE INDEX IF NOT EXISTS idx_macros_category_name ON macros(category_id, name);
+        CREATE TABLE IF NOT EXISTS usage_counts (
+            category TEXT, name TEXT, count INTEGER, PRIMARY KEY (category, name));
+        CREATE TABLE IF NOT EXISTS usage_notes (
+            category TEXT, name TEXT, data TEXT, PRIMARY KEY (category, name));
+        CREATE TABLE IF NOT EXISTS leave_raw_preferences (
+            macro_name TEXT, placeholder TEXT, leave_raw INTEGER, PRIMARY KEY (macro_name, placeholder));
+    """
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.journal = None
+        self.db_path = f"{os.path.splitext(file_path)[0]}.db" if file_path else None
+        self.has_fts = False
+        self._conn = None
+        self._data_version = None
+        self._saved_usage_counts = {}
+        self._saved_usage_notes = {}
+        self._saved_leave_raw = {}
+
+    def _connect(self):
+        """Open the database, creating the schema and migrating from XML if it's new."""
+        if self._conn is not None:
+            return self._conn
+        import sqlite3
+        is_new = not os.path.exists(self.db_path)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS macro_search USING fts5("
+                "macro_id UNINDEXED, name, content, tokenize='trigram')"
+            )
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5/trigram fall back to in-memory search
+            log_message(f"FTS5 search index unavailable, using in-memory search: {e}")
+        self._conn.commit()
+        if is_new and os.path.exists(self.file_path):
+            migrate_xml_to_sqlite(self)
+        return self._conn
+
+    def _meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _xml_signature(self):
+        signature = self._disk_signature()
+        return json.dumps(signature) if signature else None
+
+    def ensure_loaded(self):
+        """Return the in-memory data, reloading it if another process changed the database."""
+        with self._lock:
+            if not self.db_path:
+                return super().ensure_loaded()
+            conn = self._connect()
+            xml_signature = self._xml_signature()
+            if xml_signature and xml_signature != self._meta("xml_signature", xml_signature):
+                # macros.xml was replaced (cloud sync, restore); it wins, as with the XML store
+                log_message(f"{self.file_path} changed on disk; re-importing it into {self.db_path}")
+                try:
+                    self.replace_all(read_macro_data_file(self.file_path))
+                    self.load_failed = False
+                except Exception as e:
+                    # E.g. a sync client still has the file locked. Keep serving the
+                    # database and retry on the next call; until then nothing is
+                    # exported over the file (see compact)
+                    log_message(f"Error re-importing {self.file_path}: {e}")
+                    self.load_failed = True
+                    self.loaded = False  # replace_all may have swapped in data it couldn't write
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if self.loaded and data_version == self._data_version:
+                return self.data
+            data = empty_macro_data()
+            data["version"] = self._meta("version", "1.0")
+            for cat_id, name, created, modified, description, hidden in conn.execute(
+                    "SELECT id, name, created, modified, description, hidden FROM categories ORDER BY position"):
+                cat_id = intern_string(cat_id)
+                data["categories"][cat_id] = Category(name, created, modified, description or "", bool(hidden))
+                data["category_order"].append(cat_id)
+            for macro_id, category_id, name, content, created, modified, version in conn.execute(
+                    "SELECT id, category_id, name, content, created, modified, version FROM macros"):
+                data["macros"][macro_id] = Macro(name, category_id, content, created, modified, version)
+            self.data = data
+            self._rebuild_indexes()
+            self._data_version = data_version
+            self.loaded = True
+            return self.data
+
+    # --- Row writers ---
+    def _write_macro_row(self, macro_id, macro):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO macros (id, category_id, name, content, created, modified, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (macro_id, macro["category_id"], macro["name"], macro["content"],
+             macro["created"], macro["modified"], macro["version"])
+        )
+        if self.has_fts:
+            self._conn.execute("DELETE FROM macro_search WHERE macro_id = ?", (macro_id,))
+            self._conn.execute(
+                "INSERT INTO macro_search (macro_id, name, content) VALUES (?, ?, ?)",
+                (macro_id, macro["name"] or "", macro["content"] or "")
+            )
+
+    def _delete_macro_row(self, macro_id):
+        self._conn.execute("DELETE FROM macros WHERE id = ?", (macro_id,))
+        if self.has_fts:
+            self._conn.execute("DELETE FROM macro_search WHERE macro_id = ?", (macro_id,))
+
+    def _write_category_row(self, cat_id, cat_data):
+        order = self.data.get("category_order", [])
+        position = order.index(cat_id) if cat_id in order else len(order)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO categories (id, name, created, modified, description, hidden, position) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cat_id, cat_data["name"], cat_data["created"], cat_data["modified"],
+             cat_data.get("description", ""), int(bool(cat_data.get("hidden", False))), position)
+        )
+
+    def _write_order(self, category_order):
+        self._conn.executemany(
+            "UPDATE categories SET position = ? WHERE id = ?",
+            [(position, cat_id) for position, cat_id in enumerate(category_order)]
+        )
+
+    def _log(self, record):
+        """Apply a mutation record to the database in one transaction."""
+        if not self.db_path:
+            print("Cannot save macro data: File path is not set")
+            return False
+        try:
+            with self._conn:
+                self._write_record(record)
+        except Exception as e:
+            print(f"Error writing macro database: {e}")
+            return False
+        self.dirty = True  # macros.xml is re-exported on flush
+        return True
+
+    def _write_record(self, record):
+        op = record["op"]
+        if op == "put_macro":
+            self._write_macro_row(record["id"], record["record"])
+        elif op == "remove_macro":
+            self._delete_macro_row(record["id"])
+        elif op == "put_category":
+            self._write_category_row(record["id"], record["record"])
+        elif op == "remove_category":
+            self._conn.execute("DELETE FROM categories WHERE id = ?", (record["id"],))
+        elif op == "set_order":
+            self._write_order(record["order"])
+        elif op == "batch":
+            for sub_record in record["records"]:
+                self._write_record(sub_record)
+
+    def replace_all(self, data):
+        """Replace all macros and categories in the database with `data`."""
+        with self._lock:
+            self._connect()
+            categories = data["categories"]
+            order = [cat_id for cat_id in data.get("category_order", []) if cat_id in categories]
+            order += [cat_id for cat_id in categories if cat_id not in order]
+            data["category_order"] = order
+            self.data = data
+            with self._conn:
+                self._conn.execute("DELETE FROM categories")
+                self._conn.execute("DELETE FROM macros")
+                if self.has_fts:
+                    self._conn.execute("DELETE FROM macro_search")
+                for cat_id, cat_data in categories.items():
+                    self._write_category_row(cat_id, cat_data)
+                for macro_id, macro in data["macros"].items():
+                    self._write_macro_row(macro_id, macro)
+                self._set_meta("version", data.get("version", "1.0"))
+                self._set_meta("xml_signature", self._xml_signature())
+            self._rebuild_indexes()
+            self.loaded = True
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def compact(self):
+        """Export the database to macros.xml so file-based tools see current data."""
+        with self._compact_lock, self._lock:
+            if self.load_failed:
+                return False  # macros.xml changed on disk and hasn't been re-imported yet
+            if not self.loaded or not self.dirty:
+                return True
+            if not self._write_file(self.data):
+                return False
+            with self._conn:
+                self._set_meta("xml_signature", self._xml_signature())
+            self.dirty = False
+            return True
+
+    def _substring_matches(self, search_term):
+        """Answer substring searches from the full-text index, or None to scan."""
+        # The FTS trigram tokenizer can only answer queries of three or more characters
+        if not self.has_fts or len(search_term) < 3:
+            return None
+        query = '"' + search_term.replace('"', '""') + '"'
+        rows = self._conn.execute(
+            "SELECT macro_id FROM macro_search WHERE macro_search MATCH ?", (query,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    # --- Usage counts, usage notes and 'Leave Raw' preferences ---
+    def load_usage_counts(self):
+        """Return usage counts keyed by (category, name)."""
+        with self._lock:
+            self._connect()
+            counts = {(cat, name): count for cat, name, count in
+                      self._conn.execute("SELECT category, name, count FROM usage_counts")}
+            self._saved_usage_counts = dict(counts)
+            return counts
+
+    def save_usage_counts(self, counts):
+        """Write the usage counts that changed since the last save."""
+        with self._lock:
+            self._connect()
+            saved = self._saved_usage_counts
+            changed = [(key[0], key[1], count) for key, count in counts.items() if saved.get(key) != count]
+            removed = [key for key in saved if key not in counts]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO usage_counts (category, name, count) VALUES (?, ?, ?)", changed)
+                self._conn.executemany(
+                    "DELETE FROM usage_counts WHERE category = ? AND name = ?", removed)
+            self._saved_usage_counts = dict(counts)
+            return True
+
+    def load_usage_notes(self):
+        """Return usage notes keyed by (category, name)."""
+        with self._lock:
+            self._connect()
+            notes = {(cat, name): json.loads(value) for cat, name, value in
+                     self._conn.execute("SELECT category, name, data FROM usage_notes")}
+            self._saved_usage_notes = {key: json.dumps(value) for key, value in notes.items()}
+            return notes
+
+    def save_usage_notes(self, notes):
+        """Write the usage notes that changed since the last save."""
+        with self._lock:
+            self._connect()
+            saved = self._saved_usage_notes
+            current = {key: json.dumps(value) for key, value in notes.items()}
+            changed = [(key[0], key[1], value) for key, value in current.items() if saved.get(key) != value]
+            removed = [key for key in saved if key not in current]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO usage_notes (category, name, data) VALUES (?, ?, ?)", changed)
+                self._conn.executemany(
+                    "DELETE FROM usage_notes WHERE category = ? AND name = ?", removed)
+            self._saved_usage_notes = current
+            return True
+
+    def load_leave_raw_preferences(self):
+        """Return 'Leave Raw' preferences as {macro name: {placeholder: bool}}."""
+        with self._lock:
+            self._connect()
+            preferences = {}
+            for macro_name, placeholder, leave_raw in self._conn.execute(
+                    "SELECT macro_name, placeholder, leave_raw FROM leave_raw_preferences"):
+                preferences.setdefault(macro_name, {})[placeholder] = bool(leave_raw)
+            self._saved_leave_raw = {(m, p): v for m, prefs in preferences.items() for p, v in prefs.items()}
+            return preferences
+
+    def save_leave_raw_preferences(self, preferences):
+        """Write the 'Leave Raw' preferences that changed since the last save."""
+        with self._lock:
+            self._connect()
+            saved = self._saved_leave_raw
+            current = {(m, p): bool(v) for m, prefs in preferences.items() for p, v in prefs.items()}
+            changed = [(m, p, int(v)) for (m, p), v in current.items() if saved.get((m, p)) != v]
+            removed = [key for key in saved if key not in current]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO leave_raw_preferences (macro_name, placeholder, leave_raw) "
+                    "VALUES (?, ?, ?)", changed)
+                self._conn.executemany(
+                    "DELETE FROM leave_raw_preferences WHERE macro_name = ? AND placeholder = ?", removed)
+            self._saved_leave_raw = current
+            return True
+
+storage_backend = "xml"  # "xml" or "sqlite" (config key 'storage_backend')
+
+def migrate_xml_to_sqlite(db_store):
+    """One-shot import of macros.xml (plus its journal) and the JSON sidecar files into db_store."""
+    data = MacroStore(db_store.file_path).ensure_loaded()
+    db_store.replace_all(data)
+    data_dir = os.path.dirname(db_store.file_path)
+    db_store._saved_usage_counts = {}
+    db_store.save_usage_counts(read_keyed_json_file(os.path.join(data_dir, "usage_counts.json")) or {})
+    db_store._saved_usage_notes = {}
+    db_store.save_usage_notes(read_keyed_json_file(os.path.join(data_dir, "macro_usage_notes.json")) or {})
+    preferences = {}
+    preferences_file_path = os.path.join(data_dir, "leave_raw_preferences.json")
+    if os.path.exists(preferences_file_path):
+        try:
+            with open(preferences_file_path, 'r') as f:
+                preferences = json.load(f)
+        except Exception as e:
+            print(f"Error loading 'Leave Raw' preferences: {e}")
+    db_store._saved_leave_raw = {}
+    db_store.save_leave_raw_preferences(preferences)
+    log_message(f"Migrated {len(data['macros'])} macro(s) from {db_store.file_path} to {db_store.db_path}")
+
+macro_store = None  # Shared MacroStore for the current macro data file
+
+def get_macro_store():
+    """Return the MacroStore for the current macro data file path."""
+    global macro_store
+    store_class = SQLiteMacroStore if storage_backend == "sqlite" else MacroStore
+    if macro_store is None or macro_store.file_path != macro_data_file_path or type(macro_store) is not store_class:
+        if macro_store is not None:
+            macro_store.compact()  # Don't leave edits behind in the old file's journal
+        macro_store = store_class(macro_data_file_path)
+    return macro_store
+
+def flush_macro_store():
+    """
+    Write everything pending to disk: queued background saves, then journal
+    edits into the macro XML file. Call before exiting or reading the files directly.
+    """
+    background_saver.flush()
+    if macro_store is not None and macro_store.dirty:
+        macro_store.compact()
+
+def load_macro_data():
+    """
+    Return the structured macro data, served from the in-memory store.
+    The returned dict is shared; change it only through the store's mutation methods.
+    """
+    return get_macro_store().ensure_loaded()
 
 def create_new_category(name, description=""):
     """Create a new category in the macro data."""
-    data = load_macro_data()
-    cat_id = generate_unique_id("CAT")
-    data["categories"][cat_id] = {
-        "name": name,
-        "created": datetime.now().isoformat(),
-        "modified": datetime.now().isoformat(),
-        "description": description
-    }
-    if save_macro_data(data):
+    cat_id = get_macro_store().add_category(name, description)
+    if cat_id:
         log_important_event("category_created", name)
-        return cat_id
-    return None
+    return cat_id
 
 def add_macro_to_data(category_id, name, content):
     """Add a new macro to the structured data."""
-    data = load_macro_data()
-    macro_id = generate_unique_id()
-    data["macros"][macro_id] = {
-        "name": name,
-        "category_id": category_id,
-        "content": content,
-        "created": datetime.now().isoformat(),
-        "modified": datetime.now().isoformat(),
-        "version": 1
-    }
-    if save_macro_data(data):
+    store = get_macro_store()
+    macro_id = store.add_macro(category_id, name, content)
+    if macro_id:
         # Get category name for logging
-        cat_name = data["categories"].get(category_id, {}).get("name", "Unknown")
+        cat_name = store.data["categories"].get(category_id, {}).get("name", "Unknown")
         log_important_event("macro_created", f"{cat_name}|||{name}")
-        return macro_id
-    return None
+    return macro_id
 
 def update_macro_in_data(macro_id, category_id, name, content):
     """Update an existing macro in the structured data."""
-    data = load_macro_data()
-    if macro_id in data["macros"]:
-        macro = data["macros"][macro_id]
-        macro.update({
-            "name": name,
-            "category_id": category_id,
-            "content": content,
-            "modified": datetime.now().isoformat(),
-            "version": macro.get("version", 1) + 1
-        })
-        if save_macro_data(data):
-            return True
-    return False
+    return get_macro_store().update_macro(macro_id, category_id, name, content)
 
 def delete_macro_from_data(macro_id):
     """Delete a macro from the structured data."""
-    data = load_macro_data()
-    if macro_id in data["macros"]:
-        del data["macros"][macro_id]
-        return save_macro_data(data)
-    return False
+    return get_macro_store().delete_macro(macro_id)
 
 def get_category_by_name(name):
     """Get category ID by name."""
-    data = load_macro_data()
-    for cat_id, cat_data in data["categories"].items():
-        if cat_data["name"] == name:
-            return cat_id
-    return None
+    return get_macro_store().category_id_by_name(name)
 
 def get_macro_by_name(name, category_id=None):
     """Get macro ID by name and optionally category."""
-    data = load_macro_data()
-    for macro_id, macro_data in data["macros"].items():
-        if macro_data["name"] == name:
-            if category_id is None or macro_data["category_id"] == category_id:
-                return macro_id
-    return None
+    return get_macro_store().macro_id_by_name(name, category_id)
+
+def get_macro_by_key(macro_key):
+    """Get macro ID for a (category name, macro name) key as used by the UI."""
+    return get_macro_store().macro_id_for_key(macro_key)
+
+def get_macro_content(macro_key):
+    """Get the content of the macro with a (category name, macro name) key, or None."""
+    macro_id = get_macro_by_key(macro_key) if macro_key else None
+    return get_macro_store().macro_content(macro_id) if macro_id else None
+
+# Recent searches, so that typing another character only re-checks the
+# previous query's candidates and backspacing is answered from memory
+search_cache_size = 32
+search_cache = OrderedDict()  # (category, search term) -> dict of results, see search_macros_for_ui
+search_cache_lock = threading.RLock()  # Searches run on the UI thread and on the search worker
+
+def usage_changed():
+    """Record a change to macro_usage_counts, so rankings built from it are redone."""
+    global usage_version
+    usage_version += 1
+
+def increment_usage(macro_key):
+    """Count one use of the macro with a (category name, macro name) key."""
+    macro_usage_counts[macro_key] = macro_usage_counts.get(macro_key, 0) + 1
+    usage_changed()
+
+# macro_usage_counts is keyed by (category name, macro name); ranking works
+# from this copy keyed by macro ID, rebuilt only when the counts or macros change
+usage_counts_by_id_key = None
+usage_counts_by_id_cache = {}
+
+def usage_counts_by_id():
+    """Return {macro ID: usage count} for the macros that have been used."""
+    global usage_counts_by_id_key, usage_counts_by_id_cache
+    store = get_macro_store()
+    key = (store, store.generation, usage_version)
+    if key != usage_counts_by_id_key:
+        counts = {}
+        for macro_key, count in list(macro_usage_counts.items()):
+            macro_id = store.macro_id_for_key(macro_key) if count else None
+            if macro_id:
+                counts[macro_id] = count
+        usage_counts_by_id_cache, usage_counts_by_id_key = counts, key
+    return usage_counts_by_id_cache
+
+# Every macro's list entry in alphabetical order, rebuilt only when the
+# macros change, so listing them filters this instead of sorting the library
+macro_name_order_key = None
+macro_name_order_cache = []
+
+def macro_name_order():
+    """Return [(category ID, (category, macro_name, macro_id))] for all macros, sorted by name."""
+    global macro_name_order_key, macro_name_order_cache
+    store = get_macro_store()
+    key = (store, store.generation)
+    if key != macro_name_order_key:
+        categories = store.data["categories"]
+        ordered = []
+        for macro_id, macro in store.snapshot_items(store.data["macros"]):
+            cat_data = categories.get(macro.category_id)
+            entry = (cat_data.name if cat_data is not None else "Uncategorized", macro.name, macro_id)
+            ordered.append((macro.name.lower(), entry, macro.category_id))
+        ordered.sort()
+        macro_name_order_cache = [(cat_id, entry) for _, entry, cat_id in ordered]
+        macro_name_order_key = key
+    return macro_name_order_cache
+
+# Category records by ID and by name, shared by the macro list tooltips and
+# the category window, rebuilt only when a category changes
+category_metadata_key = None
+category_metadata_cache = ({}, {})
+
+def category_metadata():
+    """
+    Return ({category ID: Category}, {category name: Category}) for the loaded
+    categories. This doesn't check the file for changes, so it is cheap enough
+    to call per list row; refreshes pick up changes through load_macro_data.
+    """
+    global category_metadata_key, category_metadata_cache
+    store = get_macro_store()
+    if not store.loaded:
+        store.ensure_loaded()
+    key = (store, store.category_generation)
+    if key != category_metadata_key:
+        by_id = dict(store.data["categories"])
+        by_name = {}
+        for cat_data in by_id.values():
+            by_name.setdefault(cat_data.name, cat_data)  # First one wins, as in get_category_by_name
+        category_metadata_cache, category_metadata_key = (by_id, by_name), key
+    return category_metadata_cache
+
+def category_description(cat_name):
+    """Return the description of the category named cat_name, or an empty string."""
+    cat_data = category_metadata()[1].get(cat_name)
+    return (cat_data.description or "") if cat_data else ""
+
+def listed_category_names(data, selected_category):
+    """
+    Return {category ID: name} for listing macros under selected_category,
+    with None for hidden or unselected categories. Unknown IDs give
+    "Uncategorized", or None when another category is selected.
+    """
+    missing_name = "Uncategorized" if selected_category in ("All", "Uncategorized") else None
+    names = defaultdict(lambda: missing_name)
+    # Searches call this from the search worker while the UI may be editing categories
+    for cat_id, cat_data in get_macro_store().snapshot_items(data["categories"]):
+        listed = not cat_data.hidden and selected_category in ("All", cat_data.name)
+        names[cat_id] = cat_data.name if listed else None
+    return names
+
+def rank_search_results(data, selected_category, scores):
+    """Return (category, macro_name, macro_id) for the listed macros in scores, best first."""
+    category_names = listed_category_names(data, selected_category)
+    usage = usage_counts_by_id()
+    ranked = []
+    macros = data["macros"]
+    for macro_id, score in scores.items():
+        macro = macros.get(macro_id)
+        cat_name = category_names[macro.category_id] if macro is not None else None
+        if cat_name is None:
+            continue
+        name = macro.name
+        # Usage lifts frequently used macros within and across nearby score bands
+        score += FUZZY_USAGE_WEIGHT * math.log2(1 + usage.get(macro_id, 0))
+        ranked.append((-score, name.lower(), (cat_name, name, macro_id)))
+    ranked.sort()
+    return [entry for _, _, entry in ranked]
+
+def search_macros_for_ui(data, selected_category, search_term, cancelled=None):
+    """
+    Returns search results as (category, macro_name, macro_id), best match
+    first, or None if cancelled() became true while searching.
+    """
+    with search_cache_lock:
+        return _search_macros_for_ui(data, selected_category, search_term, cancelled)
+
+def _search_macros_for_ui(data, selected_category, search_term, cancelled):
+    store = get_macro_store()
+    key = (selected_category, search_term)
+    cached = search_cache.get(key)
+    if cached is not None and cached["generation"] == store.generation:
+        search_cache.move_to_end(key)
+        usage = usage_version
+        if cached["usage"] != usage:
+            cached["results"] = rank_search_results(data, selected_category, cached["scores"])
+            cached["usage"] = usage
+        return list(cached["results"])
+
+    # A longer query only matches macros the shorter one matched, so refine
+    # the longest cached query this one extends instead of searching everything
+    candidates = None
+    base_length = 0
+    for (category, term), entry in search_cache.items():
+        if (category == selected_category and entry["generation"] == store.generation
+                and len(term) > base_length and search_term.startswith(term)):
+            candidates, base_length = entry["candidates"], len(term)
+    if candidates is not None and len(candidates) * 2 > len(data["macros"]):
+        candidates = None  # The indexes are faster than checking most macros one by one
+
+    scores, subsequence_ids = store.fuzzy_name_matches(search_term, candidates)
+    if cancelled and cancelled():
+        return None
+    # Macros that only match in their content or usage notes rank below name matches
+    matching_ids = store.search_macro_ids(search_term, candidates)
+    if matching_ids is None:
+        matching_ids = store.search_macro_ids(search_term, data["macros"].keys())
+    if cancelled and cancelled():
+        return None
+    for macro_id in matching_ids:
+        scores.setdefault(macro_id, FUZZY_CONTENT_SCORE)
+
+    results = rank_search_results(data, selected_category, scores)
+    category_names = listed_category_names(data, selected_category)
+    macros = data["macros"]
+    search_cache[key] = {
+        "generation": store.generation,
+        # Everything a longer query could still match, within this category
+        "candidates": {macro_id for macro_id in subsequence_ids | matching_ids
+                       if macro_id in macros and category_names[macros[macro_id].category_id] is not None},
+        "scores": scores,
+        "usage": usage_version,
+        "results": results,
+    }
+    while len(search_cache) > search_cache_size:
+        search_cache.popitem(last=False)
+    return list(results)
 
-def get_macros_for_ui(selected_category="All", search_term=""):
-    """Returns a list of (category, macro_name, content) for UI display."""
+def get_macros_for_ui(selected_category="All", search_term="", cancelled=None):
+    """
+    Returns a list of (category, macro_name, macro_id) for UI display.
+    Searches return None instead if cancelled() becomes true part way through.
+    """
     data = load_macro_data()
-    macros = []
     search_term = search_term.lower().strip()
-    for macro_id, macro in data["macros"].items():
-        cat_id = macro["category_id"]
-        cat_data = data["categories"].get(cat_id, {})
-        cat_name = cat_data.get("name", "Uncategorized")
-        # Skip macros in hidden categories
-        if cat_data.get("hidden", False):
-            continue
-        name = macro["name"]
-        content = macro["content"]
-        if selected_category != "All" and cat_name != selected_category:
+    if search_term:
+        return search_macros_for_ui(data, selected_category, search_term, cancelled)
+    # Used macros come first, most used first; the rest are alphabetical
+    category_names = listed_category_names(data, selected_category)
+    usage = usage_counts_by_id()
+    used = []
+    unused = []
+    for cat_id, entry in macro_name_order():
+        if category_names[cat_id] is None:
             continue
-        if search_term and (search_term not in name.lower() and search_term not in content.lower()):
-            continue
-        macros.append((cat_name, name, content))
-    
-    # First sort all macros alphabetically
-    macros.sort(key=lambda x: x[1].lower())
-    
-    # Then identify and move the top 5 most used macros to the beginning
-    if macro_usage_counts:
-        # Filter usage counts to only include macros from the current category or search
-        filtered_usage_counts = {}
-        for (cat, name), count in macro_usage_counts.items():
-            # For 'All' category, include all macros, otherwise filter by the selected category
-            if selected_category == "All" or cat == selected_category:
-                # Check if this macro is in our current list (might be filtered by search)
-                if any(m[1] == name and (selected_category == "All" or m[0] == selected_category) for m in macros):
-                    filtered_usage_counts[(cat, name)] = count
-        
-        # Sort macros by their usage count
-        macros.sort(key=lambda x: (-filtered_usage_counts.get((x[0], x[1]), 0), x[1].lower()))
-        
-        # Optional: You can still separate top 5 from the rest if you want that visual distinction
-        # Extract top 5 most used macros
-        top_macros = [m for m in macros[:5] if filtered_usage_counts.get((m[0], m[1]), 0) > 0]
-        rest_macros = [m for m in macros if m not in top_macros]
-        
-        # Combine them back
-        macros = top_macros + rest_macros
-    
-    return macros
+        if entry[2] in usage:
+            used.append(entry)
+        else:
+            unused.append(entry)
+    used.sort(key=lambda entry: -usage[entry[2]])  # Stable, so ties stay alphabetical
+    return used + unused
+
+search_debounce_seconds = 0.15  # Pause in typing before a search starts
+
+class SearchWorker:
+    """
+    Runs search queries on a worker thread so typing never waits for a
+    search. Every submit() gets a newer generation; the worker starts a
+    query once typing has paused for search_debounce_seconds, abandons it
+    as soon as a newer one is submitted, and hands the results of the
+    latest query to deliver(results) on the Tk thread via window.after.
+    """
+    def __init__(self, window, deliver):
+        self.window = window
+        self.deliver = deliver
+        self.generation = 0
+        self._request = None  # (generation, due time, category, search term)
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, selected_category, search_term):
+        """Queue a search, replacing any query that hasn't been delivered yet."""
+        with self._condition:
+            self.generation += 1
+            self._request = (self.generation, time.monotonic() + search_debounce_seconds,
+                             selected_category, search_term)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self):
+        """Drop the queued or running query, e.g. when the list is refreshed directly."""
+        with self._condition:
+            self.generation += 1
+            self._request = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._request is None:
+                        self._condition.wait()
+                        continue
+                    generation, due, category, search_term = self._request
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        self._request = None
+                        break
+                    self._condition.wait(remaining)
+            stale = lambda: generation != self.generation
+            try:
+                results = get_macros_for_ui(category, search_term, cancelled=stale)
+            except Exception as e:
+                print(f"Error searching macros: {e}")
+                continue
+            if results is None or stale():
+                continue
+            try:
+                self.window.after(0, self._deliver, generation, results)
+            except (RuntimeError, tk.TclError):
+                return  # The window has been closed
+
+    def _deliver(self, generation, results):
+        # A newer query may have been submitted after these results were queued
+        if generation == self.generation:
+            self.deliver(results)
 
 def get_categories():
     data = load_macro_data()
@@ -449,96 +2427,416 @@ def get_categories():
     names = [data["categories"][cid]["name"] for cid in order if cid in data["categories"] and not data["categories"][cid].get("hidden", False)]
     return ["All"] + names
 
+# --- REUSABLE DIALOGS ---
+class ReusableDialog:
+    """
+    A dialog window that is built on first use and then kept, withdrawn, for
+    later uses. Subclasses create their widgets in build() and fill them in
+    before calling present(). Closing the dialog withdraws it.
+    """
+    window_title = ""
+    window_size = ""
+    modal = False  # Modal dialogs wait() for the user; a nested use gets its own window
+
+    def __init__(self):
+        self.window = None
+        self.closed = None  # Set when the current use ends, for wait()
+        self.size = None  # (width, height) measured on the first show
+        self.in_use = False
+        self.throwaway = False  # Destroyed on close instead of being kept
+
+    def ensure_built(self):
+        """Build the window unless it exists already."""
+        try:
+            if self.window is not None and self.window.winfo_exists():
+                return
+        except tk.TclError:
+            pass
+        self.window = ctk.CTkToplevel()
+        self.window.withdraw()
+        self.window.title(self.window_title)
+        self.window.geometry(self.window_size)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.closed = tk.BooleanVar(self.window, value=False)
+        self.size = None
+        self.build(self.window)
+
+    def build(self, window):
+        raise NotImplementedError
+
+    def present(self, over=None, grab=False):
+        """
+        Show the window centered over the widget over, or on the screen. The
+        kept window is made transient to over's window for this use only.
+        """
+        window = self.window
+        self.in_use = True
+        self.closed.set(False)
+        if over is not None and not over.winfo_viewable():
+            over = None  # Its window is withdrawn (e.g. minimized to the tray)
+        window.transient(over.winfo_toplevel() if over is not None else "")
+        if self.size is not None:
+            window.geometry(self._position(over))
+        window.deiconify()
+        if self.size is None:
+            window.update_idletasks()
+            self.size = (window.winfo_width(), window.winfo_height())
+            window.geometry(self._position(over))
+        window.lift()
+        if grab:
+            window.grab_set()
+
+    def _position(self, over):
+        width, height = self.size
+        if over is not None:
+            x = over.winfo_rootx() + (over.winfo_width() // 2) - (width // 2)
+            y = over.winfo_rooty() + (over.winfo_height() // 2) - (height // 2)
+        else:
+            x = (self.window.winfo_screenwidth() // 2) - (width // 2)
+            y = (self.window.winfo_screenheight() // 2) - (height // 2)
+        return f"+{x}+{y}"
+
+    def close(self):
+        """End the current use: hide the window and release anyone in wait()."""
+        self.in_use = False
+        try:
+            self.window.grab_release()
+            if self.throwaway:
+                self.window.destroy()
+            else:
+                self.window.withdraw()
+        except tk.TclError:
+            self.window = None
+        if self.closed is not None:
+            self.closed.set(True)
+
+    def wait(self):
+        """Process events until the current use is closed."""
+        try:
+            self.window.wait_variable(self.closed)
+        except tk.TclError:
+            pass
+
+dialog_cache = {}  # dialog class -> its kept instance
+
+def get_dialog(dialog_class):
+    """
+    Return the kept instance of dialog_class, built and ready to show. If it
+    is a modal dialog that is already showing, return a separate one.
+    """
+    dialog = dialog_cache.get(dialog_class)
+    if dialog is None:
+        dialog = dialog_cache[dialog_class] = dialog_class()
+    elif dialog.modal and dialog.in_use:
+        dialog = dialog_class()
+        dialog.throwaway = True
+    dialog.ensure_built()
+    return dialog
+
 # --- FILE OPERATIONS ---
+class CopiedPopup(ReusableDialog):
+    window_title = "Copied"
+    window_size = "320x180"
+
+    def build(self, popup):
+        popup.resizable(False, False)
+        popup.attributes("-topmost", True)
+
+        # Apply header styling
+        header_frame = ctk.CTkFrame(popup, fg_color="#181C22", height=44, corner_radius=0)
+        header_frame.pack(fill="x", side="top")
+
+        title_label = ctk.CTkLabel(
+            header_frame,
+            text="Copied to Clipboard",
+            font=("Segoe UI", 15, "bold"),
+            text_color="white",
+            anchor="w"
+        )
+        title_label.pack(side="left", padx=(15, 0), pady=6)
+
+        # Content
+        content_frame = ctk.CTkFrame(popup)
+        content_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.message_label = ctk.CTkLabel(
+            content_frame,
+            text="",
+            font=("Segoe UI", 12),
+            wraplength=280
+        )
+        self.message_label.pack(pady=(20, 15))
+
+        ok_btn = ctk.CTkButton(content_frame, text="OK", command=self.close, width=100)
+        ok_btn.pack(pady=(0, 15))
+
+    def show(self, parent, macro_name):
+        self.message_label.configure(text=f"Macro '{macro_name}' copied to clipboard.")
+        # Center the popup over the parent
+        self.present(over=parent, grab=True)
+
 def show_copied_popup(parent, macro_name):
-    popup = ctk.CTkToplevel(parent)
-    popup.title("Copied")
-    popup.geometry("320x180")
-    popup.resizable(False, False)
-    popup.attributes("-topmost", True)
-    popup.grab_set()
-    
-    # Apply header styling
-    header_frame = ctk.CTkFrame(popup, fg_color="#181C22", height=44, corner_radius=0)
-    header_frame.pack(fill="x", side="top")
-    
-    title_label = ctk.CTkLabel(
-        header_frame,
-        text="Copied to Clipboard",
-        font=("Segoe UI", 15, "bold"),
-        text_color="white",
-        anchor="w"
-    )
-    title_label.pack(side="left", padx=(15, 0), pady=6)
-    
-    # Content
-    content_frame = ctk.CTkFrame(popup)
-    content_frame.pack(fill="both", expand=True, padx=10, pady=10)
-    
-    message = f"Macro '{macro_name}' copied to clipboard."
-    message_label = ctk.CTkLabel(
-        content_frame, 
-        text=message,
-        font=("Segoe UI", 12),
-        wraplength=280
-    )
-    message_label.pack(pady=(20, 15))
-    
-    ok_btn = ctk.CTkButton(content_frame, text="OK", command=popup.destroy, width=100)
-    ok_btn.pack(pady=(0, 15))
-    
-    # Center the popup over the parent
-    popup.update_idletasks()
-    x = parent.winfo_rootx() + (parent.winfo_width() // 2) - (popup.winfo_width() // 2)
-    y = parent.winfo_rooty() + (parent.winfo_height() // 2) - (popup.winfo_height() // 2)
-    popup.geometry(f"+{x}+{y}")
+    get_dialog(CopiedPopup).show(parent, macro_name)
+
+# --- MACRO TEMPLATES ---
+# Dynamic tags and their default formats, replaced with the current date/time
+# when a macro is copied. A tag can also take an offset and/or its own
+# format: <date+7d>, <time-2h>, <date:%d/%m/%Y>, <datetime+1w:%A %H:%M>.
+DYNAMIC_PLACEHOLDER_FORMATS = {
+    "datetime": "%Y-%m-%d %H:%M:%S",
+    "date": "%Y-%m-%d",
+    "time": "%H:%M:%S",
+    "year": "%Y",
+    "month": "%m",
+    "day": "%d",
+    "hour": "%H",
+    "minute": "%M",
+    "second": "%S",
+}
+DYNAMIC_OFFSET_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+# A {{placeholder}} filled in by the user, a <dynamic tag>, or the content of
+# another macro: <include:MACRO_ID> or <include:Category/Macro name>
+TEMPLATE_TOKEN_PATTERN = re.compile(
+    r"\{\{(.*?)\}\}"
+    r"|<((?:" + "|".join(map(re.escape, DYNAMIC_PLACEHOLDER_FORMATS)) + r")"
+    r"(?:[+-]\d{1,5}[smhdw])?(?::[^<>\n]+)?)>"
+    r"|<include:([^<>\n]+)>"
+)
+MAX_INCLUDE_DEPTH = 8  # Includes nested deeper than this are left as written
+DYNAMIC_TAG_PATTERN = re.compile(r"(\w+)(?:([+-])(\d+)([smhdw]))?(?::(.+))?", re.DOTALL)
+
+@functools.lru_cache(maxsize=1024)
+def dynamic_tag_spec(tag):
+    """
+    Compile the inside of a dynamic tag, e.g. "date", "date+7d" or
+    "date:%d/%m/%Y", into (strftime format, timedelta offset). Returns None
+    for a format strftime rejects; such tags are left as written.
+    """
+    name, sign, amount, unit, date_format = DYNAMIC_TAG_PATTERN.fullmatch(tag).groups()
+    offset = timedelta(**{DYNAMIC_OFFSET_UNITS[unit]: int(amount)}) if amount else timedelta()
+    if sign == "-":
+        offset = -offset
+    date_format = date_format or DYNAMIC_PLACEHOLDER_FORMATS[name]
+    try:
+        datetime(2000, 1, 1).strftime(date_format)
+    except ValueError:
+        return None
+    return date_format, offset
 
-def apply_dynamic_placeholders(text: str) -> str:
-    """Replaces known dynamic placeholders in the input text with current date/time values."""
-    placeholder_map = {
-        "<datetime>": lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "<date>": lambda: datetime.now().strftime("%Y-%m-%d"),
-        "<time>": lambda: datetime.now().strftime("%H:%M:%S"),
-        "<year>": lambda: datetime.now().strftime("%Y"),
-        "<month>": lambda: datetime.now().strftime("%m"),
-        "<day>": lambda: datetime.now().strftime("%d"),
-        "<hour>": lambda: datetime.now().strftime("%H"),
-        "<minute>": lambda: datetime.now().strftime("%M"),
-        "<second>": lambda: datetime.now().strftime("%S"),
-    }
+class MacroTemplate:
+    """
+    Macro content parsed once into segments: literal text, dynamic tags such
+    as <date>, and {{placeholders}} filled in by the user. The segments are
+    kept as a list of strings with each tag or placeholder in its own slot,
+    so expanding is a copy of the list, a fill of the slots and one join.
+    Tags with the same format and offset share their slots, so each distinct
+    value is formatted once per expansion. <include:...> slots stay as
+    written until with_includes() splices the included templates in.
+    """
+    __slots__ = ("parts", "dynamic_slots", "placeholder_slots", "include_slots")
+
+    def __init__(self, text=""):
+        parts = []
+        dynamic_slots = {}  # (strftime format, offset) -> indexes in parts
+        placeholder_slots = {}  # placeholder name -> indexes in parts, in order of first use
+        include_slots = {}  # include reference -> indexes in parts
+        position = 0
+        for match in TEMPLATE_TOKEN_PATTERN.finditer(text):
+            if match.start() > position:
+                parts.append(text[position:match.start()])
+            placeholder, tag, include = match.groups()
+            if tag is not None:
+                spec = dynamic_tag_spec(tag)
+                if spec is not None:
+                    dynamic_slots.setdefault(spec, []).append(len(parts))
+            elif include is not None:
+                include_slots.setdefault(include, []).append(len(parts))
+            else:
+                placeholder_slots.setdefault(placeholder, []).append(len(parts))
+            parts.append(match.group())  # Unfilled placeholders stay as written
+            position = match.end()
+        if position < len(text):
+            parts.append(text[position:])
+        self.parts = parts
+        self.dynamic_slots = dynamic_slots
+        self.placeholder_slots = placeholder_slots
+        self.include_slots = include_slots
+
+    def with_includes(self, included):
+        """
+        Return a new template with the parts of included[reference] spliced
+        into each include slot, and their slots moved along with them. Includes
+        missing from included stay as written. Linear in the size of the result.
+        """
+        template = MacroTemplate()
+        parts = template.parts
+        pairs = ((self.dynamic_slots, template.dynamic_slots),
+                 (self.placeholder_slots, template.placeholder_slots),
+                 (self.include_slots, template.include_slots))
+        owners = {}  # index in self.parts -> (slots of the new template, key)
+        for own, merged in pairs:
+            for key, slots in own.items():
+                for slot in slots:
+                    owners[slot] = (merged, key)
+        for index, part in enumerate(self.parts):
+            owner = owners.get(index)
+            if owner is None:
+                parts.append(part)
+                continue
+            merged, key = owner
+            sub = included.get(key) if merged is template.include_slots else None
+            if sub is None:
+                merged.setdefault(key, []).append(len(parts))
+                parts.append(part)
+                continue
+            offset = len(parts)
+            parts.extend(sub.parts)
+            for sub_slots, merged_slots in ((sub.dynamic_slots, template.dynamic_slots),
+                                            (sub.placeholder_slots, template.placeholder_slots),
+                                            (sub.include_slots, template.include_slots)):
+                for sub_key, slots in sub_slots.items():
+                    merged_slots.setdefault(sub_key, []).extend(slot + offset for slot in slots)
+        return template
+
+    @property
+    def placeholders(self):
+        """Names of the {{placeholders}}, in order of first use."""
+        return list(self.placeholder_slots)
+
+    def expand(self, values=None, now=None):
+        """
+        Return the text with dynamic tags evaluated and each placeholder
+        replaced by its value in values. Placeholders without a non-empty
+        value are left as {{name}}. Every dynamic tag is evaluated for the
+        same moment, now (the current time by default), so <date> and <time>
+        can't straddle a second or midnight boundary.
+        """
+        parts = self.parts.copy()
+        if self.dynamic_slots:
+            now = now or datetime.now()
+            for (date_format, offset), slots in self.dynamic_slots.items():
+                value = (now + offset).strftime(date_format)
+                for slot in slots:
+                    parts[slot] = value
+        if values:
+            for name, slots in self.placeholder_slots.items():
+                value = values.get(name)
+                if value:
+                    for slot in slots:
+                        parts[slot] = value
+        return "".join(parts)
+
+# Parsed templates of recently copied macros, with their includes resolved.
+# Macro records are replaced, never changed in place, whenever a macro is
+# edited (bumping its version) or the file is reloaded, so a cached template
+# is current while its record and the records its includes resolved to are.
+template_cache_size = 256
+# macro ID -> (macro record, MacroTemplate, {include reference: record it resolved to}, include depth)
+template_cache = OrderedDict()
+template_cache_lock = threading.Lock()  # Macros are copied from the UI and from the tray
+
+def resolve_include(reference, macros):
+    """Return the macro ID an <include:...> refers to (a macro ID or Category/Macro name), or None."""
+    reference = reference.strip()
+    if reference in macros:
+        return reference
+    pieces = reference.split("/")
+    for split in range(1, len(pieces)):  # Category or macro names may contain "/" themselves
+        macro_id = get_macro_by_key(("/".join(pieces[:split]).strip(), "/".join(pieces[split:]).strip()))
+        if macro_id is not None:
+            return macro_id
+    return None
+
+def includes_current(includes, macros):
+    """Check that every include reference still resolves to the same macro record."""
+    for reference, record in includes.items():
+        macro_id = resolve_include(reference, macros)
+        if (macros.get(macro_id) if macro_id else None) is not record:
+            return False
+    return True
+
+def macro_template(macro_id):
+    """
+    Return the MacroTemplate for a macro with its includes resolved, or None.
+    The content is only parsed, and its includes only resolved, after the
+    macro or one of the macros it includes changes.
+    """
+    macros = load_macro_data()["macros"]
+    if macro_id not in macros:
+        return None
+    return _macro_template(macro_id, macros, (), 0)[0]
 
-    for placeholder, func in placeholder_map.items():
-        if placeholder in text:
-            text = text.replace(placeholder, func())
+def _macro_template(macro_id, macros, including, depth):
+    """
+    Build or fetch the template of macro_id, included depth levels deep by the
+    macros in including. Returns (template, {include reference: record},
+    nesting), where nesting is the depth of its own includes, or None when the
+    result depends on where it was included from (a cycle or the depth limit)
+    and so isn't cached.
+    """
+    macro = macros[macro_id]
+    with template_cache_lock:
+        cached = template_cache.get(macro_id)
+    if (cached is not None and cached[0] is macro and depth + cached[3] <= MAX_INCLUDE_DEPTH
+            and includes_current(cached[2], macros)):
+        with template_cache_lock:
+            if macro_id in template_cache:
+                template_cache.move_to_end(macro_id)
+        return cached[1], cached[2], cached[3]
+
+    template = MacroTemplate(macro["content"] or "")
+    includes = {}
+    nesting = 0
+    if template.include_slots:
+        included = {}
+        for reference in template.include_slots:
+            target_id = resolve_include(reference, macros)
+            includes[reference] = macros[target_id] if target_id else None
+            if target_id is None:
+                log_message(f"Macro '{macro['name']}' includes '{reference}', which was not found")
+            elif target_id == macro_id or target_id in including:
+                log_message(f"Macro '{macro['name']}' includes '{reference}' in a cycle; left as written")
+                nesting = None
+            elif depth >= MAX_INCLUDE_DEPTH:
+                log_message(f"Includes in '{macro['name']}' nest deeper than {MAX_INCLUDE_DEPTH} levels; left as written")
+                nesting = None
+            else:
+                sub, sub_includes, sub_nesting = _macro_template(
+                    target_id, macros, including + (macro_id,), depth + 1)
+                included[reference] = sub
+                includes.update(sub_includes)
+                if nesting is not None:
+                    nesting = None if sub_nesting is None else max(nesting, sub_nesting + 1)
+        template = template.with_includes(included)
+    if nesting is not None:
+        with template_cache_lock:
+            template_cache[macro_id] = (macro, template, includes, nesting)
+            template_cache.move_to_end(macro_id)
+            while len(template_cache) > template_cache_size:
+                template_cache.popitem(last=False)
+    return template, includes, nesting
 
-    return text
+def apply_dynamic_placeholders(text: str) -> str:
+    """Replaces known dynamic placeholders in the input text with current date/time values."""
+    return MacroTemplate(text).expand()
 
 def copy_macro(macro_key):
     """Copies the content of the specified macro to the clipboard."""
-    if macro_key and macro_key in macros_dict:
+    macro_id = get_macro_by_key(macro_key) if macro_key else None
+    template = macro_template(macro_id) if macro_id else None
+    if template is not None:
         try:
-            content = macros_dict[macro_key]
-            
-            # First, apply dynamic placeholders
-            content = apply_dynamic_placeholders(content)
-            
-            # Then check for {{tag}} placeholders and prompt for input
-            pattern = r'\{\{(.*?)\}\}' 
-            placeholders = set(re.findall(pattern, content))
-            
-            # If there are placeholders, show the dialog
-            if placeholders:
-                # Create a custom dialog for all placeholders
-                inputs = show_placeholder_dialog(macro_key[1], list(placeholders))
+            inputs = {}
+            # If there are {{tag}} placeholders, prompt for them all in one dialog
+            if template.placeholders:
+                inputs = show_placeholder_dialog(macro_key[1], template.placeholders)
                 
                 # If dialog was canceled, return immediately without copying
                 if inputs is None:
                     return
-                    
-                # Replace placeholders with user input only if provided
-                for ph, value in inputs.items():
-                    if value:  # Only replace if a value was provided
-                        content = content.replace(f"{{{{{ph}}}}}", value)
+            
+            # Dynamic tags and the placeholders that were given a value are filled in one pass
+            content = template.expand(inputs)
             
             # Ensure we're copying plain text
             pyperclip.copy(content)
@@ -546,7 +2844,7 @@ def copy_macro(macro_key):
             print(f"Copied to clipboard: {macro_key[1]}")
             
             # Update usage count
-            macro_usage_counts[macro_key] = macro_usage_counts.get(macro_key, 0) + 1
+            increment_usage(macro_key)
             save_usage_counts()
             
             # Update last used macro
@@ -562,204 +2860,191 @@ def copy_macro(macro_key):
         print(f"Attempted to copy non-existent macro: {macro_key}")
         messagebox.showerror("Error", f"Macro '{macro_key[1]}' not found in current data.")
 
-def show_placeholder_dialog(macro_name, placeholders):
-    """
-    Creates a custom dialog to input values for all placeholders at once.
-    Returns a dictionary of placeholder:value pairs or None if canceled.
-    Includes a 'Leave Raw' checkbox for each placeholder to keep original text.
-    """
-    global macro_leave_raw_preferences
-    dialog = ctk.CTkToplevel()
-    dialog.title(f"Fill Placeholders for '{macro_name}'")
-    # Keep window large but with more reasonable proportions
-    dialog.geometry("900x650")  
-    dialog.minsize(800, 600)
-    dialog.grab_set()
-    
-    # Header with app-matching style
-    header_frame = ctk.CTkFrame(dialog, fg_color="#181C22", height=60, corner_radius=0)
-    header_frame.pack(fill="x", side="top")
-    
-    title_label = ctk.CTkLabel(
-        header_frame,
-        text=f"Fill Placeholder Values",
-        font=("Segoe UI", 18, "bold"),
-        text_color="white",
-        anchor="w"
-    )
-    title_label.pack(side="left", padx=(20, 0), pady=10)
-    
-    # Content area with scrollable frame
-    content_frame = ctk.CTkScrollableFrame(dialog)
-    content_frame.pack(fill="both", expand=True, padx=25, pady=25)
-    
-    # Description label
-    desc_label = ctk.CTkLabel(
-        content_frame,
-        text=f"Please enter values for the following placeholders in '{macro_name}':",
-        font=("Segoe UI", 14),
-        wraplength=700,
-        justify="left"
-    )
-    desc_label.pack(anchor="w", pady=(0, 20))
-    
-    # Create entry fields and checkboxes for each placeholder
-    entries = {}
-    leave_raw_vars = {}
-    sorted_placeholders = sorted(placeholders)
-    
-    # Initialize preferences for this macro if not already present
-    if macro_name not in macro_leave_raw_preferences:
-        macro_leave_raw_preferences[macro_name] = {}
-    
-    for i, placeholder in enumerate(sorted_placeholders):
-        # Frame for each placeholder
-        ph_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
-        ph_frame.pack(fill="x", pady=(5, 15))
-        
-        # Label for placeholder
-        ph_label = ctk.CTkLabel(
-            ph_frame,
-            text=f"{placeholder}:",
-            font=("Segoe UI", 13),
+class PlaceholderDialog(ReusableDialog):
+    """Asks for the values of a macro's {{placeholders}}; rows are reused between macros."""
+    window_size = "900x650"  # Keep window large but with more reasonable proportions
+    modal = True
+
+    def build(self, dialog):
+        dialog.minsize(800, 600)
+        self.rows = []  # (frame, label, entry, leave_raw_var, default entry border) per placeholder
+        self.result = None
+
+        # Header with app-matching style
+        header_frame = ctk.CTkFrame(dialog, fg_color="#181C22", height=60, corner_radius=0)
+        header_frame.pack(fill="x", side="top")
+
+        title_label = ctk.CTkLabel(
+            header_frame,
+            text=f"Fill Placeholder Values",
+            font=("Segoe UI", 18, "bold"),
+            text_color="white",
             anchor="w"
         )
-        ph_label.pack(anchor="w")
-        
-        # Entry for value
-        ph_entry = ctk.CTkEntry(ph_frame, width=700, height=35)
-        ph_entry.pack(fill="x", pady=(5, 0))
-        
-        # 'Leave Raw' checkbox for this placeholder
-        leave_raw_var = tk.BooleanVar(value=macro_leave_raw_preferences[macro_name].get(placeholder, False))
-        leave_raw_checkbox = ctk.CTkCheckBox(
-            ph_frame,
-            text="Leave Raw",
-            variable=leave_raw_var,
-            font=("Segoe UI", 11)
+        title_label.pack(side="left", padx=(20, 0), pady=10)
+
+        # Content area with scrollable frame
+        self.content_frame = ctk.CTkScrollableFrame(dialog)
+        self.content_frame.pack(fill="both", expand=True, padx=25, pady=25)
+
+        # Description label
+        self.desc_label = ctk.CTkLabel(
+            self.content_frame,
+            text="",
+            font=("Segoe UI", 14),
+            wraplength=700,
+            justify="left"
         )
-        leave_raw_checkbox.pack(anchor="w", pady=(2, 0))
-        
-        entries[placeholder] = ph_entry
-        leave_raw_vars[placeholder] = leave_raw_var
-    
-    # Warning label (initially hidden)
-    warning_frame = ctk.CTkFrame(dialog, fg_color="transparent")
-    warning_frame.pack(fill="x", padx=25, pady=(0, 5))
-    
-    warning_label = ctk.CTkLabel(
-        warning_frame,
-        text="Warning: Some placeholders are empty. They will remain as {{placeholder}} in the text.",
-        text_color="orange",
-        font=("Segoe UI", 13),
-        wraplength=700
-    )
-    warning_label.pack(fill="x")
-    warning_frame.pack_forget()  # Initially hidden
-    
-    # Set focus to the first entry
-    if sorted_placeholders:
-        entries[sorted_placeholders[0]].focus_set()
-    
-    # Result variable to store output
-    result = [None]
-    
-    # Button frame
-    btn_frame = ctk.CTkFrame(dialog, fg_color="transparent")
-    btn_frame.pack(fill="x", pady=(0, 20), padx=25)
-    
-    def on_cancel():
-        result[0] = None
-        dialog.destroy()
-    
-    def on_submit():
-        # Save the 'Leave Raw' preferences for each placeholder in this macro
-        for placeholder in sorted_placeholders:
-            macro_leave_raw_preferences[macro_name][placeholder] = leave_raw_vars[placeholder].get()
-        save_leave_raw_preferences()
-        
-        # Collect values from entries, respecting 'Leave Raw' settings
+        self.desc_label.pack(anchor="w", pady=(0, 20))
+
+        # Warning label (hidden until a submit with empty entries)
+        self.warning_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        self.warning_label = ctk.CTkLabel(
+            self.warning_frame,
+            text="",
+            text_color="orange",
+            font=("Segoe UI", 13),
+            wraplength=700
+        )
+        self.warning_label.pack(fill="x")
+        # Ask for confirmation
+        self.confirm_btn = ctk.CTkButton(
+            self.warning_frame,
+            text="Continue Anyway",
+            command=lambda: self.finish(self.collect_values()),
+            fg_color="#FF8C00",  # Orange color
+            hover_color="#E67300",  # Darker orange
+            height=35,
+            width=120
+        )
+        self.confirm_btn.pack(side="right", pady=(5, 0))
+
+        # Button frame
+        self.btn_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        self.btn_frame.pack(fill="x", pady=(0, 20), padx=25)
+
+        # Buttons
+        cancel_btn = ctk.CTkButton(
+            self.btn_frame,
+            text="Cancel",
+            command=lambda: self.finish(None),
+            fg_color="red",
+            height=35,
+            width=100
+        )
+        cancel_btn.pack(side="left", padx=(0, 10))
+
+        submit_btn = ctk.CTkButton(
+            self.btn_frame,
+            text="Submit",
+            command=self.submit,
+            height=35,
+            width=100
+        )
+        submit_btn.pack(side="left")
+
+        # Bind Escape key to cancel
+        dialog.bind("<Escape>", lambda event: self.finish(None))
+
+    def _row(self, index):
+        """Return the widgets for the placeholder at index, creating them if needed."""
+        while len(self.rows) <= index:
+            # Frame for each placeholder
+            ph_frame = ctk.CTkFrame(self.content_frame, fg_color="transparent")
+            # Label for placeholder
+            ph_label = ctk.CTkLabel(ph_frame, text="", font=("Segoe UI", 13), anchor="w")
+            ph_label.pack(anchor="w")
+            # Entry for value; Enter submits, Tab moves between entries
+            ph_entry = ctk.CTkEntry(ph_frame, width=700, height=35)
+            ph_entry.pack(fill="x", pady=(5, 0))
+            ph_entry.bind("<Return>", lambda event: self.submit())
+            # 'Leave Raw' checkbox for this placeholder
+            leave_raw_var = tk.BooleanVar(self.window, value=False)
+            leave_raw_checkbox = ctk.CTkCheckBox(
+                ph_frame,
+                text="Leave Raw",
+                variable=leave_raw_var,
+                font=("Segoe UI", 11)
+            )
+            leave_raw_checkbox.pack(anchor="w", pady=(2, 0))
+            border = (ph_entry.cget("border_color"), ph_entry.cget("border_width"))
+            self.rows.append((ph_frame, ph_label, ph_entry, leave_raw_var, border))
+        return self.rows[index]
+
+    def show(self, macro_name, placeholders):
+        self.macro_name = macro_name
+        self.placeholders = sorted(placeholders)
+        self.result = None
+        self.window.title(f"Fill Placeholders for '{macro_name}'")
+        self.desc_label.configure(text=f"Please enter values for the following placeholders in '{macro_name}':")
+
+        # Initialize preferences for this macro if not already present
+        preferences = macro_leave_raw_preferences.setdefault(macro_name, {})
+        self.entries = {}
+        self.leave_raw_vars = {}
+        for index, placeholder in enumerate(self.placeholders):
+            ph_frame, ph_label, ph_entry, leave_raw_var, (border_color, border_width) = self._row(index)
+            ph_label.configure(text=f"{placeholder}:")
+            ph_entry.delete(0, "end")
+            ph_entry.configure(border_color=border_color, border_width=border_width)
+            leave_raw_var.set(preferences.get(placeholder, False))
+            if not ph_frame.winfo_manager():  # Rows in use stay packed, in order
+                ph_frame.pack(fill="x", pady=(5, 15))
+            self.entries[placeholder] = ph_entry
+            self.leave_raw_vars[placeholder] = leave_raw_var
+        for ph_frame, *_ in self.rows[len(self.placeholders):]:
+            ph_frame.pack_forget()
+        self.warning_frame.pack_forget()
+
+        self.present(grab=True)
+        # Set focus to the first entry
+        if self.placeholders:
+            self.entries[self.placeholders[0]].focus_set()
+        self.wait()
+        return self.result
+
+    def collect_values(self):
+        """Return the non-empty values, respecting 'Leave Raw' settings."""
         values = {}
-        for ph in sorted_placeholders:
-            if not leave_raw_vars[ph].get():
-                value = entries[ph].get()
+        for ph in self.placeholders:
+            if not self.leave_raw_vars[ph].get():
+                value = self.entries[ph].get()
                 if value:  # Only include if a value was provided
                     values[ph] = value
-        
+        return values
+
+    def submit(self):
+        # Save the 'Leave Raw' preferences for each placeholder in this macro
+        for placeholder in self.placeholders:
+            macro_leave_raw_preferences[self.macro_name][placeholder] = self.leave_raw_vars[placeholder].get()
+        save_leave_raw_preferences()
+
         # Check if any non-'Leave Raw' entries are empty
-        empty_entries = [ph for ph in sorted_placeholders if not leave_raw_vars[ph].get() and not entries[ph].get().strip()]
-        
+        empty_entries = [ph for ph in self.placeholders
+                         if not self.leave_raw_vars[ph].get() and not self.entries[ph].get().strip()]
+
         if empty_entries:
             # Show warning only for non-'Leave Raw' empty entries
-            warning_label.configure(text=f"Warning: {len(empty_entries)} placeholder(s) are empty. They will remain as {{placeholder}} in the text.")
-            warning_frame.pack(fill="x", padx=25, pady=(0, 10))
-            
-            # Ask for confirmation
-            confirm_btn = ctk.CTkButton(
-                warning_frame,
-                text="Continue Anyway",
-                command=lambda: confirm_submit(values),
-                fg_color="#FF8C00",  # Orange color
-                hover_color="#E67300",  # Darker orange
-                height=35,
-                width=120
-            )
-            confirm_btn.pack(side="right", pady=(5, 0))
-            
+            self.warning_label.configure(text=f"Warning: {len(empty_entries)} placeholder(s) are empty. They will remain as {{placeholder}} in the text.")
+            self.warning_frame.pack(fill="x", padx=25, pady=(0, 10), before=self.btn_frame)
+
             # Highlight empty entries
             for ph in empty_entries:
-                entries[ph].configure(border_color="orange", border_width=2)
+                self.entries[ph].configure(border_color="orange", border_width=2)
         else:
-            result[0] = values
-            dialog.destroy()
-    
-    def confirm_submit(values):
-        result[0] = values
-        dialog.destroy()
-    
-    # Allow pressing Enter to submit
-    def handle_enter(event):
-        on_submit()
-    
-    for entry in entries.values():
-        entry.bind("<Return>", handle_enter)
-    
-    # Allow Tab to navigate between entries (default behavior)
-    
-    # Buttons
-    cancel_btn = ctk.CTkButton(
-        btn_frame,
-        text="Cancel",
-        command=on_cancel,
-        fg_color="red",
-        height=35,
-        width=100
-    )
-    cancel_btn.pack(side="left", padx=(0, 10))
-    
-    submit_btn = ctk.CTkButton(
-        btn_frame,
-        text="Submit",
-        command=on_submit,
-        height=35,
-        width=100
-    )
-    submit_btn.pack(side="left")
-    
-    # Bind Escape key to cancel
-    dialog.bind("<Escape>", lambda event: on_cancel())
-    
-    # Center on screen
-    dialog.update_idletasks()
-    width = dialog.winfo_width()
-    height = dialog.winfo_height()
-    x = (dialog.winfo_screenwidth() // 2) - (width // 2)
-    y = (dialog.winfo_screenheight() // 2) - (height // 2)
-    dialog.geometry(f"{width}x{height}+{x}+{y}")
-    
-    # Wait for user interaction
-    dialog.wait_window()
-    return result[0]
+            self.finish(self.collect_values())
+
+    def finish(self, result):
+        self.result = result
+        self.close()
+
+def show_placeholder_dialog(macro_name, placeholders):
+    """
+    Shows a dialog to input values for all placeholders at once.
+    Returns a dictionary of placeholder:value pairs or None if canceled.
+    Includes a 'Leave Raw' checkbox for each placeholder to keep original text.
+    """
+    return get_dialog(PlaceholderDialog).show(macro_name, placeholders)
 
 def open_macro_file():
     """Opens the current macro data file using the OS default text editor."""
@@ -816,6 +3101,9 @@ def open_macro_file():
             messagebox.showerror("Error", f"Cannot create macro data file at {macro_data_file_path}:\n{e}")
             return
 
+    # Make sure pending journal edits are in the file being opened
+    flush_macro_store()
+
     # Try to open the file
     try:
         if sys.platform.startswith('win32'):
@@ -882,10 +3170,15 @@ def backup_data_files_folder():
         if not backup_path:  # User cancelled
             return
             
+        # Fold pending journal edits into macros.xml first
+        flush_macro_store()
+        
         # Create zip backup
         import zipfile
         with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for root, dirs, files in os.walk(data_dir):
+                # The rotating backups folder would only bloat the zip
+                dirs[:] = [d for d in dirs if d != "backups"]
                 for file in files:
                     file_path = os.path.join(root, file)
                     arcname = os.path.relpath(file_path, data_dir)
@@ -983,10 +3276,11 @@ def restore_data_file():
         
         if restore_type == 1:
             # Single XML file
+            backup_dir = os.path.join(os.path.dirname(macro_data_file_path), "backups")
             file_path = filedialog.askopenfilename(
                 title="Select XML File to Restore",
-                initialdir=start_dir,
-                filetypes=[("XML files", "*.xml"), ("All files", "*.*")]
+                initialdir=backup_dir if os.path.isdir(backup_dir) else start_dir,
+                filetypes=[("XML files", "*.xml *.xml.*.gz"), ("All files", "*.*")]
             )
             
             if not file_path:
@@ -1003,8 +3297,18 @@ def restore_data_file():
             try:
                 # Ensure directory exists
                 os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                # Fold pending edits first so they aren't replayed onto the restored file
+                flush_macro_store()
                 import shutil
-                shutil.copy2(file_path, target_path)
+                if file_path.endswith(".gz"):
+                    # One of the rotating backups
+                    import gzip
+                    def write_restored(f):
+                        with gzip.open(file_path, "rb") as compressed:
+                            shutil.copyfileobj(compressed, f)
+                    replace_file_atomically(target_path, write_restored)
+                else:
+                    shutil.copy2(file_path, target_path)
                 styled_showinfo("Restore Complete", f"Successfully restored data file from:\n{file_path}", parent=restore_window)
                 restore_window.destroy()
             except Exception as e:
@@ -1033,6 +3337,7 @@ def restore_data_file():
             try:
                 # Ensure directory exists
                 os.makedirs(target_dir, exist_ok=True)
+                flush_macro_store()
                 
                 # Extract zip
                 import zipfile
@@ -1204,7 +3509,6 @@ def add_macro_popup(update_list_func, category_dropdown):
         macro_id = add_macro_to_data(cat_id, name, content)
         if macro_id:
             macro_key = (category_name, name)
-            macros_dict[macro_key] = content
             
             # Add undo action
             add_undo_action('add_macro', {
@@ -1225,22 +3529,19 @@ def add_macro_popup(update_list_func, category_dropdown):
     cancel_btn = ctk.CTkButton(btn_frame, text="Cancel", command=popup.destroy, fg_color="red")
     cancel_btn.pack(side="right", padx=(5, 0), expand=True, fill="x")
 
-def edit_macro_popup(macro_name_to_edit, update_list_func, category_dropdown):
+def edit_macro_popup(macro_name_to_edit, update_list_func, category_dropdown, category_name=None):
     """Popup to edit an existing macro with category selection."""
     data = load_macro_data()
-    macro_id = None
-    current_cat_id = None
-    
-    for mid, macro in data["macros"].items():
-        if macro["name"] == macro_name_to_edit:
-            macro_id = mid
-            current_cat_id = macro["category_id"]
-            break
+    if category_name is not None:
+        macro_id = get_macro_by_key((category_name, macro_name_to_edit))
+    else:
+        macro_id = get_macro_by_name(macro_name_to_edit)
     
     if not macro_id:
         messagebox.showerror("Error", "Macro not found in data structure.")
         return
     
+    current_cat_id = data["macros"][macro_id]["category_id"]
     current_category = data["categories"][current_cat_id]["name"]
     
     popup = ctk.CTkToplevel()
@@ -1457,13 +3758,15 @@ def edit_macro_popup(macro_name_to_edit, update_list_func, category_dropdown):
             messagebox.showerror("Error", "A macro with this name already exists in this category.")
             return
             
+        # Store old content for undo
+        old_content = get_macro_store().macro_content(macro_id) or ""
+        
         if update_macro_in_data(macro_id, new_cat_id, new_name, new_content):
             # Update usage notes
             old_macro_key = (current_category, macro_name_to_edit)
             new_macro_key = (new_category_name, new_name)
             
-            # Store old data for undo
-            old_content = macros_dict.get(old_macro_key, "")
+            # Store old notes for undo
             old_notes = macro_usage_notes.get(old_macro_key, {})
             
             # If macro name or category changed, update the notes key
@@ -1480,10 +3783,6 @@ def edit_macro_popup(macro_name_to_edit, update_list_func, category_dropdown):
             # Save notes
             save_usage_notes()
             
-            if (current_category, macro_name_to_edit) in macros_dict:
-                del macros_dict[(current_category, macro_name_to_edit)]
-            macros_dict[(new_category_name, new_name)] = new_content
-            
             # Add undo action
             add_undo_action('edit_macro', {
                 'old_data': {
@@ -1551,10 +3850,10 @@ def create_category_window(update_list_func, category_dropdown):
     close_btn.pack(side="right", padx=10, pady=6)
 
     data = load_macro_data()
-    categories = data["categories"]
+    categories = dict(category_metadata()[0])  # Refreshed from the shared cache by update_category_list
 
     # Initialize category_order from data or create new
-    category_order = data.get("category_order", [])
+    category_order = list(data.get("category_order", []))
     if not category_order:  # If no order exists, create one
         category_order = list(categories.keys())
         # Always put "Uncategorized" first if it exists
@@ -1563,7 +3862,7 @@ def create_category_window(update_list_func, category_dropdown):
             category_order.remove(unc_id)
             category_order.insert(0, unc_id)
         # Save the initial order
-        save_macro_data(data, category_order)
+        get_macro_store().set_category_order(category_order)
 
     list_frame = ctk.CTkScrollableFrame(category_window)
     list_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -1574,6 +3873,11 @@ def create_category_window(update_list_func, category_dropdown):
     def update_category_list():
         for widget in list_frame.winfo_children():
             widget.destroy()
+        
+        # Pick up changes made through the store (or a reload from disk)
+        load_macro_data()
+        categories.clear()
+        categories.update(category_metadata()[0])
             
         category_order[:] = [cat_id for cat_id in category_order if cat_id in categories]
         
@@ -1610,8 +3914,7 @@ def create_category_window(update_list_func, category_dropdown):
                             # Show warning popup
                             if not styled_hide_category_confirm(frame):
                                 return
-                        categories[cid]["hidden"] = not currently_hidden
-                        save_macro_data(data, category_order)
+                        get_macro_store().update_category(cid, hidden=not currently_hidden)
                         update_category_list()
                         if category_dropdown:
                             category_dropdown.configure(values=get_categories())
@@ -1665,7 +3968,7 @@ def create_category_window(update_list_func, category_dropdown):
             category_order[idx], category_order[idx+1] = category_order[idx+1], category_order[idx]
         
         update_category_list()
-        save_macro_data(data, category_order)  # Save after move
+        get_macro_store().set_category_order(category_order)  # Save after move
         if category_dropdown:
             category_dropdown.configure(values=get_categories())
             category_dropdown.set("All")
@@ -1675,20 +3978,15 @@ def create_category_window(update_list_func, category_dropdown):
         name = ctk.CTkInputDialog(text="Enter category name:", title="Add Category").get_input()
         if name and name.strip():
             name = name.strip()
-            if not any(cat["name"] == name for cat in categories.values()):
+            if not get_category_by_name(name):
                 cat_id = create_new_category(name)
                 if cat_id:
-                    # Reload data to get the new category
-                    data = load_macro_data()
-                    categories.clear()
-                    categories.update(data["categories"])
-                    
                     # Add to order list if not already present
                     if cat_id not in category_order:
                         category_order.append(cat_id)
                     
                     # Save the updated order
-                    save_macro_data(data, category_order)
+                    get_macro_store().set_category_order(category_order)
                     
                     # Update the UI
                     update_category_list()
@@ -1702,7 +4000,7 @@ def create_category_window(update_list_func, category_dropdown):
 
     def delete_category(cat_id):
         cat_name = categories[cat_id]["name"]
-        associated_macros = [mid for mid, macro in data["macros"].items() if macro["category_id"] == cat_id]
+        associated_macros = get_macro_store().macro_ids_in_category(cat_id)
         if associated_macros:
             dialog = ctk.CTkToplevel(category_window)
             dialog.title("Delete Category")
@@ -1714,10 +4012,7 @@ def create_category_window(update_list_func, category_dropdown):
             btn_frame = ctk.CTkFrame(dialog)
             btn_frame.pack(pady=10)
             def delete_macros():
-                for mid in associated_macros:
-                    del data["macros"][mid]
-                del categories[cat_id]
-                save_macro_data(data, category_order)
+                get_macro_store().delete_category(cat_id)
                 dialog.destroy()
                 update_category_list()
                 category_dropdown.configure(values=get_categories())
@@ -1726,10 +4021,7 @@ def create_category_window(update_list_func, category_dropdown):
 
             def move_to_uncategorized():
                 unc_id = get_category_by_name("Uncategorized") or create_new_category("Uncategorized")
-                for mid in associated_macros:
-                    data["macros"][mid]["category_id"] = unc_id
-                del categories[cat_id]
-                save_macro_data(data, category_order)
+                get_macro_store().delete_category(cat_id, move_macros_to=unc_id)
                 dialog.destroy()
                 update_category_list()
                 category_dropdown.configure(values=get_categories())
@@ -1744,8 +4036,7 @@ def create_category_window(update_list_func, category_dropdown):
             cancel_btn.pack(pady=5)
         else:
             if messagebox.askyesno("Confirm Delete", f"Delete category '{cat_name}'?"):
-                del categories[cat_id]
-                save_macro_data(data, category_order)
+                get_macro_store().delete_category(cat_id)
                 update_category_list()
                 category_dropdown.configure(values=get_categories())
                 category_dropdown.set("All")
@@ -1758,7 +4049,7 @@ def create_category_window(update_list_func, category_dropdown):
                       key=lambda cid: categories[cid]["name"].lower())
         category_order[:] = [unc_id] + rest
         update_category_list()
-        save_macro_data(data, category_order)
+        get_macro_store().set_category_order(category_order)
         category_dropdown.configure(values=get_categories())
         category_dropdown.set("All")
         update_list_func()
@@ -1810,15 +4101,9 @@ def edit_category_popup(cat_id, update_category_list=None, update_list_func=None
         if not new_name:
             messagebox.showerror("Error", "Category name cannot be empty.")
             return
-        cat_data["name"] = new_name
-        cat_data["description"] = new_desc
-        cat_data["modified"] = datetime.now().isoformat()
-        save_macro_data(data)
-        # Reload data and update the categories dict in-place
-        if update_category_list and categories is not None:
-            new_data = load_macro_data()
-            categories.clear()
-            categories.update(new_data["categories"])
+        get_macro_store().update_category(cat_id, name=new_name, description=new_desc)
+        # The category list re-reads categories from the store
+        if update_category_list:
             update_category_list()
         if category_dropdown:
             category_dropdown.configure(values=get_categories())
@@ -1837,18 +4122,10 @@ def edit_category_popup(cat_id, update_category_list=None, update_list_func=None
 # --- MAIN APPLICATION WINDOW ---
 def create_macro_window():
     """Main application window with menu bar, category dropdown, and macro list."""
-    global selected_macro_name, macro_list_items, selected_category, macros_dict
+    global selected_macro_name, selected_category
     global window, update_list_func  # Add this line
     
-    # Initialize macros_dict from XML data
-    data = load_macro_data()
-    macros_dict = {}
-    for macro_id, macro in data["macros"].items():
-        cat_id = macro["category_id"]
-        cat_name = data["categories"].get(cat_id, {}).get("name", "Uncategorized")
-        name = macro["name"]
-        content = macro["content"]
-        macros_dict[(cat_name, name)] = content
+    load_macro_data()
 
     window = ctk.CTk()  # This now sets the global window
     window.title("MacroMouse")
@@ -1877,6 +4154,12 @@ def create_macro_window():
     data_file_menu.add_command(label="Restore Data File", command=restore_data_file)
     data_file_menu.add_separator()
     data_file_menu.add_command(label="Configure File Paths", command=show_file_paths)
+    # Storage backend submenu
+    storage_menu = tk.Menu(data_file_menu, tearoff=0)
+    data_file_menu.add_cascade(label="Storage Backend", menu=storage_menu)
+    backend_choice = tk.StringVar(value=storage_backend)
+    storage_menu.add_radiobutton(label="XML File", variable=backend_choice, value="xml", command=lambda: set_storage_backend("xml"))
+    storage_menu.add_radiobutton(label="SQLite Database", variable=backend_choice, value="sqlite", command=lambda: set_storage_backend("sqlite"))
     
     file_menu.add_separator()
     file_menu.add_command(label="Change App Icon", command=lambda: change_app_icon(window))
@@ -1970,11 +4253,22 @@ def create_macro_window():
     refresh_btn = ctk.CTkButton(search_frame, text="Refresh", width=80, command=lambda: update_list())
     refresh_btn.pack(side="right", padx=(5, 0))
 
-    search_var.trace_add("write", lambda *args: update_list())
-
-    macro_list_frame = ctk.CTkScrollableFrame(left_frame, label_text="Available Macros")
+    # Typing searches in the background; update_list() still refreshes immediately
+    search_var.trace_add("write", lambda *args: search_worker.submit(selected_category, search_var.get()))
+
+    # Only the rows in view have widgets; they are rebound to other macros on scroll
+    macro_list_frame = VirtualMacroList(
+        left_frame,
+        label_text="Available Macros",
+        on_select=lambda c, n: on_macro_select(c, n),
+        on_copy=copy_macro,
+        on_notes=lambda macro_key: show_usage_notes_dialog(macro_key, window, update_list),
+        notes_for=lambda macro_key: macro_usage_notes.get(macro_key, {}).get("notes", ""),
+        category_description=category_description
+    )
     macro_list_frame.grid(row=2, column=0, padx=10, pady=(0, 0), sticky="nsew")
-    macro_list_frame.grid_columnconfigure(0, weight=1)
+    # Up/Down in the search box step through the results
+    macro_list_frame.bind_navigation(search_entry)
 
     action_button_frame = ctk.CTkFrame(left_frame, fg_color="transparent")
     action_button_frame.grid(row=3, column=0, padx=10, pady=(10, 5), sticky="ew")
@@ -1985,63 +4279,48 @@ def create_macro_window():
 
     def edit_action():
         if selected_macro_name:
-            edit_macro_popup(selected_macro_name[1], update_list, category_dropdown)
+            edit_macro_popup(selected_macro_name[1], update_list, category_dropdown, selected_macro_name[0])
         else:
             messagebox.showwarning("Select Macro", "Please select a macro from the list to edit.")
 
     def remove_action():
         global selected_macro_name
         if selected_macro_name:
+            store = get_macro_store()
             data = load_macro_data()
-            macro_id = None
-            macro_cat_id = None
-            for mid, macro in data["macros"].items():
-                if macro["name"] == selected_macro_name[1]:
-                    macro_id = mid
-                    macro_cat_id = macro["category_id"]
-                    break
+            macro_id = get_macro_by_key(selected_macro_name)
             if not macro_id:
                 messagebox.showerror("Error", "Failed to find macro in data file.")
                 return
+            macro_cat_id = data["macros"][macro_id]["category_id"]
             macro_name_for_msg = selected_macro_name[1]  # Save before clearing
             # Count macros in this category
-            macros_in_cat = [m for m in data["macros"].values() if m["category_id"] == macro_cat_id]
-            if len(macros_in_cat) == 1:
+            if store.macro_count_in_category(macro_cat_id) == 1:
                 # This is the last macro in the category
                 if messagebox.askyesno("Confirm Delete", f"Are you sure you want to remove '{macro_name_for_msg}'?"):
                     # Prompt to also delete the category
                     cat_name = data["categories"][macro_cat_id]["name"]
                     if messagebox.askyesno("Delete Category?", f"Do you wish to also delete the category '{cat_name}' as this is the last macro in it?"):
                         # Delete macro and category
-                        del data["macros"][macro_id]
-                        del data["categories"][macro_cat_id]
-                        save_macro_data(data)
-                        if selected_macro_name in macros_dict:
-                            del macros_dict[selected_macro_name]
+                        store.delete_category(macro_cat_id)
                         selected_macro_name = None
                         update_list()
                         messagebox.showinfo("Deleted", f"Macro and category '{cat_name}' deleted.")
                     else:
                         # Final confirmation for macro only
                         if messagebox.askyesno("Confirm Deleting Macro", f"Confirm deleting the macro '{macro_name_for_msg}'? This will leave the category with no macros."):
-                            del data["macros"][macro_id]
-                            save_macro_data(data)
-                            if selected_macro_name in macros_dict:
-                                del macros_dict[selected_macro_name]
+                            delete_macro_from_data(macro_id)
                             selected_macro_name = None
                             update_list()
                             messagebox.showinfo("Deleted", f"Macro '{macro_name_for_msg}' deleted.")
             else:
                 # Standard workflow
                 if messagebox.askyesno("Confirm Delete", f"Are you sure you want to remove '{macro_name_for_msg}'?"):
+                    # Store data for undo
+                    deleted_content = store.macro_content(macro_id) or ""
                     if macro_id and delete_macro_from_data(macro_id):
-                        # Store data for undo
-                        deleted_content = macros_dict.get(selected_macro_name, "")
                         deleted_notes = macro_usage_notes.get(selected_macro_name, {})
                         
-                        if selected_macro_name in macros_dict:
-                            del macros_dict[selected_macro_name]
-                        
                         # Add undo action
                         add_undo_action('delete_macro', {
                             'macro_key': selected_macro_name,
@@ -2059,7 +4338,7 @@ def create_macro_window():
         global macro_usage_counts
         
         # Get the top 5 most used macros across all categories
-        top_macros = sorted(macro_usage_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_macros = heapq.nlargest(5, macro_usage_counts.items(), key=lambda x: x[1])
         
         # Clear all usage counts
         macro_usage_counts.clear()
@@ -2068,6 +4347,7 @@ def create_macro_window():
         for macro_key, count in top_macros:
             if count > 0:  # Only keep macros that have been used
                 macro_usage_counts[macro_key] = count
+        usage_changed()
         
         # Save the updated counts
         save_usage_counts()
@@ -2147,130 +4427,39 @@ def create_macro_window():
     preview_text.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
     preview_text.configure(state="disabled")
 
-    def clear_macro_list_widgets():
-        global macro_list_items
-        for widget in macro_list_items:
-            widget.destroy()
-        macro_list_items = []
-
     def update_list(selected=None):
-        clear_macro_list_widgets()
-        search_term = search_var.get()
-        macros = get_macros_for_ui(selected_category, search_term)
+        search_worker.cancel()
+        render_list(get_macros_for_ui(selected_category, search_var.get()), selected)
+
+    def render_list(macros, selected=None, scroll_to_top=False):
+        macro_list_frame.set_items(macros, scroll_to_top)
         if not macros:
-            no_results_label = ctk.CTkLabel(macro_list_frame, text="No macros found. Click 'Add Macro' to start.", text_color="gray")
-            no_results_label.pack(pady=5)
-            macro_list_items.append(no_results_label)
             update_preview(None)
             highlight_selected_item(None)
             return
-        for cat, name, content in macros:
-            # Create a frame to hold category label, macro button, and paper icon
-            macro_frame = ctk.CTkFrame(macro_list_frame, fg_color="transparent")
-            macro_frame.pack(fill="x", pady=(0, 1), padx=1)
-            
-            # Add category label
-            cat_label = ctk.CTkLabel(
-                macro_frame,
-                text=f"{cat}:",
-                font=("Segoe UI", 11),
-                text_color="gray",
-                width=120,  # Increased from 100 to 120
-                anchor="w",
-                justify="left"
-            )
-            cat_label.pack(side="left", padx=(5, 0), fill="x")
-            
-            # Add macro button
-            macro_button = ctk.CTkButton(
-                macro_frame,
-                text=name,
-                anchor="w",
-                fg_color="transparent",
-                hover=False,
-                border_width=0,
-                text_color=ctk.ThemeManager.theme["CTkLabel"]["text_color"],
-                command=lambda c=cat, n=name: on_macro_select(c, n)
-            )
-            macro_button.pack(side="left", fill="x", expand=True)
-            
-            # Add double-click event for copy
-            def on_double_click(event, c=cat, n=name):
-                copy_macro((c, n))
-            macro_button.bind("<Double-Button-1>", on_double_click)
-            
-            # Add paper icon for usage notes
-            macro_key = (cat, name)
-            current_notes = macro_usage_notes.get(macro_key, {}).get("notes", "")
-            
-            # Set icon color based on whether notes exist
-            icon_color = "#1f538d" if current_notes else "transparent"  # Blue if notes exist (matches button color)
-            
-            paper_icon = ctk.CTkButton(
-                macro_frame,
-                text="📄",
-                width=30,
-                height=25,
-                fg_color=icon_color,
-                hover_color="#2E7D32",  # Green only on hover
-                command=lambda c=cat, n=name: show_usage_notes_dialog((c, n), window, update_list)
-            )
-            paper_icon.pack(side="right", padx=(5, 10))
-            
-            # Add tooltip for paper icon only if there are notes
-            if current_notes:
-                CTkTooltip(paper_icon, f"Usage Notes:\n{current_notes}")
-            
-            # Add all widgets to the list for tracking
-            macro_list_items.append(macro_frame)
-            macro_list_items.append(cat_label)
-            macro_list_items.append(macro_button)
-            macro_list_items.append(paper_icon)
-            
-            # Add tooltip for description if available
-            if cat in [c["name"] for c in load_macro_data()["categories"].values()]:
-                # Find the category data
-                cat_data = next((c for c in load_macro_data()["categories"].values() if c["name"] == cat), None)
-                if cat_data and cat_data.get("description"):
-                    CTkTooltip(cat_label, cat_data["description"])
-        
         if selected:
+            macro_list_frame.set_selected(get_macro_by_key(selected), scroll=True)
             on_macro_select(*selected)
 
+    # New search results start at the top of the list
+    search_worker = SearchWorker(window, lambda macros: render_list(macros, scroll_to_top=True))
+
     def update_preview(selected_key):
         preview_text.configure(state="normal")
         preview_text.delete("1.0", "end")
-        if selected_key and selected_key in macros_dict:
-            preview_text.insert("1.0", macros_dict[selected_key])
+        content = get_macro_content(selected_key)
+        if content is not None:
+            preview_text.insert("1.0", content)
         preview_text.configure(state="disabled")
 
     def highlight_selected_item(selected_key):
-        selected_color = ctk.ThemeManager.theme["CTkButton"]["hover_color"]
-        # First, reset all frames and buttons to default state
-        for item_widget in macro_list_items:
-            if isinstance(item_widget, ctk.CTkFrame):
-                item_widget.configure(fg_color="transparent")
-            elif isinstance(item_widget, ctk.CTkButton):
-                # Don't reset paper icons (📄) - they should keep their styling
-                if item_widget.cget("text") != "📄":
-                    item_widget.configure(border_width=0)
-        
-        # Then highlight only the selected item
-        if selected_key and isinstance(selected_key, tuple):
-            for item_widget in macro_list_items:
-                if isinstance(item_widget, ctk.CTkButton) and item_widget.cget("text") == selected_key[1]:
-                    item_widget.configure(border_width=1, border_color=selected_color)
-                    # Also highlight the parent frame
-                    parent = item_widget.master
-                    if isinstance(parent, ctk.CTkFrame):
-                        parent.configure(fg_color=selected_color)
-                    break
+        macro_list_frame.set_selected(get_macro_by_key(selected_key) if isinstance(selected_key, tuple) else None)
 
     def on_macro_select(category, name):
+        # The list highlights the row itself, by macro ID
         global selected_macro_name
         selected_macro_name = (category, name)
         update_preview(selected_macro_name)
-        highlight_selected_item(selected_macro_name)
 
     # --- Theme Menu ---
     def set_theme(mode):
@@ -2297,10 +4486,18 @@ def create_macro_window():
     
     window.bind("<Key>", handle_global_keyboard)
     
+    def on_window_close():
+        # Write queued saves before the window goes away
+        flush_macro_store()
+        window.destroy()
+    
+    window.protocol("WM_DELETE_WINDOW", on_window_close)
+    
     set_window_icon(window)
     update_list()
     window.mainloop()
     
+    flush_macro_store()
     log_important_event("app_closed")
 
     # Store a reference to the update_list function
@@ -2308,9 +4505,30 @@ def create_macro_window():
 
 
 
+def set_storage_backend(backend):
+    """Switch between the XML file and SQLite database backends, carrying all data across."""
+    global storage_backend
+    if backend == storage_backend:
+        return
+    flush_macro_store()  # Write out everything the current backend holds
+    storage_backend = backend
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore) and os.path.exists(store.db_path):
+        migrate_xml_to_sqlite(store)  # A new database migrates itself when first opened
+    store.ensure_loaded()
+    # Usage data in memory is current; write it to the new backend
+    save_usage_counts()
+    save_usage_notes()
+    save_leave_raw_preferences()
+    config = load_config()
+    config['storage_backend'] = backend
+    save_config(config)
+    log_message(f"Storage backend set to {backend}")
+
 def main():
     """Main entry point for the application."""
-    global macro_data_file_path, log_file_path, config_file_path, reference_file_path
+    global macro_data_file_path, log_file_path, config_file_path, reference_file_path, storage_backend
+    global lazy_content_loading, macro_content_cache_size, backup_min_interval_seconds
     
     # Store data in a subdirectory of the script's location
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -2337,12 +4555,18 @@ def main():
     if not config.get('config_file'):
         config_file_path = default_config_file
     
+    # Storage settings, applied before anything loads the store or the usage data
+    storage_backend = config.get('storage_backend', 'xml')
+    backup_min_interval_seconds = config.get('backup_interval_minutes', 60) * 60
+    backup_retention.update(config.get('backup_retention', {}))
+    lazy_content_loading = config.get('lazy_content', False)
+    macro_content_cache_size = config.get('content_cache_size', macro_content_cache_size)
+    
     # Log startup information
     log_important_event("app_opened")
     
     # Initialize data if needed
-    data = load_macro_data()
-    if not any(cat["name"] == "Uncategorized" for cat in data["categories"].values()):
+    if not get_category_by_name("Uncategorized"):
         create_new_category("Uncategorized")
     
     # Load usage counts
@@ -2681,84 +4905,78 @@ def show_file_paths():
     paths_dialog.wait_window()
 
 # Apply consistent styling to all message boxes
-def create_styled_messagebox(title, message, parent=None, icon=None, buttons=None):
-    """Create a styled message box that matches the app theme."""
-    # Get current theme
-    theme_mode = ctk.get_appearance_mode()
-    
-    # Create custom dialog
-    dialog = ctk.CTkToplevel(parent)
-    dialog.title(title)
-    dialog.geometry("400x200")
-    dialog.grab_set()
-    dialog.resizable(False, False)
-    
-    # Header
-    header_frame = ctk.CTkFrame(dialog, fg_color="#181C22", height=44, corner_radius=0)
-    header_frame.pack(fill="x", side="top")
-    
-    title_label = ctk.CTkLabel(
-        header_frame,
-        text=title,
-        font=("Segoe UI", 15, "bold"),
-        text_color="white",
-        anchor="w"
-    )
-    title_label.pack(side="left", padx=(15, 0), pady=6)
-    
-    # Message
-    content_frame = ctk.CTkFrame(dialog)
-    content_frame.pack(fill="both", expand=True, padx=10, pady=10)
-    
-    message_label = ctk.CTkLabel(
-        content_frame,
-        text=message,
-        font=("Segoe UI", 12),
-        wraplength=350,
-        justify="left"
-    )
-    message_label.pack(pady=15, padx=10)
-    
-    # Buttons
-    btn_frame = ctk.CTkFrame(dialog, fg_color="transparent")
-    btn_frame.pack(fill="x", pady=(0, 10), padx=10)
-    
-    result = [None]  # Use list to store result (mutable)
-    
-    def on_button(value):
-        result[0] = value
-        dialog.destroy()
-    
-    # Default OK button
-    if not buttons:
-        ok_btn = ctk.CTkButton(
-            btn_frame,
-            text="OK",
-            command=lambda: on_button(True)
+class StyledMessageBox(ReusableDialog):
+    """A message box that matches the app theme; its buttons are reused between messages."""
+    window_size = "400x200"
+    modal = True
+
+    def build(self, dialog):
+        dialog.resizable(False, False)
+        self.buttons = []
+        self.result = None
+
+        # Header
+        header_frame = ctk.CTkFrame(dialog, fg_color="#181C22", height=44, corner_radius=0)
+        header_frame.pack(fill="x", side="top")
+
+        self.title_label = ctk.CTkLabel(
+            header_frame,
+            text="",
+            font=("Segoe UI", 15, "bold"),
+            text_color="white",
+            anchor="w"
         )
-        ok_btn.pack(side="right", padx=5)
-    else:
-        # Custom buttons
-        for btn_text, btn_value in buttons:
-            btn = ctk.CTkButton(
-                btn_frame,
+        self.title_label.pack(side="left", padx=(15, 0), pady=6)
+
+        # Message
+        content_frame = ctk.CTkFrame(dialog)
+        content_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.message_label = ctk.CTkLabel(
+            content_frame,
+            text="",
+            font=("Segoe UI", 12),
+            wraplength=350,
+            justify="left"
+        )
+        self.message_label.pack(pady=15, padx=10)
+
+        # Buttons
+        self.btn_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        self.btn_frame.pack(fill="x", pady=(0, 10), padx=10)
+
+    def show(self, title, message, buttons=None, parent=None):
+        self.result = None
+        self.window.title(title)
+        self.title_label.configure(text=title)
+        self.message_label.configure(text=message)
+        # Default OK button
+        buttons = buttons or [("OK", True)]
+        while len(self.buttons) < len(buttons):
+            self.buttons.append(ctk.CTkButton(self.btn_frame, text=""))
+        default_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+        for btn in self.buttons:
+            btn.pack_forget()
+        for btn, (btn_text, btn_value) in zip(self.buttons, buttons):
+            btn.configure(
                 text=btn_text,
-                command=lambda val=btn_value: on_button(val),
-                fg_color="gray" if btn_text.lower() in ["cancel", "no"] else None
+                command=lambda val=btn_value: self.finish(val),
+                fg_color="gray" if btn_text.lower() in ["cancel", "no"] else default_color
             )
             btn.pack(side="right", padx=5)
-    
-    # Center dialog
-    dialog.update_idletasks()
-    width = dialog.winfo_width()
-    height = dialog.winfo_height()
-    x = (dialog.winfo_screenwidth() // 2) - (width // 2)
-    y = (dialog.winfo_screenheight() // 2) - (height // 2)
-    dialog.geometry(f"{width}x{height}+{x}+{y}")
-    
-    # Wait for user interaction
-    dialog.wait_window()
-    return result[0]
+
+        # Center dialog over its caller and wait for user interaction
+        self.present(over=parent, grab=True)
+        self.wait()
+        return self.result
+
+    def finish(self, result):
+        self.result = result
+        self.close()
+
+def create_styled_messagebox(title, message, parent=None, icon=None, buttons=None):
+    """Show a styled message box that matches the app theme and return the chosen button's value."""
+    return get_dialog(StyledMessageBox).show(title, message, buttons, parent)
 
 # Create a styled version of messagebox functions
 def styled_showinfo(title, message, parent=None):
@@ -2772,52 +4990,57 @@ def styled_showerror(title, message, parent=None):
     return create_styled_messagebox(title, message, parent)
 
 def save_usage_counts():
-    """Save macro usage counts to a separate JSON file."""
+    """Save macro usage counts to a separate JSON file. The write happens in the background."""
     global macro_data_file_path, macro_usage_counts
     if not macro_data_file_path:
         return False
     
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore):
+        background_saver.schedule("usage_counts", functools.partial(store.save_usage_counts, dict(macro_usage_counts)))
+        return True
+    
     # Create the usage file path in the same directory as the macro data file
     usage_file_path = os.path.join(os.path.dirname(macro_data_file_path), "usage_counts.json")
     
-    try:
-        # Convert tuple keys to strings for JSON serialization
-        serializable_counts = {}
-        for key, count in macro_usage_counts.items():
-            # Use a separator unlikely to appear in category or macro names
-            serializable_key = f"{key[0]}|||{key[1]}"
-            serializable_counts[serializable_key] = count
-            
-        with open(usage_file_path, 'w') as f:
-            json.dump(serializable_counts, f, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error saving usage counts: {e}")
-        return False
+    # Convert tuple keys to strings for JSON serialization
+    serializable_counts = {}
+    for key, count in macro_usage_counts.items():
+        # Use a separator unlikely to appear in category or macro names
+        serializable_key = f"{key[0]}|||{key[1]}"
+        serializable_counts[serializable_key] = count
+    
+    background_saver.schedule("usage_counts", functools.partial(write_json_file, usage_file_path, serializable_counts))
+    return True
 
 def save_usage_notes():
-    """Save macro usage notes to a separate JSON file."""
+    """Save macro usage notes to a separate JSON file. The write happens in the background."""
     global macro_data_file_path, macro_usage_notes
     if not macro_data_file_path:
         return False
     
+    # Copy now: the per-macro note dicts are edited in place
+    notes = copy.deepcopy(macro_usage_notes)
+    
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore):
+        background_saver.schedule("usage_notes", functools.partial(store.save_usage_notes, notes))
+        store.set_usage_notes(notes)
+        return True
+    
     # Create the notes file path in the same directory as the macro data file
     notes_file_path = os.path.join(os.path.dirname(macro_data_file_path), "macro_usage_notes.json")
     
-    try:
-        # Convert tuple keys to strings for JSON serialization
-        serializable_notes = {}
-        for key, note_data in macro_usage_notes.items():
-            # Use a separator unlikely to appear in category or macro names
-            serializable_key = f"{key[0]}|||{key[1]}"
-            serializable_notes[serializable_key] = note_data
-            
-        with open(notes_file_path, 'w') as f:
-            json.dump(serializable_notes, f, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error saving usage notes: {e}")
-        return False
+    # Convert tuple keys to strings for JSON serialization
+    serializable_notes = {}
+    for key, note_data in notes.items():
+        # Use a separator unlikely to appear in category or macro names
+        serializable_key = f"{key[0]}|||{key[1]}"
+        serializable_notes[serializable_key] = note_data
+    
+    background_saver.schedule("usage_notes", functools.partial(write_json_file, notes_file_path, serializable_notes))
+    store.set_usage_notes(notes)
+    return True
 
 def add_undo_action(action_type, action_data):
     """Add an action to the undo stack."""
@@ -2853,11 +5076,8 @@ def undo_last_action():
         if action['type'] == 'add_macro':
             # Undo adding a macro
             macro_key = action['data']['macro_key']
-            if macro_key in macros_dict:
-                del macros_dict[macro_key]
             # Remove from data file
-            data = load_macro_data()
-            macro_id = get_macro_by_name(macro_key[1], get_category_by_name(macro_key[0]))
+            macro_id = get_macro_by_key(macro_key)
             if macro_id:
                 delete_macro_from_data(macro_id)
             
@@ -2874,9 +5094,7 @@ def undo_last_action():
             new_data = action['data']['new_data']
             
             # Restore old data
-            macros_dict[old_data['macro_key']] = old_data['content']
-            data = load_macro_data()
-            macro_id = get_macro_by_name(new_data['macro_key'][1], get_category_by_name(new_data['macro_key'][0]))
+            macro_id = get_macro_by_key(new_data['macro_key'])
             if macro_id:
                 update_macro_in_data(macro_id, get_category_by_name(old_data['macro_key'][0]), 
                                    old_data['macro_key'][1], old_data['content'])
@@ -2903,7 +5121,6 @@ def undo_last_action():
             macro_key = macro_data['macro_key']
             
             # Restore macro
-            macros_dict[macro_key] = macro_data['content']
             add_macro_to_data(get_category_by_name(macro_key[0]), macro_key[1], macro_data['content'])
             
             # Restore usage notes if they existed
@@ -2962,7 +5179,6 @@ def redo_last_action():
             # Redo adding a macro
             macro_data = action['data']
             macro_key = macro_data['macro_key']
-            macros_dict[macro_key] = macro_data['content']
             add_macro_to_data(get_category_by_name(macro_key[0]), macro_key[1], macro_data['content'])
             
             if 'notes' in macro_data:
@@ -2971,9 +5187,7 @@ def redo_last_action():
         elif action['type'] == 'delete_macro':
             # Redo deleting a macro
             macro_key = action['data']['macro_key']
-            if macro_key in macros_dict:
-                del macros_dict[macro_key]
-            macro_id = get_macro_by_name(macro_key[1], get_category_by_name(macro_key[0]))
+            macro_id = get_macro_by_key(macro_key)
             if macro_id:
                 delete_macro_from_data(macro_id)
             
@@ -2982,9 +5196,7 @@ def redo_last_action():
             old_data = action['data']['old_data']
             new_data = action['data']['new_data']
             
-            macros_dict[new_data['macro_key']] = new_data['content']
-            data = load_macro_data()
-            macro_id = get_macro_by_name(old_data['macro_key'][1], get_category_by_name(old_data['macro_key'][0]))
+            macro_id = get_macro_by_key(old_data['macro_key'])
             if macro_id:
                 update_macro_in_data(macro_id, get_category_by_name(new_data['macro_key'][0]), 
                                    new_data['macro_key'][1], new_data['content'])
@@ -3023,23 +5235,28 @@ def load_usage_counts():
     if not macro_data_file_path:
         return
     
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore):
+        try:
+            counts = store.load_usage_counts()
+        except Exception as e:
+            print(f"Error loading usage counts: {e}")
+            return
+        macro_usage_counts.clear()
+        macro_usage_counts.update(counts)
+        usage_changed()
+        return
+    
     usage_file_path = os.path.join(os.path.dirname(macro_data_file_path), "usage_counts.json")
     
     if not os.path.exists(usage_file_path):
         return  # No usage data yet
     
-    try:
-        with open(usage_file_path, 'r') as f:
-            serializable_counts = json.load(f)
-            
-        # Convert string keys back to tuples
+    counts = read_keyed_json_file(usage_file_path)
+    if counts is not None:
         macro_usage_counts.clear()
-        for key_str, count in serializable_counts.items():
-            parts = key_str.split("|||", 1)
-            if len(parts) == 2:
-                macro_usage_counts[(parts[0], parts[1])] = count
-    except Exception as e:
-        print(f"Error loading usage counts: {e}")
+        macro_usage_counts.update(counts)
+        usage_changed()
 
 def load_usage_notes():
     """Load macro usage notes from a separate JSON file."""
@@ -3047,23 +5264,46 @@ def load_usage_notes():
     if not macro_data_file_path:
         return
     
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore):
+        try:
+            notes = store.load_usage_notes()
+        except Exception as e:
+            print(f"Error loading usage notes: {e}")
+            return
+        macro_usage_notes.clear()
+        macro_usage_notes.update(notes)
+        store.set_usage_notes(macro_usage_notes)
+        return
+    
     notes_file_path = os.path.join(os.path.dirname(macro_data_file_path), "macro_usage_notes.json")
     
     if not os.path.exists(notes_file_path):
         return  # No notes data yet
     
-    try:
-        with open(notes_file_path, 'r') as f:
-            serializable_notes = json.load(f)
-            
-        # Convert string keys back to tuples
+    notes = read_keyed_json_file(notes_file_path)
+    if notes is not None:
         macro_usage_notes.clear()
-        for key_str, note_data in serializable_notes.items():
-            parts = key_str.split("|||", 1)
-            if len(parts) == 2:
-                macro_usage_notes[(parts[0], parts[1])] = note_data
+        macro_usage_notes.update(notes)
+        store.set_usage_notes(macro_usage_notes)
+
+def read_keyed_json_file(file_path):
+    """Read a JSON file keyed by "category|||name" strings into a dict keyed by tuples."""
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r') as f:
+            serializable_data = json.load(f)
     except Exception as e:
-        print(f"Error loading usage notes: {e}")
+        print(f"Error loading {os.path.basename(file_path)}: {e}")
+        return None
+    # Convert string keys back to tuples
+    data = {}
+    for key_str, value in serializable_data.items():
+        parts = key_str.split("|||", 1)
+        if len(parts) == 2:
+            data[(parts[0], parts[1])] = value
+    return data
 
 def delete_all_usage_counts():
     """Delete all macro usage counts after confirmation."""
@@ -3108,6 +5348,7 @@ def delete_all_usage_counts():
         global macro_usage_counts
         # Clear all counts
         macro_usage_counts.clear()
+        usage_changed()
         # Save the empty counts
         save_usage_counts()
         # Refresh the display
@@ -3482,6 +5723,9 @@ def sync_files_with_config():
         results.append("❌ Google Cloud Storage not installed. Please run: pip install google-cloud-storage")
         return results
     
+    # Upload macros.xml with any pending journal edits folded in
+    flush_macro_store()
+    
     # Firebase configuration
     FILES = {
         'macros.xml': {
@@ -3870,6 +6114,25 @@ def show_placeholder_help():
     
     Example: "Report generated on <datetime> by {{user_name}}"
     
+    Any of these tags can also take an offset and/or a format of its own:
+    <date+7d> - The date a week from now (s, m, h, d and w for seconds to weeks)
+    <time-2h> - The time two hours ago
+    <date:%d/%m/%Y> - Today's date as DD/MM/YYYY (any strftime format)
+    <datetime+1w:%A %H:%M> - Both together
+    
+    All tags in one copy use the same moment, so <date> and <time> always match.
+    
+    ## Including Other Macros
+    
+    Put shared text, such as a preamble of rules, in one macro and include it in others:
+    
+    <include:Category/Macro name> - The content of that macro
+    <include:MACRO_ID> - The same, by macro ID (it keeps working after a rename)
+    
+    Included macros can include others in turn, up to 8 levels deep. Their
+    {{placeholders}} are asked for along with the macro's own, and an include
+    that can't be found, or that would include itself again, is left as written.
+    
     ## Tips
     
     - You can mix both types of placeholders in the same macro
@@ -3918,21 +6181,24 @@ def show_placeholder_help():
     help_popup.geometry(f"{width}x{height}+{x}+{y}")
 
 def save_leave_raw_preferences():
-    """Save 'Leave Raw' preferences for macros to a separate JSON file."""
+    """Save 'Leave Raw' preferences for macros to a separate JSON file. The write happens in the background."""
     global macro_data_file_path, macro_leave_raw_preferences
     if not macro_data_file_path:
         return False
     
+    # Copy now: the per-macro dicts are edited in place
+    preferences = {macro_name: dict(prefs) for macro_name, prefs in macro_leave_raw_preferences.items()}
+    
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore):
+        background_saver.schedule("leave_raw_preferences", functools.partial(store.save_leave_raw_preferences, preferences))
+        return True
+    
     # Create the preferences file path in the same directory as the macro data file
     preferences_file_path = os.path.join(os.path.dirname(macro_data_file_path), "leave_raw_preferences.json")
     
-    try:
-        with open(preferences_file_path, 'w') as f:
-            json.dump(macro_leave_raw_preferences, f, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error saving 'Leave Raw' preferences: {e}")
-        return False
+    background_saver.schedule("leave_raw_preferences", functools.partial(write_json_file, preferences_file_path, preferences))
+    return True
 
 def load_leave_raw_preferences():
     """Load 'Leave Raw' preferences for macros from a separate JSON file."""
@@ -3940,6 +6206,17 @@ def load_leave_raw_preferences():
     if not macro_data_file_path:
         return
     
+    store = get_macro_store()
+    if isinstance(store, SQLiteMacroStore):
+        try:
+            preferences = store.load_leave_raw_preferences()
+        except Exception as e:
+            print(f"Error loading 'Leave Raw' preferences: {e}")
+            return
+        macro_leave_raw_preferences.clear()
+        macro_leave_raw_preferences.update(preferences)
+        return
+    
     preferences_file_path = os.path.join(os.path.dirname(macro_data_file_path), "leave_raw_preferences.json")
     
     if not os.path.exists(preferences_file_path):
@@ -3968,71 +6245,426 @@ def styled_hide_category_confirm(parent=None):
 # In the make_hide_unhide_handler, replace styled_askyesno with styled_hide_category_confirm and add tooltips as label below buttons if desired.
 
 # Add this helper class near the top of the file (after imports):
-class CTkTooltip:
-    def __init__(self, widget, text):
-        self.widget = widget
-        self.text = text
+class TooltipManager:
+    """
+    Shows every tooltip in the app in one reusable window. Widgets register a
+    function that returns their text, so nothing is built or looked up until
+    the pointer has rested on a widget for delay_ms.
+    """
+    def __init__(self, delay_ms=400):
+        self.delay_ms = delay_ms
         self.tipwindow = None
-        widget.bind("<Enter>", self.show_tip)
-        widget.bind("<Leave>", self.hide_tip)
-    def show_tip(self, event=None):
-        if self.tipwindow or not self.text:
+        self.text_widget = None
+        self.widget = None  # Widget the tooltip is shown or scheduled for
+        self._after_id = None
+
+    def register(self, widget, text_for):
+        """Show text_for() while the pointer is on widget; an empty result shows nothing."""
+        widget.bind("<Enter>", lambda event: self.schedule(widget, text_for))
+        widget.bind("<Leave>", lambda event: self.hide(widget))
+
+    def schedule(self, widget, text_for):
+        self.hide()
+        self.widget = widget
+        self._after_id = widget.after(self.delay_ms, lambda: self.show(widget, text_for()))
+
+    def show(self, widget, text):
+        """Show text under widget now."""
+        self._cancel()
+        self.widget = widget
+        if not text:
             return
-        
+        try:
+            if not widget.winfo_exists():
+                return
+            if self.tipwindow is None or not self.tipwindow.winfo_exists():
+                self._build(widget)
+        except tk.TclError:
+            return
+
         # Get screen dimensions for better positioning
-        screen_width = self.widget.winfo_screenwidth()
-        screen_height = self.widget.winfo_screenheight()
-        
+        screen_width = widget.winfo_screenwidth()
+        screen_height = widget.winfo_screenheight()
+
         # Calculate initial position
-        x = self.widget.winfo_rootx() + 20
-        y = self.widget.winfo_rooty() + self.widget.winfo_height() + 5
-        
+        x = widget.winfo_rootx() + 20
+        y = widget.winfo_rooty() + widget.winfo_height() + 5
+
         # Adjust position if tooltip would go off screen
         if x + 400 > screen_width:  # 400px estimated tooltip width
-            x = self.widget.winfo_rootx() - 420  # Position to the left instead
+            x = widget.winfo_rootx() - 420  # Position to the left instead
         if y + 300 > screen_height:  # 300px estimated tooltip height
-            y = self.widget.winfo_rooty() - 310  # Position above instead
-        self.tipwindow = tw = tk.Toplevel(self.widget)
+            y = widget.winfo_rooty() - 310  # Position above instead
+
+        text_widget = self.text_widget
+        text_widget.config(state='normal')
+        text_widget.delete("1.0", "end")
+        text_widget.insert("1.0", text)
+        text_widget.tag_add("left", "1.0", "end")
+        text_widget.config(state='disabled')
+        # Grow past 10 lines for long text, up to 15
+        line_count = text.count("\n") + 1
+        text_widget.config(height=min(line_count, 15) if line_count > 10 else 10)
+
+        self.tipwindow.wm_geometry(f"+{x}+{y}")
+        self.tipwindow.deiconify()
+        self.tipwindow.lift()
+
+    def hide(self, widget=None):
+        """Hide the tooltip, or only if it belongs to widget when one is given."""
+        if widget is not None and widget is not self.widget:
+            return
+        self._cancel()
+        self.widget = None
+        if self.tipwindow is not None:
+            try:
+                self.tipwindow.withdraw()
+            except tk.TclError:
+                self.tipwindow = None
+
+    def _cancel(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except (tk.TclError, AttributeError):
+                pass
+            self._after_id = None
+
+    def _build(self, widget):
+        """Create the tooltip window, owned by the main window so it outlives dialogs."""
+        self.tipwindow = tw = tk.Toplevel(widget.nametowidget("."))
+        tw.withdraw()
         tw.wm_overrideredirect(True)
-        tw.wm_geometry(f"+{x}+{y}")
-        
+
         # Create a frame to hold the text with proper wrapping
         frame = tk.Frame(tw, background="#222", relief='solid', borderwidth=1)
         frame.pack(ipadx=6, ipady=2)
-        
+
         # Use Text widget for better handling of long text with wrapping
-        text_widget = tk.Text(frame, 
-                             background="#222", 
-                             foreground="white", 
-                             font=("Segoe UI", 10),
-                             wrap='word',
-                             width=50,  # Set a reasonable max width
-                             height=10,  # Set a reasonable max height
-                             relief='flat',
-                             borderwidth=0)
-        text_widget.pack(padx=4, pady=2)
-        
-        # Insert the text content
-        text_widget.insert("1.0", self.text)
-        
-        # Configure text alignment and make read-only
-        text_widget.tag_configure("center", justify='left')
-        text_widget.tag_add("center", "1.0", "end")
-        text_widget.config(state='disabled')
-        
-        # Adjust size based on content
-        text_widget.update_idletasks()
-        content_height = int(text_widget.index('end-1c').split('.')[0])
-        if content_height > 10:
-            text_widget.config(height=min(content_height, 15))  # Max 15 lines
-        
-        # Update the frame size
-        frame.update_idletasks()
-        
+        self.text_widget = tk.Text(frame,
+                                   background="#222",
+                                   foreground="white",
+                                   font=("Segoe UI", 10),
+                                   wrap='word',
+                                   width=50,  # Set a reasonable max width
+                                   height=10,  # Set a reasonable max height
+                                   relief='flat',
+                                   borderwidth=0)
+        self.text_widget.pack(padx=4, pady=2)
+        self.text_widget.tag_configure("left", justify='left')
+
+tooltip_manager = TooltipManager()  # Shared by every tooltip in the app
+
+class CTkTooltip:
+    """Tooltip with fixed (but changeable) text for one widget, shown by tooltip_manager."""
+    def __init__(self, widget, text):
+        self.widget = widget
+        self.text = text
+        tooltip_manager.register(widget, lambda: self.text)
+
+    def show_tip(self, event=None):
+        tooltip_manager.show(self.widget, self.text)
+
     def hide_tip(self, event=None):
-        if self.tipwindow:
-            self.tipwindow.destroy()
-            self.tipwindow = None
+        tooltip_manager.hide(self.widget)
+
+class MacroListRow:
+    """
+    The widgets of one VirtualMacroList row. A row stays with its macro while
+    that macro is in view and is rebound to another one when it isn't.
+    """
+    def __init__(self, macro_list):
+        self.entry = None  # (category, macro name, macro ID) shown in this row
+        self.shown = {}  # What the widgets currently show, so rebinding only touches what changed
+        self.frame = ctk.CTkFrame(macro_list.rows_frame, fg_color="transparent")
+        self.cat_label = ctk.CTkLabel(
+            self.frame,
+            text="",
+            font=("Segoe UI", 11),
+            text_color="gray",
+            width=120,
+            anchor="w",
+            justify="left"
+        )
+        self.cat_label.pack(side="left", padx=(5, 0), fill="x")
+        self.button = ctk.CTkButton(
+            self.frame,
+            text="",
+            anchor="w",
+            fg_color="transparent",
+            hover=False,
+            border_width=0,
+            text_color=ctk.ThemeManager.theme["CTkLabel"]["text_color"],
+            command=lambda: self.entry and macro_list.select(self.entry)
+        )
+        self.button.pack(side="left", fill="x", expand=True)
+        # Double-click copies the macro
+        self.button.bind("<Double-Button-1>", lambda event: self.entry and macro_list.on_copy(self.entry[:2]))
+        # Paper icon for usage notes
+        self.paper_icon = ctk.CTkButton(
+            self.frame,
+            text="📄",
+            width=30,
+            height=25,
+            fg_color="transparent",
+            hover_color="#2E7D32",  # Green only on hover
+            command=lambda: self.entry and macro_list.on_notes(self.entry[:2])
+        )
+        self.paper_icon.pack(side="right", padx=(5, 10))
+        # Tooltip text is looked up for the row's current macro when shown
+        tooltip_manager.register(self.paper_icon, lambda: self.notes_tooltip_text(macro_list))
+        tooltip_manager.register(self.cat_label, lambda: self.entry and macro_list.category_description(self.entry[0]))
+
+    def notes_tooltip_text(self, macro_list):
+        current_notes = self.entry and macro_list.notes_for(self.entry[:2])
+        return f"Usage Notes:\n{current_notes}" if current_notes else ""
+
+    def _changed(self, key, value):
+        """Record that the row now shows value for key; return False if it already did."""
+        if key in self.shown and self.shown[key] == value:
+            return False
+        self.shown[key] = value
+        return True
+
+    def bind(self, entry, macro_list):
+        """Show entry in this row, reconfiguring only the widgets whose content changed."""
+        if self.entry != entry:
+            # A tooltip showing would describe the previous macro
+            tooltip_manager.hide(self.paper_icon)
+            tooltip_manager.hide(self.cat_label)
+        self.entry = entry
+        cat, name, _ = entry
+        current_notes = macro_list.notes_for((cat, name))
+        if self._changed("cat", cat):
+            self.cat_label.configure(text=f"{cat}:")
+        if self._changed("name", name):
+            self.button.configure(text=name)
+        if self._changed("has_notes", bool(current_notes)):
+            # Blue if notes exist (matches button color)
+            self.paper_icon.configure(fg_color="#1f538d" if current_notes else "transparent")
+        self.set_highlight(macro_list.selected_id == entry[2])
+
+    def set_highlight(self, highlighted):
+        if not self._changed("highlighted", highlighted):
+            return
+        if highlighted:
+            selected_color = ctk.ThemeManager.theme["CTkButton"]["hover_color"]
+            self.button.configure(border_width=1, border_color=selected_color)
+            self.frame.configure(fg_color=selected_color)
+        else:
+            self.button.configure(border_width=0)
+            self.frame.configure(fg_color="transparent")
+
+class VirtualMacroList(ctk.CTkFrame):
+    """
+    Scrollable list of macros that only creates widgets for the rows that
+    fit in view, plus a few spares, and rebinds them to other macros as the
+    list scrolls. Showing or scrolling the list costs the same whatever the
+    size of the library. Selection is by macro ID, so macros with the same
+    name never share a highlight, and changing it only touches the old and
+    new rows.
+    """
+    def __init__(self, master, label_text, on_select, on_copy, on_notes, notes_for,
+                 category_description, buffer_rows=3):
+        super().__init__(master)
+        self.on_select = on_select  # on_select(category, name)
+        self.on_copy = on_copy  # on_copy((category, name))
+        self.on_notes = on_notes  # on_notes((category, name))
+        self.notes_for = notes_for  # notes_for((category, name)) -> usage notes text
+        self.category_description = category_description  # category_description(category) -> text
+        self.buffer_rows = buffer_rows
+        self.items = []  # (category, macro name, macro ID) for every macro in the list
+        self.first = 0  # Index in items of the top row
+        self.index_by_id = None  # macro ID -> index in items, built when first needed
+        self.selected_id = None  # Macro ID of the highlighted macro
+        self.rows = []  # Every row widget created, shown or spare
+        self.shown_rows = []  # The rows packed in view, top to bottom
+        self.rows_by_id = {}  # macro ID -> row showing it, for the rows in view
+        self.highlighted_row = None
+        self.row_height = 30  # Replaced by the real height once a row is drawn
+        self.view_height = 0
+        self.visible_rows = 1
+
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        label = ctk.CTkLabel(self, text=label_text, fg_color=("gray78", "gray23"), corner_radius=6)
+        label.grid(row=0, column=0, columnspan=2, padx=4, pady=4, sticky="ew")
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rows_frame.grid(row=1, column=0, sticky="nsew")
+        self.rows_frame.pack_propagate(False)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.rows_frame, text="No macros found. Click 'Add Macro' to start.", text_color="gray")
+
+        self.rows_frame.bind("<Configure>", self._on_configure)
+        # CTkFrame.bind() binds its canvas, but select() focuses the frame itself
+        self.bind_navigation(self, bind=functools.partial(tk.Misc.bind, self))
+        # CTk widgets refuse bind_all(); _on_mousewheel ignores events from elsewhere
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tk.Misc.bind_all(self, sequence, self._on_mousewheel, "+")
+
+    def set_items(self, items, scroll_to_top=False):
+        """Show a new list of (category, macro name, macro ID)."""
+        self.items = items
+        self.index_by_id = None
+        if scroll_to_top:
+            self.first = 0
+        self._refresh()
+
+    def index_of(self, macro_id):
+        """Return the index in items of the macro with this ID, or None."""
+        if self.index_by_id is None:
+            self.index_by_id = {entry[2]: index for index, entry in enumerate(self.items)}
+        return self.index_by_id.get(macro_id)
+
+    def set_selected(self, macro_id, scroll=False):
+        """Highlight the macro with this ID (None for none), scrolling it into view if asked."""
+        self.selected_id = macro_id
+        if scroll and macro_id is not None:
+            index = self.index_of(macro_id)
+            if index is not None:
+                self.scroll_into_view(index)
+        row = self.rows_by_id.get(macro_id)
+        if row is not self.highlighted_row:
+            if self.highlighted_row is not None:
+                self.highlighted_row.set_highlight(False)
+            if row is not None:
+                row.set_highlight(True)
+            self.highlighted_row = row
+
+    def select(self, entry):
+        """Select entry as if clicked: highlight it and report it to on_select."""
+        self.set_selected(entry[2], scroll=True)
+        self.focus_set()  # So the arrow keys move on from here
+        self.on_select(entry[0], entry[1])
+
+    def move_selection(self, step):
+        """Select the macro step rows below the selected one (above if negative)."""
+        if not self.items:
+            return
+        index = self.index_of(self.selected_id)
+        if index is None:
+            index = self.first if step > 0 else self.first + self.visible_rows - 1
+        else:
+            index += step
+        self.select(self.items[min(max(0, index), len(self.items) - 1)])
+
+    def bind_navigation(self, widget, bind=None):
+        """Let the arrow and page keys move the selection while widget has focus."""
+        bind = bind or widget.bind
+        for sequence, step in (("<Up>", -1), ("<Down>", 1)):
+            bind(sequence, lambda event, step=step: self.move_selection(step) or "break")
+        for sequence, pages in (("<Prior>", -1), ("<Next>", 1)):
+            bind(sequence, lambda event, pages=pages: self.move_selection(pages * self.visible_rows) or "break")
+
+    def scroll_into_view(self, index):
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.visible_rows:
+            self.first = index - self.visible_rows + 1
+        self._refresh()
+
+    def _max_first(self):
+        return max(0, len(self.items) - self.visible_rows)
+
+    def _refresh(self):
+        """
+        Show items[first:] in the rows and update the scrollbar. Rows are
+        matched to macros by ID, so after a refresh only rows whose macro
+        changed are reconfigured, and rows are only repacked if the order
+        in view changed.
+        """
+        self.first = min(max(0, self.first), self._max_first())
+        needed = min(self.visible_rows, len(self.items) - self.first)
+        in_view = self.items[self.first:self.first + needed]
+        ids_in_view = {macro_id for _, _, macro_id in in_view}
+        rows_by_id = {}
+        spare_rows = []
+        for row in self.rows:
+            if row.entry is not None and row.entry[2] in ids_in_view:
+                rows_by_id[row.entry[2]] = row
+            else:
+                spare_rows.append(row)
+        while len(self.rows) < min(needed + self.buffer_rows, len(self.items)):
+            row = MacroListRow(self)
+            self.rows.append(row)
+            spare_rows.append(row)
+        # Rows already showing a macro keep it; the rest are rebound
+        ordered = []
+        for entry in in_view:
+            row = rows_by_id.get(entry[2]) or spare_rows.pop()
+            row.bind(entry, self)
+            ordered.append(row)
+        for row in spare_rows:
+            row.entry = None
+        self.rows_by_id = {row.entry[2]: row for row in ordered}
+        self.highlighted_row = self.rows_by_id.get(self.selected_id)
+        if ordered != self.shown_rows:
+            for row in self.shown_rows:
+                row.frame.pack_forget()
+            for row in ordered:
+                row.frame.pack(fill="x", pady=(0, 1), padx=1)
+            self.shown_rows = ordered
+
+        if not self.items:
+            self.empty_label.pack(pady=5)
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.pack_forget()
+        total = len(self.items)
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + needed) / total))
+        if self.shown_rows[0].frame.winfo_ismapped():
+            row_height = max(self.shown_rows[0].frame.winfo_height() + 1, 10)
+            if row_height != self.row_height:
+                self.row_height = row_height
+                self._update_visible_rows()
+
+    def _update_visible_rows(self):
+        visible_rows = max(1, self.view_height // self.row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._refresh()
+
+    def _on_configure(self, event):
+        self.view_height = event.height
+        self._update_visible_rows()
+
+    def _scroll(self, rows):
+        first = min(max(0, self.first + rows), self._max_first())
+        if first != self.first:
+            self.first = first
+            self._refresh()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.items))
+            self._refresh()
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self._scroll(int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        # The binding is app-wide; only scroll for events inside the list. The
+        # scrollbar scrolls the list itself, so its events are left to it.
+        widget = event.widget
+        if isinstance(widget, str):  # Tk widgets tkinter doesn't know, e.g. in a dialog's internals
+            try:
+                widget = self.nametowidget(widget)
+            except (KeyError, tk.TclError):
+                return
+        while widget is not None and widget is not self:
+            if widget is self.scrollbar:
+                return
+            widget = widget.master
+        if widget is None:
+            return
+        if event.num == 4:
+            direction = -1
+        elif event.num == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self._scroll(direction * 3)
 
 def show_new_category_dialog(parent=None):
     dialog = ctk.CTkToplevel(parent)
@@ -4252,9 +6884,9 @@ def get_top_macros():
     if not macro_usage_counts:
         return []
     
-    # Sort macros by usage count
-    sorted_macros = sorted(macro_usage_counts.items(), key=lambda x: x[1], reverse=True)
-    return [(cat, name) for (cat, name), _ in sorted_macros[:5]]
+    # Select the five highest counts without sorting them all
+    top_macros = heapq.nlargest(5, macro_usage_counts.items(), key=lambda x: x[1])
+    return [(cat, name) for (cat, name), _ in top_macros]
 
 def create_tray_menu():
     """Create the tray icon menu with emoji icons and dynamic window actions. Macros are display-only."""
@@ -4306,6 +6938,9 @@ def close_macromouse_from_tray():
     # Log the closure
     log_important_event("app_closed")
     
+    # Write queued saves and pending macro edits before exiting
+    flush_macro_store()
+    
     # Clean up the temporary icon file if it exists
     if _temp_icon_path and os.path.exists(_temp_icon_path):
         try:
@@ -4335,19 +6970,14 @@ def close_macromouse_from_tray():
 
 def on_tray_macro_click(icon, item, category, name):
     """Handle clicking a macro in the tray menu. Always reload macro data and show a sleek popup."""
-    data = load_macro_data()
-    macro_id = None
-    for mid, macro in data["macros"].items():
-        cat_id = macro["category_id"]
-        cat_name = data["categories"].get(cat_id, {}).get("name", "Uncategorized")
-        if cat_name == category and macro["name"] == name:
-            macro_id = mid
-            break
-    if macro_id:
-        macro_content = data["macros"][macro_id]["content"]
+    macro_id = get_macro_by_key((category, name))
+    template = macro_template(macro_id) if macro_id else None
+    if template is not None:
+        # Expanded like copy_macro; there is no prompt here, so {{placeholders}} stay as written
+        macro_content = template.expand()
         pyperclip.copy(macro_content)
         show_tray_macro_popup(f"{name} ({category})", macro_content)
-        macro_usage_counts[(category, name)] = macro_usage_counts.get((category, name), 0) + 1
+        increment_usage((category, name))
         save_usage_counts()
         update_last_used_macro(category, name)
     else:
@@ -4383,81 +7013,93 @@ def update_last_used_macro(category, name):
     if tray_icon:
         tray_icon.menu = create_tray_menu()
 
-def show_undo_notification(message):
-    """Show a brief notification for undo/redo actions."""
-    popup = ctk.CTkToplevel()
-    popup.title("Notification")
-    popup.geometry("300x80")
-    popup.resizable(False, False)
-    popup.attributes("-topmost", True)
-    popup.overrideredirect(True)  # Remove window border
-    
-    # Main frame with dark background
-    main_frame = ctk.CTkFrame(popup, fg_color="#181C22", corner_radius=12)
-    main_frame.pack(fill="both", expand=True, padx=2, pady=2)
+class UndoNotification(ReusableDialog):
+    window_title = "Notification"
+    window_size = "300x80"
 
-    # Message
-    message_label = ctk.CTkLabel(
-        main_frame,
-        text=message,
-        font=("Segoe UI", 14, "bold"),
-        text_color="white"
-    )
-    message_label.pack(expand=True)
+    def build(self, popup):
+        popup.resizable(False, False)
+        popup.attributes("-topmost", True)
+        popup.overrideredirect(True)  # Remove window border
+        self._hide_after = None
 
-    # Center the popup on the screen
-    popup.update_idletasks()
-    width = popup.winfo_width()
-    height = popup.winfo_height()
-    x = (popup.winfo_screenwidth() // 2) - (width // 2)
-    y = (popup.winfo_screenheight() // 2) - (height // 2)
-    popup.geometry(f"{width}x{height}+{x}+{y}")
-    
-    # Auto-close after 1.5 seconds
-    popup.after(1500, popup.destroy)
+        # Main frame with dark background
+        main_frame = ctk.CTkFrame(popup, fg_color="#181C22", corner_radius=12)
+        main_frame.pack(fill="both", expand=True, padx=2, pady=2)
+
+        # Message
+        self.message_label = ctk.CTkLabel(
+            main_frame,
+            text="",
+            font=("Segoe UI", 14, "bold"),
+            text_color="white"
+        )
+        self.message_label.pack(expand=True)
+
+    def show(self, message):
+        self.message_label.configure(text=message)
+        # Center the popup on the screen
+        self.present()
+        # Auto-close after 1.5 seconds, counted from the latest message
+        if self._hide_after is not None:
+            self.window.after_cancel(self._hide_after)
+        self._hide_after = self.window.after(1500, self._auto_close)
+
+    def _auto_close(self):
+        self._hide_after = None
+        self.close()
+
+def show_undo_notification(message):
+    """Show a brief notification for undo/redo actions."""
+    get_dialog(UndoNotification).show(message)
+
+class TrayMacroPopup(ReusableDialog):
+    """A sleek, always-on-top popup for tray macro actions."""
+    window_size = "420x220"
+    modal = True
+
+    def build(self, popup):
+        popup.resizable(False, False)
+        popup.attributes("-topmost", True)
+        popup.overrideredirect(True)  # Remove window border
+
+        # Main frame with dark background
+        main_frame = ctk.CTkFrame(popup, fg_color="#181C22", corner_radius=12)
+        main_frame.pack(fill="both", expand=True, padx=2, pady=2)
+
+        # Title bar
+        title_frame = ctk.CTkFrame(main_frame, fg_color="#23272E", height=36, corner_radius=12)
+        title_frame.pack(fill="x", side="top")
+        self.title_label = ctk.CTkLabel(title_frame, text="", font=("Segoe UI", 14, "bold"), text_color="white")
+        self.title_label.pack(side="left", padx=(14, 0), pady=8)
+        close_btn = ctk.CTkButton(title_frame, text="✕", width=32, fg_color="#23272E", text_color="white", hover_color="#B22222", command=self.close)
+        close_btn.pack(side="right", padx=8, pady=4)
+
+        # Macro content
+        content_frame = ctk.CTkFrame(main_frame, fg_color="#181C22")
+        content_frame.pack(fill="both", expand=True, padx=12, pady=(8, 12))
+        self.content_box = ctk.CTkTextbox(content_frame, height=80, font=("Consolas", 11), wrap="word")
+        self.content_box.pack(fill="both", expand=True)
+
+        # OK button
+        ok_btn = ctk.CTkButton(main_frame, text="OK", command=self.close, width=100)
+        ok_btn.pack(pady=(0, 10))
+
+    def show(self, macro_name, macro_content):
+        self.window.title(f"Macro: {macro_name}")
+        self.title_label.configure(text=macro_name)
+        self.content_box.configure(state="normal")
+        self.content_box.delete("1.0", "end")
+        self.content_box.insert("1.0", macro_content)
+        self.content_box.configure(state="disabled")
+        # Center the popup on the screen
+        self.present()
+        self.window.focus_force()
+        self.wait()
 
 def show_tray_macro_popup(macro_name, macro_content):
     """Show a sleek, always-on-top popup for tray macro actions."""
-    popup = ctk.CTkToplevel()
-    popup.title(f"Macro: {macro_name}")
-    popup.geometry("420x220")
-    popup.resizable(False, False)
-    popup.attributes("-topmost", True)
-    popup.overrideredirect(True)  # Remove window border
-    
-    # Main frame with dark background
-    main_frame = ctk.CTkFrame(popup, fg_color="#181C22", corner_radius=12)
-    main_frame.pack(fill="both", expand=True, padx=2, pady=2)
-
-    # Title bar
-    title_frame = ctk.CTkFrame(main_frame, fg_color="#23272E", height=36, corner_radius=12)
-    title_frame.pack(fill="x", side="top")
-    title_label = ctk.CTkLabel(title_frame, text=macro_name, font=("Segoe UI", 14, "bold"), text_color="white")
-    title_label.pack(side="left", padx=(14, 0), pady=8)
-    close_btn = ctk.CTkButton(title_frame, text="✕", width=32, fg_color="#23272E", text_color="white", hover_color="#B22222", command=popup.destroy)
-    close_btn.pack(side="right", padx=8, pady=4)
-
-    # Macro content
-    content_frame = ctk.CTkFrame(main_frame, fg_color="#181C22")
-    content_frame.pack(fill="both", expand=True, padx=12, pady=(8, 12))
-    content_box = ctk.CTkTextbox(content_frame, height=80, font=("Consolas", 11), wrap="word")
-    content_box.insert("1.0", macro_content)
-    content_box.configure(state="disabled")
-    content_box.pack(fill="both", expand=True)
-
-    # OK button
-    ok_btn = ctk.CTkButton(main_frame, text="OK", command=popup.destroy, width=100)
-    ok_btn.pack(pady=(0, 10))
-
-    # Center the popup on the screen
-    popup.update_idletasks()
-    width = popup.winfo_width()
-    height = popup.winfo_height()
-    x = (popup.winfo_screenwidth() // 2) - (width // 2)
-    y = (popup.winfo_screenheight() // 2) - (height // 2)
-    popup.geometry(f"{width}x{height}+{x}+{y}")
-    popup.focus_force()
-    popup.wait_window()
+    get_dialog(TrayMacroPopup).show(macro_name, macro_content)
 
 def set_window_icon(window):
     global _temp_icon_path
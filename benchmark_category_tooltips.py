@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for category lookups while refreshing the macro list.
+Each refresh lists the macros (get_macros_for_ui) and looks up the category
+description of every row for its tooltip. The previous lookup called
+load_macro_data() twice per row, and each of those calls used to be a full
+XML parse; the current one reads the shared category metadata cache.
+Reports load_macro_data calls, file parses and time per refresh of
+ROWS rows, and exits with status 1 if the current lookup does more than one
+load or parse per refresh.
+
+Usage: python benchmark_category_tooltips.py [macro_count]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmark_macro_loading import write_synthetic_file
+
+ROWS = 500
+REFRESHES = 5
+
+
+def legacy_category_description(MacroMouse, cat):
+    """The previous tooltip lookup from update_list."""
+    if cat in [c["name"] for c in MacroMouse.load_macro_data()["categories"].values()]:
+        cat_data = next((c for c in MacroMouse.load_macro_data()["categories"].values() if c["name"] == cat), None)
+        if cat_data and cat_data.get("description"):
+            return cat_data["description"]
+    return ""
+
+
+class CallCounter:
+    """Wraps module functions to count calls to them."""
+    def __init__(self, module, names):
+        self.module = module
+        self.counts = dict.fromkeys(names, 0)
+        self.originals = {name: getattr(module, name) for name in names}
+        for name, original in self.originals.items():
+            setattr(module, name, self._wrap(name, original))
+
+    def _wrap(self, name, original):
+        def counted(*args, **kwargs):
+            self.counts[name] += 1
+            return original(*args, **kwargs)
+        return counted
+
+    def total(self, *names):
+        return sum(self.counts[name] for name in names)
+
+    def reset(self):
+        self.counts = dict.fromkeys(self.counts, 0)
+
+
+def refresh(MacroMouse, describe):
+    """One list refresh: list the macros, then describe the category of each row."""
+    rows = MacroMouse.get_macros_for_ui("All")[:ROWS]
+    return [describe(cat) for cat, _, _ in rows]
+
+
+def main():
+    macro_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    import MacroMouse
+    parsers = ("read_macro_data_file", "read_macro_data_file_lazy", "read_macro_snapshot")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "macros.xml")
+        write_synthetic_file(file_path, macro_count)
+        MacroMouse.macro_data_file_path = file_path
+        MacroMouse.load_macro_data()
+        counter = CallCounter(MacroMouse, ("load_macro_data",) + parsers)
+
+        print(f"{macro_count} macros, {ROWS} rows per refresh\n")
+        print(f"{'lookup':>9} {'loads':>8} {'parses':>8} {'time':>10}")
+        results = {}
+        lookups = [
+            ("previous", lambda cat: legacy_category_description(MacroMouse, cat)),
+            ("current", MacroMouse.category_description),
+        ]
+        for label, describe in lookups:
+            expected = refresh(MacroMouse, describe)
+            counter.reset()
+            start = time.perf_counter()
+            for _ in range(REFRESHES):
+                if refresh(MacroMouse, describe) != expected:
+                    print(f"  warning: {label} descriptions changed between refreshes")
+            elapsed = (time.perf_counter() - start) / REFRESHES
+            loads = counter.total("load_macro_data") / REFRESHES
+            parses = counter.total(*parsers) / REFRESHES
+            results[label] = (loads, parses, expected)
+            print(f"{label:>9} {loads:8.0f} {parses:8.0f} {elapsed * 1000:8.1f}ms")
+        print("\n(each load was a full XML parse before the in-memory store)")
+
+        # An edited description must show up in the next refresh
+        store = MacroMouse.get_macro_store()
+        cat_id = store.category_id_by_name("Category 0")
+        store.update_category(cat_id, description="Edited")
+        edited = refresh(MacroMouse, MacroMouse.category_description)
+        stale = "Edited" not in edited
+        MacroMouse.flush_macro_store()
+        MacroMouse.macro_store = None
+
+    loads, parses, descriptions = results["current"]
+    failures = []
+    if descriptions != results["previous"][2]:
+        failures.append("current descriptions differ from the previous lookup")
+    if loads > 1 or parses > 1:
+        failures.append(f"current lookup does {loads:.0f} loads and {parses:.0f} parses per refresh")
+    if stale:
+        failures.append("category edit not reflected after refresh")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Time-to-visible benchmark for the app's dialogs.
+Opens each dialog REPEAT times with its window rebuilt every time (what
+every use cost before dialogs were kept) and REPEAT times reusing the kept
+window, and reports the median time from the call until the window is
+viewable. It then checks that nothing carries over between uses of a kept
+dialog: placeholder entries start empty, no grab is left behind, and the
+message box is transient to its caller (or to nothing) on each use. Exits
+with status 1 if a check fails. Needs a display.
+
+Usage: python benchmark_dialogs.py
+"""
+
+import statistics
+import sys
+import time
+
+REPEAT = 10
+
+
+def time_to_visible(MacroMouse, root, dialog_class, open_dialog, rebuild):
+    """Open a dialog and return the seconds until it is viewable; it is closed again."""
+    dialog = MacroMouse.dialog_cache.get(dialog_class)
+    if rebuild and dialog is not None and dialog.window is not None:
+        dialog.window.destroy()  # The next use builds a new window
+    timing = {}
+
+    def close_when_visible():
+        shown = MacroMouse.dialog_cache[dialog_class]
+        if shown.window.winfo_viewable():
+            timing["visible"] = time.perf_counter() - start
+            shown.close()
+        else:
+            root.after(1, close_when_visible)
+
+    # Modal dialogs process events while they wait, so the check runs inside open_dialog()
+    root.after(0, close_when_visible)
+    start = time.perf_counter()
+    open_dialog()
+    while "visible" not in timing:
+        root.update()
+    root.update()
+    return timing["visible"]
+
+
+def check_reuse(MacroMouse, ctk, root):
+    """Use the modal dialogs twice each and return a list of what carried over."""
+    failures = []
+    dialogs = MacroMouse.dialog_cache
+
+    def while_open(action):
+        # Modal dialogs wait for the user, so act from an event while the dialog is open
+        root.after(50, action)
+
+    def type_and_cancel():
+        dialog = dialogs[MacroMouse.PlaceholderDialog]
+        for entry in dialog.entries.values():
+            entry.insert(0, "left over")
+        dialog.finish(None)
+
+    leftovers = {}
+
+    def read_and_cancel():
+        dialog = dialogs[MacroMouse.PlaceholderDialog]
+        leftovers.update({name: entry.get() for name, entry in dialog.entries.items()})
+        dialog.finish(None)
+
+    while_open(type_and_cancel)
+    MacroMouse.show_placeholder_dialog("Example macro", ["name", "place"])
+    while_open(read_and_cancel)
+    MacroMouse.show_placeholder_dialog("Other macro", ["name", "date"])
+    if any(leftovers.values()):
+        failures.append(f"placeholder entries kept text from the last use: {leftovers}")
+    if root.grab_current() is not None:
+        failures.append("a grab is still held after the placeholder dialog closed")
+
+    child = ctk.CTkToplevel(root)
+    child.geometry("300x200")
+    root.update()
+    transient = {}
+
+    def record_and_close(key):
+        box = dialogs[MacroMouse.StyledMessageBox]
+        transient[key] = str(box.window.transient())
+        box.finish(True)
+
+    while_open(lambda: record_and_close("parent"))
+    MacroMouse.create_styled_messagebox("Check", "Opened from a child window", parent=child)
+    while_open(lambda: record_and_close("none"))
+    MacroMouse.create_styled_messagebox("Check", "Opened without a parent")
+    if transient["parent"] != str(child):
+        failures.append(f"message box not transient to its parent: {transient['parent']!r}")
+    if transient["none"]:
+        failures.append(f"message box still transient to {transient['none']!r} without a parent")
+    if root.grab_current() is not None:
+        failures.append("a grab is still held after the message box closed")
+    child.destroy()
+    return failures
+
+
+def main():
+    import customtkinter as ctk
+    import MacroMouse
+
+    root = ctk.CTk()
+    root.geometry("600x400")
+    root.update()
+    dialogs = [
+        ("copy confirmation", MacroMouse.CopiedPopup,
+         lambda: MacroMouse.show_copied_popup(root, "Example macro")),
+        ("placeholders", MacroMouse.PlaceholderDialog,
+         lambda: MacroMouse.show_placeholder_dialog("Example macro", ["name", "date", "place"])),
+        ("message box", MacroMouse.StyledMessageBox,
+         lambda: MacroMouse.create_styled_messagebox("Confirm", "Are you sure?", parent=root,
+                                                     buttons=[("Yes", True), ("No", False)])),
+        ("undo notification", MacroMouse.UndoNotification,
+         lambda: MacroMouse.show_undo_notification("Undo completed")),
+        ("tray popup", MacroMouse.TrayMacroPopup,
+         lambda: MacroMouse.show_tray_macro_popup("Example macro", "Hello {{name}}, " * 20)),
+    ]
+
+    print(f"median of {REPEAT} opens\n")
+    print(f"{'dialog':>18} {'rebuilt':>10} {'reused':>10} {'speedup':>8}")
+    for label, dialog_class, open_dialog in dialogs:
+        rebuilt = [time_to_visible(MacroMouse, root, dialog_class, open_dialog, rebuild=True) for _ in range(REPEAT)]
+        reused = [time_to_visible(MacroMouse, root, dialog_class, open_dialog, rebuild=False) for _ in range(REPEAT)]
+        rebuilt_ms = statistics.median(rebuilt) * 1000
+        reused_ms = statistics.median(reused) * 1000
+        print(f"{label:>18} {rebuilt_ms:8.1f}ms {reused_ms:8.1f}ms {rebuilt_ms / reused_ms:7.1f}x")
+
+    failures = check_reuse(MacroMouse, ctk, root)
+    root.destroy()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Timing benchmark for copying macros that include other macros.
+Adds three include graphs to a synthetic library and times one copy's
+expansion of the top macro with:
+  - a plain recursive resolver that re-reads and re-expands every included
+    macro on every copy (what includes would cost without the template cache)
+  - macro_template(): the first copy, which parses and splices the includes
+  - macro_template(): later copies, served from the template cache
+The graphs are a chain of MAX_INCLUDE_DEPTH macros, a diamond where each level
+includes the one below twice (so the output doubles per level) and a shared
+preamble included by many macros. Time per output KB should stay flat across
+graphs for the cached copies. Also checks that editing the deepest macro of
+the chain shows up in the next copy.
+
+Usage: python benchmark_includes.py
+"""
+
+import os
+import re
+import tempfile
+import time
+
+from benchmark_macro_loading import write_synthetic_file
+
+PREAMBLE = "Rule: answer {{name}} briefly, cite sources and stop when done.\n" * 30
+VALUES = {"name": "Ada", "topic": "caching"}
+SHARED_USERS = 200
+
+
+def naive_expand(MacroMouse, macro_id, depth=0):
+    """Expand a macro by recursively expanding each include on every copy."""
+    content = MacroMouse.get_macro_store().macro_content(macro_id) or ""
+
+    def include(match):
+        target_id = MacroMouse.resolve_include(match.group(1), MacroMouse.load_macro_data()["macros"])
+        if target_id is None or depth >= MacroMouse.MAX_INCLUDE_DEPTH:
+            return match.group()
+        return naive_expand(MacroMouse, target_id, depth + 1)
+    return re.sub(r"<include:([^<>\n]+)>", include, content)
+
+
+def build_graphs(MacroMouse):
+    """Add the include graphs; returns {label: (top macro IDs, deepest macro ID)}."""
+    store = MacroMouse.get_macro_store()
+    cat_id = store.add_category("Includes")
+    graphs = {}
+
+    chain = [store.add_macro(cat_id, "Chain 0", PREAMBLE)]
+    for level in range(1, MacroMouse.MAX_INCLUDE_DEPTH + 1):
+        chain.append(store.add_macro(cat_id, f"Chain {level}",
+                                     f"Level {level} on {{{{topic}}}} at <time>\n<include:{chain[-1]}>"))
+    graphs["chain"] = ([chain[-1]], chain[0])
+
+    diamond = [store.add_macro(cat_id, "Diamond 0", PREAMBLE)]
+    for level in range(1, MacroMouse.MAX_INCLUDE_DEPTH + 1):
+        diamond.append(store.add_macro(cat_id, f"Diamond {level}",
+                                       f"<include:{diamond[-1]}>\n<include:Includes/Diamond {level - 1}>"))
+    graphs["diamond"] = ([diamond[-1]], diamond[0])
+
+    preamble = store.add_macro(cat_id, "Preamble", PREAMBLE)
+    users = [store.add_macro(cat_id, f"Task {i}", f"<include:Includes/Preamble>\nTask {i}: {{{{topic}}}} <date>")
+             for i in range(SHARED_USERS)]
+    graphs["shared"] = (users, preamble)
+    return graphs
+
+
+def best_time(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    import MacroMouse
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "macros.xml")
+        write_synthetic_file(file_path, 2000)
+        MacroMouse.macro_data_file_path = file_path
+        MacroMouse.load_macro_data()
+        graphs = build_graphs(MacroMouse)
+
+        print(f"{'graph':>8} {'output':>9} {'naive':>10} {'first':>10} {'cached':>10} {'cached/KB':>10}")
+        stale = False
+        for label, (top_ids, deepest_id) in graphs.items():
+            def naive():
+                return [MacroMouse.MacroTemplate(naive_expand(MacroMouse, macro_id)).expand(VALUES)
+                        for macro_id in top_ids]
+
+            def first():
+                MacroMouse.template_cache.clear()
+                return [MacroMouse.macro_template(macro_id).expand(VALUES) for macro_id in top_ids]
+
+            def cached():
+                return [MacroMouse.macro_template(macro_id).expand(VALUES) for macro_id in top_ids]
+
+            naive_time, expected = best_time(naive)
+            first_time, _ = best_time(first)
+            cached_time, result = best_time(cached)
+            if result != expected:
+                print(f"  warning: expansions differ for {label} (a second boundary may have passed)")
+            output = sum(len(text) for text in result)
+            print(f"{label:>8} {output:>9} {naive_time * 1000:8.2f}ms {first_time * 1000:8.2f}ms "
+                  f"{cached_time * 1000:8.2f}ms {cached_time / (output / 1024) * 1e6:8.1f}us")
+
+            # Editing an included macro must show up in the next copy
+            deepest = MacroMouse.load_macro_data()["macros"][deepest_id]
+            MacroMouse.update_macro_in_data(deepest_id, deepest.category_id, deepest.name, "EDITED")
+            stale = stale or "EDITED" not in MacroMouse.macro_template(top_ids[0]).expand(VALUES)
+
+        if stale:
+            print("\nwarning: an edited include was not reflected in the next copy")
+        MacroMouse.flush_macro_store()
+        MacroMouse.macro_store = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for loading macros.xml.
+Builds a synthetic macro file (100,000 macros by default) and loads it in a
+fresh process with the old ET.parse loader and with the streaming iterparse
+loader in MacroMouse.py, reporting the peak-RSS growth of each.
+
+Usage: python benchmark_macro_loading.py [macro_count]
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows; tracemalloc peaks are still reported
+
+CATEGORY_COUNT = 50
+
+
+def legacy_read_macro_data_file(file_path):
+    """The previous loader: parse the whole DOM, then copy it into dicts."""
+    tree = ET.parse(file_path)
+    root = tree.getroot()
+    data = {
+        "version": root.find("version").text if root.find("version") is not None else "1.0",
+        "categories": {},
+        "macros": {},
+        "category_order": []
+    }
+    categories_elem = root.find("categories")
+    if categories_elem is not None:
+        for cat_elem in categories_elem.findall("category"):
+            data["categories"][cat_elem.get("id")] = {
+                "name": cat_elem.find("name").text,
+                "created": cat_elem.find("created").text,
+                "modified": cat_elem.find("modified").text,
+                "description": cat_elem.find("description").text if cat_elem.find("description") is not None else "",
+                "hidden": (cat_elem.find("hidden").text.lower() == "true") if cat_elem.find("hidden") is not None else False
+            }
+    macros_elem = root.find("macros")
+    if macros_elem is not None:
+        for macro_elem in macros_elem.findall("macro"):
+            data["macros"][macro_elem.get("id")] = {
+                "name": macro_elem.find("name").text,
+                "category_id": macro_elem.find("category_id").text,
+                "content": macro_elem.find("content").text,
+                "created": macro_elem.find("created").text,
+                "modified": macro_elem.find("modified").text,
+                "version": int(macro_elem.find("version").text)
+            }
+    order_elem = root.find("category_order")
+    if order_elem is not None and order_elem.text:
+        data["category_order"] = order_elem.text.split(",")
+    else:
+        data["category_order"] = list(data["categories"].keys())
+    return data
+
+
+def write_synthetic_file(file_path, macro_count):
+    """Write a macros.xml with macro_count macros spread over CATEGORY_COUNT categories."""
+    from MacroMouse import write_macro_data_file
+    timestamp = "2024-01-01T00:00:00"
+    data = {"version": "1.0", "categories": {}, "macros": {}, "category_order": []}
+    for i in range(CATEGORY_COUNT):
+        cat_id = f"cat{i:04d}"
+        data["categories"][cat_id] = {
+            "name": f"Category {i}", "created": timestamp, "modified": timestamp,
+            "description": f"Synthetic category {i}", "hidden": False
+        }
+        data["category_order"].append(cat_id)
+    for i in range(macro_count):
+        data["macros"][f"macro{i:07d}"] = {
+            "name": f"Macro {i}",
+            "category_id": f"cat{i % CATEGORY_COUNT:04d}",
+            "content": f"Hello {{{{name}}}}, this is synthetic macro number {i}. Date: <date>. " * 3,
+            "created": timestamp, "modified": timestamp, "version": 1
+        }
+    write_macro_data_file(file_path, data, data["category_order"])
+
+
+def peak_rss_kb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def run_loader(loader, file_path, mode):
+    """Child process: load the file once and print the macro count and peak memory growth in KB."""
+    if loader == "legacy":
+        read = legacy_read_macro_data_file
+    else:
+        from MacroMouse import read_macro_data_file as read
+    if mode == "tracemalloc":
+        # Measured in its own process: tracing inflates RSS
+        import tracemalloc
+        tracemalloc.start()
+        data = read(file_path)
+        growth = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    elif resource:
+        rss_before = peak_rss_kb()
+        data = read(file_path)
+        growth = peak_rss_kb() - rss_before
+    else:
+        data = read(file_path)
+        growth = -1
+    print(len(data["macros"]), growth)
+
+
+def run_child(*args):
+    # Every step runs in a fresh process so no step inherits another's peak RSS
+    return subprocess.run(
+        [sys.executable, os.path.abspath(__file__)] + list(args),
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+
+
+def measure(loader, file_path, mode):
+    loaded, growth = run_child("--run", loader, file_path, mode)
+    return int(loaded), int(growth)
+
+
+def main():
+    if len(sys.argv) >= 5 and sys.argv[1] == "--run":
+        run_loader(sys.argv[2], sys.argv[3], sys.argv[4])
+        return
+    if len(sys.argv) >= 4 and sys.argv[1] == "--generate":
+        write_synthetic_file(sys.argv[2], int(sys.argv[3]))
+        return
+
+    macro_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "macros.xml")
+        print(f"Writing synthetic file with {macro_count} macros...")
+        run_child("--generate", file_path, str(macro_count))
+        print(f"File size: {os.path.getsize(file_path) / (1024 * 1024):.1f} MB\n")
+
+        results = {}
+        for loader in ("legacy", "streaming"):
+            loaded, rss_growth = measure(loader, file_path, "rss")
+            _, traced_peak = measure(loader, file_path, "tracemalloc")
+            results[loader] = (rss_growth, traced_peak)
+            rss_text = f"{rss_growth / 1024:8.1f} MB" if rss_growth >= 0 else "     n/a"
+            print(f"{loader:>9}: {loaded} macros, peak RSS growth {rss_text}, "
+                  f"tracemalloc peak {traced_peak / 1024:8.1f} MB")
+
+        legacy, streaming = results["legacy"], results["streaming"]
+        if streaming[0] > 0:
+            print(f"\nPeak RSS reduced by {100 * (1 - streaming[0] / legacy[0]):.0f}%")
+        print(f"tracemalloc peak reduced by {100 * (1 - streaming[1] / legacy[1]):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
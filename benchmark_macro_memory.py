@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Memory-per-macro benchmark for the in-memory macro store.
+Loads a synthetic macros.xml (20,000 macros by default) and uses tracemalloc
+to report the bytes held per macro by:
+  - the old layout: one dict per macro plus the macros_dict copy keyed by
+    (category name, macro name)
+  - the current layout: __slots__ Macro/Category records with interned IDs
+    and timestamps, and no copy
+  - the current layout with lazy content loading
+
+Usage: python benchmark_macro_memory.py [macro_count]
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from benchmark_macro_loading import legacy_read_macro_data_file, write_synthetic_file
+
+
+def load_legacy(file_path):
+    data = legacy_read_macro_data_file(file_path)
+    # create_macro_window used to build this copy of every macro's content
+    macros_dict = {}
+    for macro in data["macros"].values():
+        cat_name = data["categories"].get(macro["category_id"], {}).get("name", "Uncategorized")
+        macros_dict[(cat_name, macro["name"])] = macro["content"]
+    return data, macros_dict
+
+
+def load_current(file_path):
+    import MacroMouse
+    return MacroMouse.read_macro_data_file(file_path)
+
+
+def load_lazy(file_path):
+    import MacroMouse
+    return MacroMouse.read_macro_data_file_lazy(file_path)
+
+
+def retained_bytes(loader, file_path):
+    """Return the bytes still allocated after loader(file_path), with its result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = loader(file_path)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def main():
+    macro_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    import MacroMouse  # Imported up front so module import isn't counted
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "macros.xml")
+        write_synthetic_file(file_path, macro_count)
+
+        results = [
+            ("dicts + macros_dict copy", retained_bytes(load_legacy, file_path)),
+            ("__slots__ records", retained_bytes(load_current, file_path)),
+            ("__slots__ + lazy content", retained_bytes(load_lazy, file_path)),
+        ]
+        print(f"{macro_count} macros\n")
+        for label, retained in results:
+            print(f"{label:>26}: {retained / macro_count:7.0f} bytes/macro "
+                  f"({retained / (1024 * 1024):.1f} MB)")
+        before = results[0][1]
+        for label, retained in results[1:]:
+            print(f"\n{label}: {100 * (1 - retained / before):.0f}% less than before", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Timing benchmark for expanding macro content when a macro is copied.
+Builds prompt-style templates of 1 KB to 1 MB with dynamic tags and
+{{placeholders}} and times:
+  - the previous copy path: nine str.replace passes for the dynamic tags,
+    re.findall for the placeholders, then one replace per filled placeholder
+  - MacroTemplate: parse once, then a single pass per expansion
+  - parsing a MacroTemplate, paid only after a macro changes
+
+Usage: python benchmark_templates.py
+"""
+
+import re
+import time
+from datetime import datetime
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+VALUES = {"name": "Ada", "project": "MacroMouse", "task": "review", "language": "Python"}
+
+PARAGRAPH = ("You are helping {{name}} with {{project}}. Today is <date> and it is <time>. "
+             "Follow the rules below when working on the {{task}} in {{language}}; "
+             "mention <year> only if relevant and leave {{unfilled}} alone.\n")
+
+
+def legacy_expand(text, values):
+    """The previous copy path from copy_macro."""
+    placeholder_map = {
+        "<datetime>": lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "<date>": lambda: datetime.now().strftime("%Y-%m-%d"),
+        "<time>": lambda: datetime.now().strftime("%H:%M:%S"),
+        "<year>": lambda: datetime.now().strftime("%Y"),
+        "<month>": lambda: datetime.now().strftime("%m"),
+        "<day>": lambda: datetime.now().strftime("%d"),
+        "<hour>": lambda: datetime.now().strftime("%H"),
+        "<minute>": lambda: datetime.now().strftime("%M"),
+        "<second>": lambda: datetime.now().strftime("%S"),
+    }
+    for placeholder, func in placeholder_map.items():
+        if placeholder in text:
+            text = text.replace(placeholder, func())
+    placeholders = set(re.findall(r'\{\{(.*?)\}\}', text))
+    for ph in placeholders:
+        value = values.get(ph)
+        if value:
+            text = text.replace(f"{{{{{ph}}}}}", value)
+    return text
+
+
+def best_time(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    import MacroMouse
+
+    print(f"{'size':>9} {'previous':>10} {'template':>10} {'speedup':>8} {'parse':>10}")
+    for size in SIZES:
+        text = PARAGRAPH * max(1, size // len(PARAGRAPH))
+        parse, template = best_time(lambda: MacroMouse.MacroTemplate(text))
+        previous, expected = best_time(lambda: legacy_expand(text, VALUES))
+        current, result = best_time(lambda: template.expand(VALUES))
+        if result != expected:
+            print(f"  warning: expansions differ at {size} bytes (a second boundary may have passed)")
+        print(f"{len(text):>9} {previous * 1000:8.2f}ms {current * 1000:8.2f}ms "
+              f"{previous / current:7.1f}x {parse * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Timing benchmark for ordering the macro list by usage.
+For libraries of 1,000 to 100,000 macros with 10,000 usage-count entries,
+times get_macros_for_ui("All") (used macros first, then alphabetical) and
+the previous implementation, whose top-5 pass was quadratic. The previous
+version is only run up to 10,000 macros unless --all is given.
+
+Usage: python benchmark_usage_ranking.py [--all]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmark_macro_loading import CATEGORY_COUNT, write_synthetic_file
+
+SIZES = [1000, 10000, 30000, 100000]
+USAGE_ENTRIES = 10000
+LEGACY_LIMIT = 10000
+
+
+def legacy_get_macros_for_ui(data, macro_usage_counts, selected_category="All"):
+    """The previous unfiltered listing: sort by name, then the usage pass."""
+    macros = []
+    for macro_id, macro in data["macros"].items():
+        cat_data = data["categories"].get(macro["category_id"], {})
+        cat_name = cat_data.get("name", "Uncategorized")
+        if cat_data.get("hidden", False):
+            continue
+        if selected_category != "All" and cat_name != selected_category:
+            continue
+        macros.append((cat_name, macro["name"], macro_id))
+    macros.sort(key=lambda x: x[1].lower())
+    if macro_usage_counts:
+        filtered_usage_counts = {}
+        for (cat, name), count in macro_usage_counts.items():
+            if selected_category == "All" or cat == selected_category:
+                if any(m[1] == name and (selected_category == "All" or m[0] == selected_category) for m in macros):
+                    filtered_usage_counts[(cat, name)] = count
+        macros.sort(key=lambda x: (-filtered_usage_counts.get((x[0], x[1]), 0), x[1].lower()))
+        top_macros = [m for m in macros[:5] if filtered_usage_counts.get((m[0], m[1]), 0) > 0]
+        rest_macros = [m for m in macros if m not in top_macros]
+        macros = top_macros + rest_macros
+    return macros
+
+
+def usage_counts_for(macro_count):
+    """USAGE_ENTRIES counts spread over the library; entries past its end are stale keys."""
+    counts = {}
+    step = max(1, macro_count // USAGE_ENTRIES)
+    for i in range(USAGE_ENTRIES):
+        index = i * step
+        counts[(f"Category {index % CATEGORY_COUNT}", f"Macro {index}")] = 1 + (i * 7919) % 500
+    return counts
+
+
+def best_time(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    run_all = "--all" in sys.argv[1:]
+    import MacroMouse
+
+    print(f"{USAGE_ENTRIES} usage entries\n")
+    print(f"{'macros':>8} {'current':>10} {'per macro':>10} {'previous':>10}")
+    for macro_count in SIZES:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "macros.xml")
+            write_synthetic_file(file_path, macro_count)
+            MacroMouse.macro_data_file_path = file_path
+            data = MacroMouse.load_macro_data()
+            MacroMouse.macro_usage_counts.clear()
+            MacroMouse.macro_usage_counts.update(usage_counts_for(macro_count))
+            MacroMouse.usage_changed()
+
+            # The first call also builds the usage map keyed by macro ID and the name order
+            cold, _ = best_time(lambda: MacroMouse.get_macros_for_ui("All"), repeat=1)
+            current, result = best_time(lambda: MacroMouse.get_macros_for_ui("All"))
+            if run_all or macro_count <= LEGACY_LIMIT:
+                previous, legacy_result = best_time(
+                    lambda: legacy_get_macros_for_ui(data, MacroMouse.macro_usage_counts), repeat=1)
+                if [m[2] for m in legacy_result] != [m[2] for m in result]:
+                    print(f"  warning: orderings differ at {macro_count} macros")
+                previous_text = f"{previous * 1000:8.0f}ms"
+            else:
+                previous_text = "   skipped"
+            print(f"{macro_count:>8} {current * 1000:8.1f}ms {current / macro_count * 1e6:8.2f}us "
+                  f"{previous_text}   (first call {cold * 1000:.1f}ms)")
+            MacroMouse.flush_macro_store()
+            MacroMouse.macro_store = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Randomized check that refined searches match fresh ones.
+Simulates typing sessions in the search box over a synthetic library: each
+session types a query one character at a time, with the odd typo and
+backspace, in a random category. After every keystroke the results of
+search_macros_for_ui (which refines the cached results of the previous
+query) are compared with a fresh search run on an empty search cache, and
+now and then a macro is edited in between so stale entries are exercised
+too. Exits with status 1 on the first difference.
+
+Usage: python check_search_refinement.py [sessions] [seed]
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+WORDS = ["invoice", "reminder", "meeting", "follow", "up", "thanks", "review", "draft",
+         "summary", "weekly", "report", "customer", "support", "reply", "intro", "prompt",
+         "rules", "code", "python", "email", "signature", "address", "agenda", "notes"]
+MACRO_COUNT = 3000
+CATEGORY_COUNT = 8
+
+
+def write_library(MacroMouse, file_path, rng):
+    """Write a macros.xml whose names and content are random phrases from WORDS."""
+    timestamp = "2024-01-01T00:00:00"
+    data = {"version": "1.0", "categories": {}, "macros": {}, "category_order": []}
+    for i in range(CATEGORY_COUNT):
+        cat_id = f"cat{i:04d}"
+        data["categories"][cat_id] = {
+            "name": f"Category {i}", "created": timestamp, "modified": timestamp,
+            "description": "", "hidden": i == CATEGORY_COUNT - 1
+        }
+        data["category_order"].append(cat_id)
+    for i in range(MACRO_COUNT):
+        data["macros"][f"macro{i:07d}"] = {
+            "name": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title(),
+            "category_id": f"cat{rng.randrange(CATEGORY_COUNT):04d}",
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 30))),
+            "created": timestamp, "modified": timestamp, "version": 1
+        }
+    MacroMouse.write_macro_data_file(file_path, data, data["category_order"])
+
+
+def keystrokes(rng):
+    """Yield the successive search box contents of one typing session."""
+    target = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+    text = ""
+    for char in target:
+        if rng.random() < 0.08:
+            text += rng.choice("abcdefghijklmnopqrstuvwxyz")  # Typo, then fix it
+            yield text
+            text = text[:-1]
+            yield text
+        text += char
+        yield text
+    while text and rng.random() < 0.5:
+        text = text[:-1]
+        yield text
+
+
+def fresh_search(MacroMouse, data, category, term):
+    """Search with an empty cache, leaving the cache as it was."""
+    saved = MacroMouse.search_cache.copy()
+    MacroMouse.search_cache.clear()
+    try:
+        return MacroMouse.search_macros_for_ui(data, category, term)
+    finally:
+        MacroMouse.search_cache.clear()
+        MacroMouse.search_cache.update(saved)
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = random.Random(seed)
+    import MacroMouse
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "macros.xml")
+        write_library(MacroMouse, file_path, rng)
+        MacroMouse.macro_data_file_path = file_path
+        data = MacroMouse.load_macro_data()
+        categories = ["All"] + [f"Category {i}" for i in range(CATEGORY_COUNT)]
+        checked = 0
+        failure = None
+        for _ in range(sessions):
+            category = rng.choice(categories)
+            for term in keystrokes(rng):
+                if not term.strip():
+                    continue
+                if rng.random() < 0.02:
+                    macro_id = rng.choice(list(data["macros"]))
+                    macro = data["macros"][macro_id]
+                    MacroMouse.update_macro_in_data(macro_id, macro.category_id,
+                                                    f"{macro.name} {rng.choice(WORDS)}", macro.content)
+                refined = MacroMouse.search_macros_for_ui(data, category, term)
+                fresh = fresh_search(MacroMouse, data, category, term)
+                checked += 1
+                if refined != fresh:
+                    failure = (category, term, refined[:5], fresh[:5])
+                    break
+            if failure:
+                break
+        MacroMouse.flush_macro_store()
+        MacroMouse.macro_store = None
+
+    if failure:
+        category, term, refined, fresh = failure
+        print(f"FAIL: results differ for {term!r} in {category} after {checked} searches")
+        print(f"  refined: {refined}")
+        print(f"  fresh:   {fresh}")
+        sys.exit(1)
+    print(f"{checked} searches in {sessions} typing sessions: refined results match fresh searches")
+
+
+if __name__ == "__main__":
+    main()